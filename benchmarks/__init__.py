@@ -0,0 +1,23 @@
+"""
+Бенчмарки проектов ya_news и ya_note.
+
+Запускаются из корня репозитория: python -m benchmarks.<имя> --help
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SETTINGS = {
+    'ya_news': 'yanews.settings',
+    'ya_note': 'yanote.settings',
+}
+
+
+def setup_django(project):
+    """Делает проект импортируемым и настраивает Django."""
+    import django
+
+    sys.path.insert(0, str(ROOT_DIR / project))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', SETTINGS[project])
+    django.setup()
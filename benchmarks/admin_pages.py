@@ -0,0 +1,113 @@
+"""
+Время ответа и число запросов страниц админки новостей.
+
+    python -m benchmarks.admin_pages --users 100000 --comments 50000
+
+Во временной базе создаются пользователи и одна новость с comments
+комментариями, затем суперпользователь открывает список новостей,
+форму новости, список её комментариев и подтверждение её удаления.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from . import setup_django
+
+
+def fill(users, comments, chunk=50000):
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+
+    from news.models import News
+
+    user_table = get_user_model()._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, users, chunk):
+            cursor.executemany(
+                f'INSERT INTO {user_table} (username, password, is_superuser, '
+                'first_name, last_name, email, is_staff, is_active, '
+                "date_joined) VALUES (%s, '', 0, '', '', '', 0, 1, "
+                "datetime('now'))",
+                [
+                    (f'user{number}',)
+                    for number in range(start, min(start + chunk, users))
+                ],
+            )
+        news = News.objects.create(title='Популярная', text='Текст')
+        for start in range(0, comments, chunk):
+            cursor.executemany(
+                'INSERT INTO news_comment '
+                '(news_id, author_id, text, created, updated) '
+                "VALUES (%s, %s, %s, datetime('now'), datetime('now'))",
+                [
+                    (news.pk, number % users + 1, f'Комментарий {number}')
+                    for number in range(start, min(start + chunk, comments))
+                ],
+            )
+        News.shift_comment_count((news.pk,), comments)
+    return news
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--comments', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django('ya_news')
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from django.urls import reverse
+
+    directory = tempfile.TemporaryDirectory()
+    settings.DATABASES['default']['NAME'] = Path(directory.name) / 'db.sqlite3'
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    news = fill(args.users, args.comments)
+    client = Client()
+    client.force_login(get_user_model().objects.create_superuser('admin'))
+    pages = {
+        'список новостей': (reverse('admin:news_news_changelist'), {}),
+        'форма новости': (
+            reverse('admin:news_news_change', args=(news.pk,)), {}
+        ),
+        'комментарии новости': (
+            reverse('admin:news_comment_changelist'),
+            {'news__id__exact': news.pk},
+        ),
+        'удаление новости': (
+            reverse('admin:news_news_delete', args=(news.pk,)), {}
+        ),
+        'поиск автора': (
+            reverse('admin:autocomplete'),
+            {
+                'app_label': 'news', 'model_name': 'comment',
+                'field_name': 'author', 'term': 'user123',
+            },
+        ),
+    }
+    print(f'{"страница":>20} {"мс":>8} {"запросов":>9}')
+    for name, (url, params) in pages.items():
+        durations = []
+        for _ in range(args.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url, params)
+                durations.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (url, response.status_code)
+        print(
+            f'{name:>20} {statistics.median(durations):>8.1f} '
+            f'{len(queries):>9}'
+        )
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
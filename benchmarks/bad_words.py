@@ -0,0 +1,76 @@
+"""
+Сравнение фильтров запрещённых слов на длинных комментариях.
+
+    python -m benchmarks.bad_words --words 5000 --text-length 5000
+"""
+import argparse
+import random
+import timeit
+
+from . import setup_django
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def loop_filter(words):
+    """Прежняя проверка из CommentForm.clean_text."""
+    def find(text):
+        lowered_text = text.lower()
+        return {word for word in words if word in lowered_text}
+    return find
+
+
+def make_words(rng, count):
+    return [
+        ''.join(rng.choices(ALPHABET, k=rng.randint(5, 12)))
+        for _ in range(count)
+    ]
+
+
+def make_text(rng, length):
+    words = []
+    while sum(map(len, words)) < length:
+        words.append(''.join(rng.choices(ALPHABET, k=rng.randint(2, 9))))
+    return ' '.join(words)[:length]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--words', type=int, nargs='+', default=[2, 100, 1000, 10000]
+    )
+    parser.add_argument(
+        '--text-length', type=int, nargs='+', default=[200, 5000]
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django('ya_news')
+    from news.moderation import AhoCorasickMatcher, RegexMatcher
+
+    rng = random.Random(args.seed)
+    print(f'{"слов":>7} {"символов":>9} {"движок":>14} {"мкс/текст":>11}')
+    for word_count in args.words:
+        words = make_words(rng, word_count)
+        engines = {
+            'loop': loop_filter(words),
+            'aho-corasick': AhoCorasickMatcher(words).findall,
+            'regex': RegexMatcher(words).findall,
+        }
+        for length in args.text_length:
+            texts = [make_text(rng, length) for _ in range(20)]
+            for name, find in engines.items():
+                seconds = min(timeit.repeat(
+                    lambda: [find(text) for text in texts],
+                    number=1,
+                    repeat=args.repeat,
+                ))
+                print(
+                    f'{word_count:>7} {length:>9} {name:>14} '
+                    f'{seconds / len(texts) * 1e6:>11.1f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
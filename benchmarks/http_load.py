@@ -0,0 +1,123 @@
+"""
+Нагрузка на запущенный сервер: пропускная способность и хвосты задержек.
+
+Сравнение WSGI и ASGI для ya_news (серверы ставятся отдельно):
+
+    gunicorn --chdir ya_news -w 4 --threads 8 -b :8000 yanews.wsgi
+    uvicorn --app-dir ya_news --workers 4 --port 8001 yanews.asgi:application
+
+    python -m benchmarks.http_load http://127.0.0.1:8000 --paths / /news/1/
+    python -m benchmarks.http_load http://127.0.0.1:8001 --paths / /news/1/
+
+Каждый из concurrency клиентов держит своё keep-alive соединение
+и отправляет запросы по кругу по списку путей.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+def percentile(values, share):
+    """Значение, не превышенное долей share отсортированных values."""
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+async def read_response(reader):
+    """Статус ответа; тело читается целиком по Content-Length."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('сервер закрыл соединение')
+    version, status = status_line.split()[:2]
+    length = None
+    keep_alive = version == b'HTTP/1.1'
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            keep_alive = value.strip().lower() == 'keep-alive' or (
+                keep_alive and value.strip().lower() != 'close'
+            )
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    return int(status), keep_alive
+
+
+async def client(url, paths, deadline, latencies, statuses, offset):
+    """Один клиент: запросы по кругу до истечения deadline."""
+    host, port = url.hostname, url.port or 80
+    reader = writer = None
+    number = offset
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        if writer is None:
+            reader, writer = await asyncio.open_connection(host, port)
+        request = (
+            f'GET {url.path.rstrip("/")}{path} HTTP/1.1\r\n'
+            f'Host: {url.netloc}\r\n\r\n'
+        )
+        started = time.perf_counter()
+        try:
+            writer.write(request.encode())
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            status, keep_alive = 'ошибка', False
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, paths, concurrency, duration):
+    latencies = []
+    statuses = Counter()
+    started = time.monotonic()
+    await asyncio.gather(*(
+        client(url, paths, started + duration, latencies, statuses, number)
+        for number in range(concurrency)
+    ))
+    return latencies, statuses, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('url', help='Например, http://127.0.0.1:8000')
+    parser.add_argument('--paths', nargs='+', default=['/'])
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    latencies, statuses, elapsed = asyncio.run(run(
+        urlsplit(args.url), args.paths, args.concurrency, args.duration
+    ))
+    latencies.sort()
+    print(f'запросов: {len(latencies)}, {len(latencies) / elapsed:.0f} в с')
+    for name, share in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        print(f'{name}: {percentile(latencies, share) * 1000:.1f} мс')
+    if latencies:
+        print(f'max: {latencies[-1] * 1000:.1f} мс')
+    print('статусы:', ', '.join(
+        f'{status}: {count}' for status, count in statuses.most_common()
+    ))
+
+
+if __name__ == '__main__':
+    main()
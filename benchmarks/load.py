@@ -0,0 +1,488 @@
+"""
+Нагрузочный прогон пользовательских сценариев ya_news или ya_note.
+
+    python -m benchmarks.load --concurrency 8 --output before.json
+    python -m benchmarks.load --project ya_note --server wsgi
+    python -m benchmarks.load --compare before.json after.json
+
+Во временной базе команда seed создаёт данные, затем concurrency
+потоков до истечения --duration выполняют сценарии, выбирая их
+случайно по весам из --mix. Запросы идут через тестовый Client в том
+же процессе или, с --server wsgi, по HTTP с keep-alive через WSGI-сервер
+Django, запущенный в соседнем потоке. Внешний сервер, в том числе
+ASGI, нагружает benchmarks.http_load.
+
+Для каждого URL печатаются число запросов в секунду, p50/p95/p99
+и среднее число SQL-запросов. --output сохраняет то же в JSON вместе
+с параметрами прогона и коммитом, --compare сравнивает два таких файла.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from io import StringIO
+from pathlib import Path
+from urllib.parse import urlencode
+
+from . import ROOT_DIR, setup_django
+from .http_load import percentile
+
+CSRF_TOKEN = 'load' * 8
+SEARCH_WORDS = ('город', 'футбол', 'погода', 'театр', 'ремонт')
+METRICS = ('rps', 'p50', 'p95', 'p99', 'queries')
+
+
+def hot(rng, ids):
+    """Свежие записи запрашиваются чаще старых."""
+    return ids[-1 - int(len(ids) * rng.random() ** 3)]
+
+
+def visitor(rng, data, tag):
+    yield 'GET', 'users:login', (), None
+    yield 'GET', 'users:signup', (), None
+
+
+def news_reader(rng, data, tag):
+    yield 'GET', 'news:home', (), None
+    yield 'GET', 'news:detail', (hot(rng, data['news']),), None
+    yield 'GET', 'news:archive', (), None
+    yield 'GET', 'news:search', (), {'q': rng.choice(SEARCH_WORDS)}
+
+
+def news_commenter(rng, data, tag):
+    news = hot(rng, data['news'])
+    yield 'GET', 'news:detail', (news,), None
+    yield 'POST', 'news:detail', (news,), {'text': f'Комментарий {tag}'}
+
+
+def note_visitor(rng, data, tag):
+    yield 'GET', 'notes:home', (), None
+    yield from visitor(rng, data, tag)
+
+
+def note_editor(rng, data, tag):
+    """Полный цикл заметки, поэтому число заметок в базе не растёт."""
+    slug = f'load-{tag}'
+    form = {'title': f'Заметка {tag}', 'text': 'Текст заметки', 'slug': slug}
+    yield 'GET', 'notes:list', (), None
+    yield 'POST', 'notes:add', (), form
+    yield 'GET', 'notes:detail', (slug,), None
+    yield 'POST', 'notes:edit', (slug,), {**form, 'text': 'Новый текст'}
+    yield 'POST', 'notes:delete', (slug,), None
+
+
+# Сценарий и нужна ли для него авторизация.
+SCENARIOS = {
+    'ya_news': {
+        'reader': (news_reader, False),
+        'commenter': (news_commenter, True),
+        'visitor': (visitor, False),
+    },
+    'ya_note': {
+        'visitor': (note_visitor, False),
+        'editor': (note_editor, True),
+    },
+}
+DEFAULT_MIX = {
+    'ya_news': 'reader=8,commenter=1,visitor=1',
+    'ya_note': 'visitor=1,editor=3',
+}
+
+
+class QueryCounter(threading.local):
+    """Число SQL-запросов текущего потока, см. execute_wrappers."""
+    count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+QUERIES = QueryCounter()
+
+
+def count_queries(sender, connection, **kwargs):
+    """Соединение переоткрывается после каждого запроса к серверу."""
+    if QUERIES not in connection.execute_wrappers:
+        connection.execute_wrappers.append(QUERIES)
+
+
+def with_query_count(application):
+    """WSGI-приложение, сообщающее число запросов в заголовке X-Queries."""
+    def wrapper(environ, start_response):
+        QUERIES.count = 0
+
+        def start(status, headers, exc_info=None):
+            headers.append(('X-Queries', str(QUERIES.count)))
+            return start_response(status, headers, exc_info)
+
+        return application(environ, start)
+    return wrapper
+
+
+class ClientTransport:
+    """Тестовый Client: запрос выполняется в потоке вызывающего."""
+
+    def __init__(self, user=None):
+        from django.test import Client
+
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self, method, path, params):
+        QUERIES.count = 0
+        if method == 'GET':
+            response = self.client.get(path, params)
+        else:
+            response = self.client.post(path, params or {})
+        return response.status_code, QUERIES.count
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """Keep-alive соединение с WSGI-сервером и cookie сессии."""
+
+    def __init__(self, address, user=None):
+        from django.conf import settings
+        from django.test import Client
+
+        cookies = {settings.CSRF_COOKIE_NAME: CSRF_TOKEN}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookies[settings.SESSION_COOKIE_NAME] = client.cookies[
+                settings.SESSION_COOKIE_NAME
+            ].value
+        self.headers = {
+            'Cookie': '; '.join(f'{k}={v}' for k, v in cookies.items()),
+            'X-CSRFToken': CSRF_TOKEN,
+        }
+        self.connection = http.client.HTTPConnection(*address)
+
+    def request(self, method, path, params):
+        headers = dict(self.headers)
+        body = None
+        if method == 'GET':
+            if params:
+                path = f'{path}?{urlencode(params)}'
+        else:
+            body = urlencode(params or {})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+        return response.status, int(response.getheader('X-Queries', 0))
+
+    def close(self):
+        self.connection.close()
+
+
+class Stats:
+    """Задержки, статусы и число SQL-запросов по каждому URL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, endpoint, latency, status, queries):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.queries[endpoint].append(queries)
+            self.statuses[endpoint][status] += 1
+
+    def summary(self, latencies, queries, statuses, elapsed):
+        latencies = sorted(latencies)
+        return {
+            'requests': len(latencies),
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p95': percentile(latencies, 0.95) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'queries': statistics.mean(queries) if queries else 0,
+            'errors': sum(
+                count for status, count in statuses.items()
+                if not isinstance(status, int) or status >= 400
+            ),
+            'statuses': {
+                str(status): count for status, count in statuses.items()
+            },
+        }
+
+    def report(self, elapsed):
+        endpoints = {
+            endpoint: self.summary(
+                self.latencies[endpoint], self.queries[endpoint],
+                self.statuses[endpoint], elapsed,
+            )
+            for endpoint in sorted(self.latencies)
+        }
+        total = self.summary(
+            [value for values in self.latencies.values() for value in values],
+            [value for values in self.queries.values() for value in values],
+            sum(self.statuses.values(), Counter()),
+            elapsed,
+        )
+        return endpoints, total
+
+
+def worker(number, args, data, make_transport, deadline, stats):
+    """Поток, выполняющий сценарии до deadline от имени своего пользователя."""
+    from django.db import connection
+    from django.urls import reverse
+
+    rng = random.Random(args.seed * 1000 + number)
+    user = data['users'][number % len(data['users'])]
+    transports = {False: make_transport(), True: make_transport(user)}
+    names, weights = zip(*args.mix.items())
+    iteration = 0
+    while time.monotonic() < deadline:
+        scenario, needs_login = SCENARIOS[args.project][
+            rng.choices(names, weights)[0]
+        ]
+        transport = transports[needs_login]
+        steps = scenario(rng, data, f'{number}-{iteration}')
+        for method, url_name, url_args, params in steps:
+            path = reverse(url_name, args=url_args)
+            started = time.perf_counter()
+            try:
+                status, queries = transport.request(method, path, params)
+            except (OSError, http.client.HTTPException) as error:
+                status, queries = type(error).__name__, 0
+            stats.record(
+                f'{method} {url_name}', time.perf_counter() - started,
+                status, queries,
+            )
+        iteration += 1
+    for transport in transports.values():
+        transport.close()
+    connection.close()
+
+
+def prepare(args):
+    """Данные для сценариев во временной базе."""
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    if args.project == 'ya_news':
+        from news.models import News
+
+        call_command(
+            'seed', users=args.users, news=args.news,
+            comments=args.comments, seed=args.seed, stdout=StringIO(),
+        )
+        data = {
+            'news': list(
+                News.objects.order_by('pk').values_list('pk', flat=True)
+            ),
+        }
+    else:
+        call_command(
+            'seed', users=args.users, notes=args.notes, seed=args.seed,
+            stdout=StringIO(),
+        )
+        data = {}
+    data['users'] = list(
+        get_user_model().objects.order_by('pk')[:args.concurrency]
+    )
+    return data
+
+
+def start_server():
+    """WSGI-сервер Django на свободном порту в фоновом потоке."""
+    from django.core.servers.basehttp import ThreadedWSGIServer
+    from django.core.wsgi import get_wsgi_application
+    from django.test.testcases import QuietWSGIRequestHandler
+
+    server = ThreadedWSGIServer(
+        ('127.0.0.1', 0), QuietWSGIRequestHandler, allow_reuse_address=False
+    )
+    server.set_app(with_query_count(get_wsgi_application()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    os.environ.setdefault('DJANGO_DEBUG', 'False')
+    setup_django(args.project)
+    from django.conf import settings
+    from django.db.backends.signals import connection_created
+    from django.test.utils import setup_test_environment
+
+    connection_created.connect(count_queries)
+    directory = tempfile.TemporaryDirectory()
+    settings.DATABASES['default']['NAME'] = Path(directory.name) / 'db.sqlite3'
+    data = prepare(args)
+    if args.server == 'wsgi':
+        server = start_server()
+        address = server.server_address
+
+        def make_transport(user=None):
+            return HttpTransport(address, user)
+    else:
+        setup_test_environment()
+        make_transport = ClientTransport
+
+    stats = Stats()
+    started = time.monotonic()
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(
+                number, args, data, make_transport,
+                started + args.duration, stats,
+            ),
+        )
+        for number in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    endpoints, total = stats.report(time.monotonic() - started)
+    if args.server == 'wsgi':
+        server.shutdown()
+    directory.cleanup()
+    return {
+        'commit': current_commit(),
+        'project': args.project,
+        'server': args.server,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'mix': args.mix,
+        'seed': args.seed,
+        'endpoints': endpoints,
+        'total': total,
+    }
+
+
+def print_results(results):
+    print(
+        f'{results["project"]}, {results["server"]}, коммит '
+        f'{results["commit"]}, потоков {results["concurrency"]}'
+    )
+    print(
+        f'{"URL":>24} {"запросов":>9} {"в с":>7} {"p50, мс":>8} '
+        f'{"p95, мс":>8} {"p99, мс":>8} {"SQL":>5} {"ошибок":>7}'
+    )
+    rows = [*results['endpoints'].items(), ('всего', results['total'])]
+    for name, row in rows:
+        print(
+            f'{name:>24} {row["requests"]:>9} {row["rps"]:>7.1f} '
+            f'{row["p50"]:>8.1f} {row["p95"]:>8.1f} {row["p99"]:>8.1f} '
+            f'{row["queries"]:>5.1f} {row["errors"]:>7}'
+        )
+
+
+def change(before, after):
+    if before is None or after is None:
+        return '—'
+    if not before:
+        return f'{after:.1f}'
+    return f'{after:.1f} ({(after - before) / before:+.0%})'
+
+
+def compare(before_path, after_path):
+    """Значения второго прогона и изменение относительно первого."""
+    before, after = (
+        json.loads(Path(path).read_text(encoding='utf-8'))
+        for path in (before_path, after_path)
+    )
+    print(f'{before["commit"]} → {after["commit"]}')
+    print(f'{"URL":>24} ' + ' '.join(f'{name:>16}' for name in METRICS))
+    names = sorted(before['endpoints'].keys() | after['endpoints'].keys())
+    rows = [
+        *(
+            (
+                name, before['endpoints'].get(name, {}),
+                after['endpoints'].get(name, {}),
+            )
+            for name in names
+        ),
+        ('всего', before['total'], after['total']),
+    ]
+    for name, old, new in rows:
+        print(f'{name:>24} ' + ' '.join(
+            f'{change(old.get(metric), new.get(metric)):>16}'
+            for metric in METRICS
+        ))
+
+
+def parse_mix(value):
+    """Строку вида reader=8,commenter=1 превращает в словарь весов."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--project', choices=SCENARIOS, default='ya_news')
+    parser.add_argument('--server', choices=('client', 'wsgi'),
+                        default='client')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument(
+        '--mix', type=parse_mix,
+        help='Веса сценариев, по умолчанию '
+        + '; '.join(f'{name}: {mix}' for name, mix in DEFAULT_MIX.items()),
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--news', type=int, default=1000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--notes', type=int, default=5000)
+    parser.add_argument('--output', type=Path, help='Куда сохранить JSON.')
+    parser.add_argument(
+        '--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+        help='Сравнить два сохранённых прогона.',
+    )
+    args = parser.parse_args()
+    if args.compare:
+        return compare(*args.compare)
+
+    args.mix = args.mix or parse_mix(DEFAULT_MIX[args.project])
+    unknown = args.mix.keys() - SCENARIOS[args.project].keys()
+    if unknown:
+        parser.error(f'неизвестные сценарии: {", ".join(sorted(unknown))}')
+    results = run(args)
+    print_results(results)
+    if args.output:
+        args.output.write_text(
+            json.dumps(results, ensure_ascii=False, indent=2),
+            encoding='utf-8',
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Время отдачи страницы новости с тысячами комментариев.
+
+    python -m benchmarks.render --comments 5000
+
+Страница запрашивается авторизованным пользователем, поэтому кэш
+страниц не участвует. Замеряются три случая: без кэша (DummyCache),
+с холодным кэшем фрагментов и с прогретым. Отладка выключена, то есть
+шаблоны берутся из cached.Loader.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from . import setup_django
+
+DUMMY_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def timed(function, repeat, before=None):
+    """Медиана времени вызова в миллисекундах."""
+    durations = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ['DJANGO_DEBUG'] = 'False'
+    setup_django('ya_news')
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    from news.models import Comment, News
+
+    directory = tempfile.TemporaryDirectory()
+    settings.DATABASES['default']['NAME'] = Path(directory.name) / 'db.sqlite3'
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = args.comments
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    author = get_user_model().objects.create(username='Автор')
+    news = News.objects.create(title='Новость', text='Текст новости')
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Комментарий {number}\n' * 3)
+        for number in range(args.comments)
+    )
+    client = Client()
+    client.force_login(author)
+    url = reverse('news:detail', args=(news.pk,))
+
+    def get():
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+
+    with override_settings(CACHES=DUMMY_CACHE):
+        client.force_login(author)
+        without_cache = timed(get, args.repeat)
+    client.force_login(author)
+    cold = timed(get, args.repeat, before=cache.clear)
+    warm = timed(get, args.repeat)
+    print(f'комментариев: {args.comments}')
+    print(f'без кэша: {without_cache:.1f} мс')
+    print(f'холодный кэш фрагментов: {cold:.1f} мс')
+    print(f'прогретый кэш фрагментов: {warm:.1f} мс')
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
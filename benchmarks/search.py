@@ -0,0 +1,141 @@
+"""
+Задержка полнотекстового поиска на синтетическом корпусе.
+
+    python -m benchmarks.search --rows 1000000
+
+Корпус создаётся во временной базе: пятая часть строк — новости,
+остальное — комментарии. Слова берутся из словаря с распределением
+Ципфа, поэтому среди запросов есть частые, средние и редкие слова.
+Для сравнения замеряется LIKE '%слово%' по текстам новостей.
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from itertools import accumulate
+from pathlib import Path
+
+from . import setup_django
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(ALPHABET, k=rng.randint(4, 10))))
+    return sorted(words, key=lambda word: rng.random())
+
+
+def make_texts(rng, vocabulary, count, length):
+    weights = list(accumulate(
+        1 / rank for rank in range(1, len(vocabulary) + 1)
+    ))
+    for _ in range(count):
+        yield ' '.join(rng.choices(vocabulary, cum_weights=weights, k=length))
+
+
+def fill(rows, vocabulary, rng, chunk=50000):
+    """Вставляет корпус сырыми запросами; индекс заполняют триггеры."""
+    from django.contrib.auth import get_user_model
+    from django.db import connection, transaction
+
+    author = get_user_model().objects.create(username='Автор')
+    news_count = max(rows // 5, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        texts = make_texts(rng, vocabulary, news_count, 60)
+        for start in range(0, news_count, chunk):
+            cursor.executemany(
+                'INSERT INTO news_news '
+                '(title, text, date, comment_count, updated) '
+                "VALUES (%s, %s, date('now'), 0, datetime('now'))",
+                [
+                    (' '.join(rng.sample(vocabulary[:5000], 4)), text)
+                    for text, _ in zip(texts, range(chunk))
+                ],
+            )
+        texts = make_texts(rng, vocabulary, rows - news_count, 20)
+        for start in range(0, rows - news_count, chunk):
+            cursor.executemany(
+                'INSERT INTO news_comment '
+                '(news_id, author_id, text, created, updated) '
+                "VALUES (%s, %s, %s, datetime('now'), datetime('now'))",
+                [
+                    (rng.randint(1, news_count), author.pk, text)
+                    for text, _ in zip(texts, range(chunk))
+                ],
+            )
+
+
+def timed(function, repeat):
+    """Медиана времени вызова в миллисекундах и последний результат."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--vocabulary', type=int, default=50_000)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django('ya_news')
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    from news import search
+
+    directory = tempfile.TemporaryDirectory()
+    settings.DATABASES['default']['NAME'] = Path(directory.name) / 'db.sqlite3'
+    call_command('migrate', verbosity=0)
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    started = time.perf_counter()
+    fill(args.rows, vocabulary, rng)
+    search.optimize()
+    elapsed = time.perf_counter() - started
+    print(f'корпус: {args.rows} строк за {elapsed:.0f} с')
+
+    queries = {
+        'частое слово': vocabulary[5],
+        'среднее слово': vocabulary[500],
+        'редкое слово': vocabulary[20000],
+        'два слова': f'{vocabulary[5]} {vocabulary[50]}',
+        'префикс': vocabulary[100][:3],
+    }
+    print(
+        f'{"запрос":>14} {"стр. 1, мс":>11} {"стр. N, мс":>11} '
+        f'{"LIKE, мс":>9}'
+    )
+    for name, query in queries.items():
+        first, page = timed(lambda: search.search(query), args.repeat)
+        cursor = page.next_cursor
+        for _ in range(args.pages - 2):
+            if cursor:
+                cursor = search.search(query, cursor).next_cursor
+        deep, _ = timed(lambda: search.search(query, cursor), args.repeat)
+
+        def like():
+            with connection.cursor() as db:
+                db.execute(
+                    'SELECT id FROM news_news WHERE text LIKE %s LIMIT 21',
+                    [f'%{query.split()[0]}%'],
+                )
+                return db.fetchall()
+
+        scan, _ = timed(like, args.repeat)
+        print(f'{name:>14} {first:>11.1f} {deep:>11.1f} {scan:>9.1f}')
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Время и число запросов авторизованного запроса с разными сессиями.
+
+    python -m benchmarks.sessions --requests 500
+
+Для каждого проекта и каждого значения SESSION_PROFILE во временной
+базе создаётся пользователь, который затем открывает одну и ту же
+страницу: архив новостей в ya_news и список заметок в ya_note. Каждая
+комбинация запускается в отдельном процессе, так как SESSION_PROFILE
+читается при загрузке настроек. Для cached_db кэш сессий лежит в том же
+временном каталоге (SESSION_CACHE_DIR).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from . import ROOT_DIR, setup_django
+
+PROFILES = ('db', 'cached_db', 'signed_cookies')
+PAGES = {
+    'ya_news': 'news:archive',
+    'ya_note': 'notes:list',
+}
+
+
+def run_profile(args):
+    """Замер одной комбинации; результат печатается строкой JSON."""
+    setup_django(args.project)
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+    from django.urls import reverse
+
+    settings.DATABASES['default']['NAME'] = args.database
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    client = Client()
+    client.force_login(get_user_model().objects.create(username='Читатель'))
+    url = reverse(PAGES[args.project])
+    client.get(url)
+    durations = []
+    queries = []
+    for _ in range(args.requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            durations.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.status_code
+        queries.append(len(captured))
+    print(json.dumps({
+        'median': statistics.median(durations),
+        'p95': statistics.quantiles(durations, n=20)[-1],
+        'queries': statistics.mean(queries),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument(
+        '--project', choices=PAGES, action='append', dest='projects'
+    )
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        args.project, = args.projects
+        return run_profile(args)
+
+    print(
+        f'{"проект":>8} {"сессии":>15} {"медиана, мс":>12} '
+        f'{"p95, мс":>8} {"запросов":>9}'
+    )
+    for project in args.projects or PAGES:
+        for profile in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                output = subprocess.run(
+                    [
+                        sys.executable, '-m', 'benchmarks.sessions',
+                        '--requests', str(args.requests),
+                        '--project', project, '--profile', profile,
+                        '--database', str(Path(directory) / 'db.sqlite3'),
+                    ],
+                    cwd=ROOT_DIR,
+                    env={
+                        **os.environ,
+                        'SESSION_PROFILE': profile,
+                        'SESSION_CACHE_DIR': str(Path(directory) / 'sessions'),
+                    },
+                    capture_output=True, text=True, check=True,
+                ).stdout
+            stats = json.loads(output.splitlines()[-1])
+            print(
+                f'{project:>8} {profile:>15} {stats["median"]:>12.2f} '
+                f'{stats["p95"]:>8.2f} {stats["queries"]:>9.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
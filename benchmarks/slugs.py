@@ -0,0 +1,115 @@
+"""
+Подбор slug для заметок с одинаковыми заголовками.
+
+    python -m benchmarks.slugs --notes 5000 --naive-notes 500
+
+Во временной базе через NoteForm создаются notes заметок с одним и тем
+же заголовком и пустым slug. Для сравнения naive_notes заметок
+создаются с наивным подбором, который проверяет base, base-2, base-3...
+по одному запросу на попытку: его время растёт квадратично, поэтому
+заметок для него меньше.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from . import setup_django
+
+TITLE = 'Встреча'
+
+
+def naive_slug(title):
+    from pytils.translit import slugify
+
+    from notes.models import Note
+
+    base = slug = slugify(title)
+    number = 1
+    while Note.objects.filter(slug=slug).exists():
+        number += 1
+        slug = f'{base}-{number}'
+    return slug
+
+
+def create_with_form(author):
+    from notes.forms import NoteForm
+
+    form = NoteForm(data={'title': TITLE, 'text': 'Текст', 'slug': ''})
+    assert form.is_valid(), form.errors
+    form.instance.author = author
+    return form.save()
+
+
+def create_naive(author):
+    from notes.models import Note
+
+    return Note.objects.create(
+        title=TITLE, text='Текст', slug=naive_slug(TITLE), author=author
+    )
+
+
+class QueryCounter:
+    """Обёртка запросов, которая их только считает."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(create, author, notes):
+    """Общее время и запросы на первую и последнюю заметку."""
+    from django.db import connection
+
+    from notes.models import Note
+
+    Note.objects.all().delete()
+    queries = []
+    started = time.perf_counter()
+    for _ in range(notes):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            create(author)
+        queries.append(counter.count)
+    elapsed = time.perf_counter() - started
+    slugs = Note.objects.values_list('slug', flat=True)
+    assert len(set(slugs)) == notes
+    return elapsed, queries[0], queries[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=5000)
+    parser.add_argument('--naive-notes', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django('ya_note')
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    directory = tempfile.TemporaryDirectory()
+    settings.DATABASES['default']['NAME'] = Path(directory.name) / 'db.sqlite3'
+    call_command('migrate', verbosity=0)
+    author = get_user_model().objects.create(username='Автор')
+    print(
+        f'{"подбор":>8} {"заметок":>8} {"всего, с":>9} {"мс/заметку":>11} '
+        f'{"запросов: первая":>17} {"последняя":>10}'
+    )
+    for name, create, notes in (
+        ('NoteForm', create_with_form, args.notes),
+        ('наивный', create_naive, args.naive_notes),
+    ):
+        elapsed, first, last = measure(create, author, notes)
+        print(
+            f'{name:>8} {notes:>8} {elapsed:>9.2f} '
+            f'{elapsed / notes * 1000:>11.2f} {first:>17} {last:>10}'
+        )
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
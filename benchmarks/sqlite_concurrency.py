@@ -0,0 +1,131 @@
+"""
+Одновременные чтение и запись в SQLite для обычного и боевого профиля.
+
+    python -m benchmarks.sqlite_concurrency --readers 8 --writers 4
+
+Для каждого профиля во временной базе создаются новости, затем потоки
+читателей открывают страницы новостей, а потоки писателей оставляют
+комментарии. Каждый профиль запускается в отдельном процессе, так как
+DB_PROFILE читается при загрузке настроек.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from . import ROOT_DIR, setup_django
+
+PROFILES = ('default', 'production')
+
+
+def prepare(news_count):
+    """Схема, пользователи и новости во временной базе."""
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from news.models import News
+
+    call_command('migrate', verbosity=0)
+    News.objects.bulk_create(
+        News(title=f'Новость {number}', text='Текст')
+        for number in range(news_count)
+    )
+    return get_user_model().objects.create(username='Нагрузка')
+
+
+def worker(user, paths, method, deadline, stats):
+    """Поток, отправляющий запросы тестовым клиентом до deadline."""
+    from django.db import OperationalError, connection
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    number = 0
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        try:
+            if method == 'post':
+                client.post(path, {'text': f'Комментарий {number}'})
+            else:
+                client.get(path)
+        except OperationalError as error:
+            stats[f'{method}: {error}'] += 1
+        else:
+            stats[method] += 1
+    connection.close()
+
+
+def run_profile(args):
+    """Замер одного профиля; результат печатается строкой JSON."""
+    setup_django('ya_news')
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    settings.DATABASES['default']['NAME'] = args.database
+    setup_test_environment()
+    user = prepare(args.news)
+    paths = [reverse('news:detail', args=(pk,)) for pk in range(1, 21)]
+    stats = Counter()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker, args=(user, paths, method, deadline, stats)
+        )
+        for method, count in (('get', args.readers), ('post', args.writers))
+        for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--news', type=int, default=100)
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        return run_profile(args)
+
+    print(f'{"профиль":>10} {"чтений/с":>9} {"записей/с":>10} {"ошибок":>7}')
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            output = subprocess.run(
+                [
+                    sys.executable, '-m', 'benchmarks.sqlite_concurrency',
+                    *sys.argv[1:], '--profile', profile,
+                    '--database', str(Path(directory) / 'db.sqlite3'),
+                ],
+                cwd=ROOT_DIR, env={**os.environ, 'DB_PROFILE': profile},
+                capture_output=True, text=True, check=True,
+            ).stdout
+        stats = json.loads(output.splitlines()[-1])
+        errors = {
+            name: count for name, count in stats.items()
+            if name not in ('get', 'post')
+        }
+        print(
+            f'{profile:>10} {stats.get("get", 0) / args.duration:>9.0f} '
+            f'{stats.get("post", 0) / args.duration:>10.0f} '
+            f'{sum(errors.values()):>7}'
+        )
+        for name, count in errors.items():
+            print(f'{"":>10} {count} × {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""
+Общие для ya_news и ya_note инструменты замеров производительности.
+
+Метрики для /metrics, замеры Server-Timing, сводка запросов с командой
+slow_queries, очистка сессий и проверка планов запросов в тестах.
+Пакет лежит в корне репозитория; настройки обоих проектов добавляют
+корень в sys.path и подключают приложение performance.
+"""
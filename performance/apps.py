@@ -0,0 +1,6 @@
+from django.apps import AppConfig
+
+
+class PerformanceConfig(AppConfig):
+    name = 'performance'
+    verbose_name = 'Производительность'
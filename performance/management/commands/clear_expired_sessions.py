@@ -0,0 +1,38 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет истёкшие сессии из базы порциями, чтобы не держать '
+        'блокировку записи на всё время очистки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько сессий удалять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Пауза между порциями в секундах.',
+        )
+
+    def handle(self, *args, batch_size=1000, pause=0, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while keys := list(
+            expired.values_list('pk', flat=True)[:batch_size]
+        ):
+            deleted += Session.objects.filter(pk__in=keys).delete()[0]
+            if pause:
+                time.sleep(pause)
+        self.stdout.write(f'Удалено истёкших сессий: {deleted}.')
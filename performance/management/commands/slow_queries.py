@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from performance import querystats
+
+ORDERINGS = ('total_ms', 'count', 'p99_ms', 'max_ms')
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает самые дорогие по сводке performance.querystats запросы '
+        'из представлений всех процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Сколько отпечатков показать.',
+        )
+        parser.add_argument(
+            '--order', choices=ORDERINGS, default='total_ms',
+            help='Поле сортировки; count выделяет N+1.',
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help=(
+                'После вывода начать сводку заново, в том числе '
+                'в работающих процессах.'
+            ),
+        )
+
+    def handle(self, *args, limit=10, order='total_ms', reset=False,
+               **options):
+        entries = sorted(
+            querystats.load().items(),
+            key=lambda item: item[1][order],
+            reverse=True,
+        )
+        self.stdout.write(
+            f'{"запросов":>9} {"всего мс":>10} {"p50 мс":>8} '
+            f'{"p99 мс":>8} {"max мс":>8}  представление'
+        )
+        for fingerprint, entry in entries[:limit]:
+            view, _ = entry['views'].most_common(1)[0]
+            self.stdout.write(
+                f'{entry["count"]:>9} {entry["total_ms"]:>10.1f} '
+                f'{entry["p50_ms"]:>8.2f} {entry["p99_ms"]:>8.2f} '
+                f'{entry["max_ms"]:>8.2f}  {view}\n    {fingerprint}'
+            )
+        if reset:
+            querystats.reset()
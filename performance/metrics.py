@@ -0,0 +1,226 @@
+"""
+Метрики процесса в текстовом формате Prometheus для /metrics.
+
+Каждый поток копит значения в собственном словаре, поэтому запись
+обходится без блокировок; блокировка берётся только при первой записи
+нового потока, при его завершении, когда значения потока переносятся
+в общий итог завершённых, и при сборе. Если задан METRICS_DIR, процесс раз в
+METRICS_FLUSH_INTERVAL секунд и при выходе сохраняет свои итоги в файл
+этого каталога, а /metrics складывает файлы всех процессов, так что
+любой воркер отдаёт общую картину.
+
+Общие метрики перечислены в METRICS, свои метрики проекта — в настройке
+METRICS_EXTRA.
+"""
+import atexit
+import json
+import os
+import threading
+import weakref
+from collections import defaultdict
+from functools import partial
+from itertools import count
+from pathlib import Path
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+METRICS = {
+    'http_request_duration_seconds': (
+        'histogram', 'Время ответа по имени маршрута и статусу.'
+    ),
+    'db_queries_total': ('counter', 'Запросы к базе.'),
+    'db_query_duration_seconds_total': (
+        'counter', 'Суммарное время запросов к базе.'
+    ),
+    'writes_total': (
+        'counter', 'Зафиксированные записи моделей по действию.'
+    ),
+}
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+local = threading.local()
+# Словари живых потоков по номеру и сумма значений завершённых.
+registry = {}
+retired = defaultdict(float)
+registry_lock = threading.Lock()
+thread_numbers = count()
+last_flush = 0.0
+
+
+class ThreadMark:
+    """Лежит в local потока и собирается, когда поток завершается."""
+
+
+def retire(number):
+    with registry_lock:
+        for key, value in registry.pop(number).items():
+            retired[key] += value
+
+
+def thread_values():
+    try:
+        return local.values
+    except AttributeError:
+        values = local.values = defaultdict(float)
+        number = next(thread_numbers)
+        with registry_lock:
+            registry[number] = values
+        local.mark = ThreadMark()
+        weakref.finalize(local.mark, retire, number)
+        return values
+
+
+def inc(name, amount=1, **labels):
+    thread_values()[name, tuple(sorted(labels.items()))] += amount
+
+
+def observe(name, value, **labels):
+    """Наблюдение гистограммы; корзины хранятся без накопления."""
+    for bound in settings.METRICS_BUCKETS:
+        if value <= bound:
+            break
+    else:
+        bound = '+Inf'
+    inc(f'{name}_bucket', le=bound, **labels)
+    inc(f'{name}_sum', value, **labels)
+    inc(f'{name}_count', **labels)
+
+
+def totals():
+    """Итоги процесса по всем потокам."""
+    result = defaultdict(float)
+    with registry_lock:
+        snapshots = [retired.copy()]
+        snapshots += [values.copy() for values in registry.values()]
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            result[key] += value
+    return result
+
+
+def flush():
+    """Сохраняет итоги процесса в METRICS_DIR, если он задан."""
+    global last_flush
+    last_flush = monotonic()
+    if not settings.METRICS_DIR:
+        return
+    path = Path(settings.METRICS_DIR) / f'{os.getpid()}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+    temporary.write_text(json.dumps([
+        [name, labels, value]
+        for (name, labels), value in totals().items()
+    ]))
+    os.replace(temporary, path)
+
+
+def flush_if_due():
+    if monotonic() - last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def collect():
+    """Итоги всех процессов в многопроцессном режиме, иначе этого."""
+    if not settings.METRICS_DIR:
+        return totals()
+    flush()
+    result = defaultdict(float)
+    for path in Path(settings.METRICS_DIR).glob('*.json'):
+        for name, labels, value in json.loads(path.read_text()):
+            result[name, tuple(map(tuple, labels))] += value
+    return result
+
+
+def format_labels(labels):
+    return '{' + ','.join(
+        f'{name}="{value}"' for name, value in labels
+    ) + '}' if labels else ''
+
+
+def histogram_lines(name, values):
+    """Накопленные корзины, _sum и _count для каждого набора меток."""
+    bounds = [*settings.METRICS_BUCKETS, '+Inf']
+    series = {
+        tuple(label for label in labels if label[0] != 'le')
+        for (metric, labels) in values if metric == f'{name}_count'
+    }
+    for labels in sorted(series):
+        cumulative = 0
+        for bound in bounds:
+            cumulative += values.get(
+                (f'{name}_bucket', tuple(sorted((*labels, ('le', bound))))),
+                0,
+            )
+            yield (
+                f'{name}_bucket{format_labels((*labels, ("le", bound)))} '
+                f'{cumulative:g}'
+            )
+        for suffix in ('_sum', '_count'):
+            yield (
+                f'{name}{suffix}{format_labels(labels)} '
+                f'{values[f"{name}{suffix}", labels]:g}'
+            )
+
+
+def render(values):
+    lines = []
+    for name, (kind, help_text) in {
+        **METRICS, **settings.METRICS_EXTRA
+    }.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'histogram':
+            lines += histogram_lines(name, values)
+            continue
+        lines += sorted(
+            f'{name}{format_labels(labels)} {value:g}'
+            for (metric, labels), value in values.items()
+            if metric == name
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def count_write(model, action):
+    """Считает запись модели, когда транзакция зафиксирована."""
+    transaction.on_commit(partial(
+        inc, 'writes_total', model=model._meta.model_name, action=action,
+    ))
+
+
+def count_query(execute, sql, params, many, context):
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        inc('db_query_duration_seconds_total', perf_counter() - started)
+        inc('db_queries_total')
+
+
+def add_wrapper(connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def install():
+    """Считает запросы на открытых и будущих соединениях процесса."""
+    connection_created.connect(add_wrapper, dispatch_uid=__name__)
+    for connection in connections.all(initialized_only=True):
+        add_wrapper(connection)
+
+
+atexit.register(flush)
+
+
+def export(request):
+    """Страница /metrics; при заданном METRICS_TOKEN нужен Bearer-токен."""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        raise PermissionDenied
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,245 @@
+"""Замеры запросов: метрики, Server-Timing и сводка SQL."""
+import json
+import logging
+import random
+import threading
+import tracemalloc
+from contextlib import ExitStack
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics, querystats
+
+logger = logging.getLogger(__name__)
+# tracemalloc общий на процесс, память считает один запрос за раз.
+memory_lock = threading.Lock()
+
+
+def observe_request(request, response, started):
+    match = request.resolver_match
+    metrics.observe(
+        'http_request_duration_seconds', perf_counter() - started,
+        view=match.view_name if match else 'unmatched',
+        status=str(response.status_code),
+    )
+    metrics.flush_if_due()
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Время ответов для /metrics; заодно включает счётчик запросов к базе."""
+    metrics.install()
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = perf_counter()
+            response = await get_response(request)
+            return observe_request(request, response, started)
+    else:
+        def middleware(request):
+            started = perf_counter()
+            return observe_request(request, get_response(request), started)
+    return middleware
+
+
+class RequestTiming:
+    """Замеры одного запроса; сам служит обёрткой SQL-запросов."""
+
+    def __init__(self, request):
+        self.request = request
+        self.started = perf_counter()
+        self.view_started = self.render_started = None
+        self.view_time = self.render_time = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.peak = None
+        self.stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.sql_count += 1
+
+    def __enter__(self):
+        for alias in connections:
+            self.stack.enter_context(connections[alias].execute_wrapper(self))
+        if memory_lock.acquire(blocking=False):
+            self.stack.callback(memory_lock.release)
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self.stack.callback(tracemalloc.stop)
+            self.stack.callback(self.read_peak)
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.stack.__exit__(*exc_info)
+
+    def read_peak(self):
+        self.peak = tracemalloc.get_traced_memory()[1]
+
+    def start_view(self):
+        self.view_started = perf_counter()
+
+    def start_render(self, response):
+        self.render_started = perf_counter()
+        response.add_post_render_callback(self.finish_render)
+
+    def finish_render(self, response):
+        self.render_time = perf_counter() - self.render_started
+
+    def metrics(self, response):
+        finished = perf_counter()
+        if self.view_started is not None:
+            self.view_time = (
+                (self.render_started or finished) - self.view_started
+            )
+        match = self.request.resolver_match
+        return {
+            'url_name': match.view_name if match else None,
+            'method': self.request.method,
+            'status': response.status_code,
+            'total_ms': (finished - self.started) * 1000,
+            'view_ms': self.view_time and self.view_time * 1000,
+            'render_ms': self.render_time and self.render_time * 1000,
+            'sql_count': self.sql_count,
+            'sql_ms': self.sql_time * 1000,
+            'peak_kib': self.peak and self.peak // 1024,
+        }
+
+    def finish(self, response):
+        metrics = self.metrics(response)
+        timings = [
+            ('total', metrics['total_ms'], None),
+            ('view', metrics['view_ms'], None),
+            ('render', metrics['render_ms'], None),
+            ('db', metrics['sql_ms'], f'{metrics["sql_count"]} SQL'),
+        ]
+        header = [
+            f'{name};dur={duration:.1f}' + (f';desc="{desc}"' if desc else '')
+            for name, duration, desc in timings if duration is not None
+        ]
+        if metrics['peak_kib'] is not None:
+            header.append(f'mem;desc="{metrics["peak_kib"]} KiB"')
+        response.headers['Server-Timing'] = ', '.join(header)
+        logger.info(json.dumps(metrics, ensure_ascii=False))
+        return response
+
+
+class TimingMiddleware:
+    """
+    Замеры выборочных запросов: SQL, представление, шаблон и память.
+
+    Долю замеряемых запросов задаёт PERFORMANCE_SAMPLE_RATE; при нуле
+    middleware отключается при загрузке и ничего не стоит. Итог уходит
+    в заголовок Server-Timing и строкой JSON в лог performance.middleware.
+    Шаблон, отрисованный внутри представления, а не через
+    TemplateResponse, входит во время представления.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.rate = settings.PERFORMANCE_SAMPLE_RATE
+        if not self.rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Иначе Django выполнял бы синхронные хуки в отдельном потоке.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= self.rate:
+            return self.get_response(request)
+        with RequestTiming(request) as timing:
+            request.timing = timing
+            response = self.get_response(request)
+        return timing.finish(response)
+
+    async def __acall__(self, request):
+        if random.random() >= self.rate:
+            return await self.get_response(request)
+        # Соединения с базой у синхронного потока ORM свои, поэтому
+        # обёртка запросов ставится и снимается в нём же.
+        timing = RequestTiming(request)
+        await sync_to_async(timing.__enter__)()
+        request.timing = timing
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(timing.stack.close)()
+        return timing.finish(response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'timing'):
+            request.timing.start_view()
+
+    def process_template_response(self, request, response):
+        if hasattr(request, 'timing'):
+            request.timing.start_render(response)
+        return response
+
+    async def aprocess_view(self, request, *args):
+        return TimingMiddleware.process_view(self, request, *args)
+
+    async def aprocess_template_response(self, request, response):
+        return TimingMiddleware.process_template_response(
+            self, request, response
+        )
+
+
+class QueryStatsMiddleware:
+    """
+    Включает сводку запросов performance.querystats, если QUERY_STATS истинно.
+
+    Запомненное в process_view имя представления попадает в сводку;
+    запросы остальных middleware до представления не учитываются.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_STATS:
+            raise MiddlewareNotUsed
+        querystats.install()
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            querystats.current_view.set(None)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            querystats.current_view.set(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        querystats.current_view.set(request.resolver_match.view_name)
+
+    async def aprocess_view(self, request, *args):
+        return QueryStatsMiddleware.process_view(self, request, *args)
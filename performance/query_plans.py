@@ -0,0 +1,73 @@
+"""
+Проверка планов запросов SQLite в тестах обоих проектов.
+
+Плохой план — полный просмотр таблицы или индекса либо временная
+сортировка. Обход индекса по порядку допустим, только если запрос
+читает одну таблицу без фильтра и его обрывает LIMIT: тогда SQLite
+читает ровно LIMIT строк. Полнотекстовый поиск читает только
+найденные MATCH строки и может сортировать их по рангу.
+"""
+import re
+
+from django.db import connection
+
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\S+)')
+INDEX_WALK = re.compile(r'^SCAN \S+ USING (?:COVERING )?INDEX ')
+# Флаг M в idxStr FTS5 означает ограничение MATCH.
+FTS_MATCH = re.compile(r'^SCAN \S+ VIRTUAL TABLE INDEX \d+:\S*M')
+READ = re.compile(r'^(?:SCAN|SEARCH) ')
+ORDERED_LIMIT = re.compile(r'\bORDER BY\b.*\bLIMIT \d+', re.DOTALL)
+# Всё, что может заставить обход прочитать больше LIMIT строк.
+RESIDUAL = re.compile(r'\b(?:WHERE|JOIN|GROUP BY|HAVING)\b')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def query_plan(sql):
+    """Строки плана, которые SQLite выдаёт для запроса."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def bounded_walk(step, sql):
+    """Шаг — обход индекса по ORDER BY, который обрывает LIMIT."""
+    return bool(
+        INDEX_WALK.match(step)
+        and ORDERED_LIMIT.search(sql)
+        and not RESIDUAL.search(sql)
+    )
+
+
+def full_scan(step, sql, whole_tables=()):
+    """Шаг плана читает таблицу или индекс целиком."""
+    match = FULL_SCAN.match(step)
+    if match is None or match[1] in whole_tables:
+        return False
+    return not (FTS_MATCH.match(step) or bounded_walk(step, sql))
+
+
+def bad_plan(plan, sql, whole_tables=()):
+    """План читает таблицу целиком или сортирует не только найденное."""
+    reads = [step for step in plan if READ.match(step)]
+    if any(full_scan(step, sql, whole_tables) for step in reads):
+        return True
+    return any(TEMP_SORT in step for step in plan) and not (
+        reads and all(FTS_MATCH.match(step) for step in reads)
+    )
+
+
+def bad_plans(queries, whole_tables=()):
+    """
+    Запросы с полным просмотром или временной сортировкой и их планы.
+
+    whole_tables — таблицы, которые страница выводит целиком.
+    """
+    bad = {}
+    for query in queries:
+        sql = query['sql'].lstrip()
+        if not sql.startswith('SELECT'):
+            continue
+        plan = query_plan(sql)
+        if bad_plan(plan, sql, whole_tables):
+            bad[sql] = plan
+    return bad
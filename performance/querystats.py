@@ -0,0 +1,295 @@
+"""
+Сводка запросов к базе из представлений по всему процессу.
+
+SQL сводится к отпечатку: литералы, параметры и списки значений
+заменяются на ?, поэтому одинаковые по форме запросы считаются вместе.
+Для отпечатка хранятся число, суммарное и наибольшее время, последние
+QUERY_STATS_SAMPLES длительностей для p50 и p99 и представления, из
+которых он пришёл. Отпечатков не больше QUERY_STATS_SIZE: при
+переполнении вытесняется дольше всех не встречавшийся.
+
+Запросы не быстрее SLOW_QUERY_MS пишутся в лог performance.slow_queries с
+представлением и строкой кода проекта, откуда они сделаны. Раз в
+QUERY_STATS_INTERVAL секунд, уже после отправки ответа, сводка процесса
+сохраняется в QUERY_STATS_DIR, откуда её собирает manage.py
+slow_queries. Снимки старше QUERY_STATS_MAX_AGE секунд остались от
+завершённых процессов: они не учитываются и удаляются.
+
+slow_queries --reset начинает новое поколение сводки: заменяет файл
+reset в QUERY_STATS_DIR. Процесс проверяет его в начале каждого запроса
+одним stat() и, если файл сменился, начинает свою сводку заново;
+снимки прошлых поколений не учитываются.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from time import monotonic, perf_counter, time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('performance.slow_queries')
+# Имя представления текущего запроса; ставит QueryStatsMiddleware.
+current_view = ContextVar('current_view', default=None)
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\?(?:, \?)*\)'), '(...)'),
+    (re.compile(r'\(\.\.\.\)(?:, \(\.\.\.\))+'), '(...)'),
+)
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """SQL без литералов: одинаковый для запросов одной формы."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def percentile(values, share):
+    """Значение, не превышенное долей share отсортированных values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class QueryStats:
+    """Ограниченная по памяти сводка по отпечаткам; безопасна для потоков."""
+
+    def __init__(self, size, samples):
+        self.size = size
+        self.samples = samples
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, fingerprint, duration, view):
+        with self.lock:
+            entry = self.entries.pop(fingerprint, None)
+            if entry is None:
+                entry = {
+                    'count': 0, 'total': 0.0, 'max': 0.0,
+                    'samples': deque(maxlen=self.samples),
+                    'views': Counter(),
+                }
+                if len(self.entries) >= self.size:
+                    self.entries.popitem(last=False)
+            self.entries[fingerprint] = entry
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+            entry['samples'].append(duration)
+            entry['views'][view] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def snapshot(self):
+        """Сводка в виде, пригодном для JSON; время в миллисекундах."""
+        with self.lock:
+            return {
+                fingerprint: {
+                    'count': entry['count'],
+                    'total_ms': entry['total'] * 1000,
+                    'max_ms': entry['max'] * 1000,
+                    'samples_ms': [
+                        duration * 1000 for duration in entry['samples']
+                    ],
+                    'views': dict(entry['views']),
+                }
+                for fingerprint, entry in self.entries.items()
+            }
+
+
+stats = None
+last_saved = 0.0
+# Поколение сводки процесса: метка файла сброса.
+generation = None
+# Вместе с pid отличает снимок процесса от снимка его предшественника
+# с тем же pid.
+run_id = uuid4().hex[:8]
+
+
+def origin():
+    """Ближайшая к запросу строка кода проекта, кроме этого модуля."""
+    root = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(root) and filename != __file__
+            and 'site-packages' not in filename
+        ):
+            return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def record(execute, sql, params, many, context):
+    """Обёртка запросов: учитывает только запросы из представлений."""
+    view = current_view.get()
+    if view is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = perf_counter() - started
+        stats.add(fingerprint(sql), duration, view)
+        if duration * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning(json.dumps({
+                'view': view,
+                'ms': duration * 1000,
+                'sql': sql,
+                'origin': origin(),
+            }, ensure_ascii=False))
+
+
+def follow_reset(**kwargs):
+    """В начале запроса начинает сводку заново, если её сбросили."""
+    global generation
+    if stats is None:
+        return
+    latest = current_generation()
+    if latest != generation:
+        stats.clear()
+        generation = latest
+
+
+def save_if_due(**kwargs):
+    """Сохраняет сводку по окончании запроса, если подошёл срок."""
+    if monotonic() - last_saved >= settings.QUERY_STATS_INTERVAL:
+        save()
+
+
+def add_wrapper(connection, **kwargs):
+    if record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record)
+
+
+def install():
+    """
+    Ставит обёртку на открытые и будущие соединения процесса,
+    а сохранение сводки — на окончание запросов.
+    """
+    global stats, generation
+    if stats is None:
+        stats = QueryStats(
+            settings.QUERY_STATS_SIZE, settings.QUERY_STATS_SAMPLES
+        )
+        generation = current_generation()
+        atexit.register(save)
+    connection_created.connect(add_wrapper, dispatch_uid=__name__)
+    request_started.connect(follow_reset, dispatch_uid=__name__)
+    request_finished.connect(save_if_due, dispatch_uid=__name__)
+    for connection in connections.all(initialized_only=True):
+        add_wrapper(connection)
+
+
+def snapshot_path():
+    return Path(settings.QUERY_STATS_DIR) / f'{os.getpid()}-{run_id}.json'
+
+
+def reset_path():
+    return Path(settings.QUERY_STATS_DIR) / 'reset'
+
+
+def current_generation():
+    """
+    Метка файла сброса; None, если сводку не сбрасывали.
+
+    Файл при сбросе заменяется новым, поэтому меняется его inode.
+    """
+    try:
+        stat = reset_path().stat()
+    except OSError:
+        return None
+    return f'{stat.st_ino}-{stat.st_mtime_ns}'
+
+
+def reset():
+    """Начинает новое поколение сводки всех процессов."""
+    path = reset_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(f'.{os.getpid()}.tmp')
+    temporary.write_text(str(time()))
+    os.replace(temporary, path)
+    for snapshot in path.parent.glob('*.json'):
+        snapshot.unlink(missing_ok=True)
+
+
+def save():
+    """Сохраняет сводку процесса; файл заменяется целиком."""
+    global last_saved
+    last_saved = monotonic()
+    if stats is None:
+        return
+    path = snapshot_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(f'.{threading.get_ident()}.tmp')
+    temporary.write_text(json.dumps(
+        {
+            'saved': time(),
+            'generation': generation,
+            'entries': stats.snapshot(),
+        },
+        ensure_ascii=False,
+    ))
+    os.replace(temporary, path)
+
+
+def fresh_snapshots():
+    """
+    Снимки текущего поколения моложе QUERY_STATS_MAX_AGE;
+    устаревшие удаляются.
+    """
+    oldest = time() - settings.QUERY_STATS_MAX_AGE
+    latest = current_generation()
+    for path in Path(settings.QUERY_STATS_DIR).glob('*.json'):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get('saved', 0) < oldest
+            or snapshot.get('generation') != latest
+        ):
+            path.unlink(missing_ok=True)
+            continue
+        yield snapshot
+
+
+def load():
+    """Сводки всех процессов, объединённые по отпечаткам."""
+    merged = {}
+    for snapshot in fresh_snapshots():
+        for fingerprint, entry in snapshot['entries'].items():
+            total = merged.setdefault(fingerprint, {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'samples_ms': [], 'views': Counter(),
+            })
+            total['count'] += entry['count']
+            total['total_ms'] += entry['total_ms']
+            total['max_ms'] = max(total['max_ms'], entry['max_ms'])
+            total['samples_ms'] += entry['samples_ms']
+            total['views'].update(entry['views'])
+    for entry in merged.values():
+        samples = sorted(entry.pop('samples_ms'))
+        entry['p50_ms'] = percentile(samples, 0.5)
+        entry['p99_ms'] = percentile(samples, 0.99)
+    return merged
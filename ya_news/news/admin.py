@@ -1,11 +1,36 @@
+from datetime import datetime
+
 from django.contrib import admin
+from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.text import capfirst
 
+from . import profiling
 from .models import Comment, News
 
 
+class LatestCommentsFormSet(BaseInlineFormSet):
+    """Только последние комментарии новости, а не все сразу."""
+    limit = 20
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = self.queryset.order_by(
+                '-created', '-id'
+            )[:self.limit]
+        return self._queryset
+
+
 class CommentInline(admin.StackedInline):
     model = Comment
+    formset = LatestCommentsFormSet
     extra = 0
+    autocomplete_fields = ('author',)
 
 
 @admin.register(News)
@@ -13,3 +38,99 @@ class NewsAdmin(admin.ModelAdmin):
     inlines = [
         CommentInline,
     ]
+    list_display = ('title', 'date', 'comment_count')
+    readonly_fields = ('all_comments',)
+    search_fields = ('title',)
+    show_full_result_count = False
+
+    @admin.display(description='Комментарии')
+    def all_comments(self, news):
+        """Ссылка на постраничный список всех комментариев новости."""
+        if news.pk is None:
+            return None
+        url = reverse('admin:news_comment_changelist')
+        return format_html(
+            '<a href="{}?news__id__exact={}">Все комментарии ({})</a>. '
+            'Ниже — последние {}.',
+            url, news.pk, news.comment_count, LatestCommentsFormSet.limit,
+        )
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Новости и число их комментариев, а не каждый комментарий.
+
+        Стандартная страница подтверждения выбирает и выводит все
+        связанные объекты: у популярной новости это десятки тысяч строк.
+        """
+        news_list = list(objs)
+        counts = dict(
+            Comment.objects.filter(
+                news__in=news_list
+            ).values_list('news_id').annotate(Count('id'))
+        )
+        deleted = []
+        for news in news_list:
+            deleted.append(format_html(
+                '{}: <a href="{}">{}</a>',
+                capfirst(News._meta.verbose_name),
+                reverse('admin:news_news_change', args=(news.pk,)),
+                news,
+            ))
+            deleted.append([f'Комментарии: {counts.get(news.pk, 0)}'])
+        model_count = {
+            model._meta.verbose_name_plural: count
+            for model, count in (
+                (News, len(news_list)), (Comment, sum(counts.values()))
+            )
+            if count
+        }
+        perms_needed = {
+            model._meta.verbose_name
+            for model in (News, Comment)
+            if model._meta.verbose_name_plural in model_count
+            and not self.admin_site._registry[model].has_delete_permission(
+                request
+            )
+        }
+        return deleted, model_count, perms_needed, []
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'news', 'author', 'created')
+    list_select_related = ('news', 'author')
+    autocomplete_fields = ('news', 'author')
+    ordering = ('-id',)
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        """Перенос в другую новость не сдвинул бы счётчики комментариев."""
+        if obj is not None:
+            return ('news',)
+        return ()
+
+
+def profiles(request):
+    """Страница админки со списком последних профилей запросов."""
+    rows = []
+    for path in profiling.recent():
+        stat = path.stat()
+        rows.append({
+            'name': path.name,
+            'size': stat.st_size,
+            'created': datetime.fromtimestamp(
+                stat.st_mtime, timezone.get_current_timezone()
+            ),
+        })
+    return TemplateResponse(request, 'admin/news/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'profiles': rows,
+    })
+
+
+def profile_download(request, name):
+    path = profiling.find(name)
+    if path is None:
+        raise Http404('Профиль не найден.')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=name)
@@ -0,0 +1,219 @@
+"""
+JSON API только для чтения.
+
+Изменения новостей и комментариев отдаются по порядку (updated, id).
+Ответ содержит курсор since: следующий запрос с ним вернёт только то,
+что изменилось после последней полученной записи. Удаления в выдачу
+не попадают.
+
+Записи, изменённые за последние NEWS_API_CURSOR_LAG секунд, в выдачу
+ещё не попадают: транзакция, начатая раньше, может зафиксировать
+строку с меньшим updated уже после того, как курсор её обогнал.
+"""
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import generic
+
+from .models import Comment, News
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+def news_data(news):
+    return {
+        'id': news.pk,
+        'title': news.title,
+        'text': news.text,
+        'date': news.date,
+        'comment_count': news.comment_count,
+        'updated': news.updated,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'news': comment.news_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+        'updated': comment.updated,
+    }
+
+
+def dump(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+class ChangesMixin:
+    """Выборка изменений после курсора из GET-параметра since."""
+    model = None
+    ordering = ('updated', 'id')
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def get_paginator(self, per_page=None):
+        settled = timezone.now() - timedelta(
+            seconds=settings.NEWS_API_CURSOR_LAG
+        )
+        return KeysetPaginator(
+            self.get_queryset().filter(updated__lt=settled),
+            self.ordering,
+            per_page,
+        )
+
+
+class ChangesView(ChangesMixin, generic.View):
+    """Страница изменений; пустая выдача означает, что всё получено."""
+
+    def get(self, request, *args, **kwargs):
+        paginator = self.get_paginator(settings.NEWS_API_PAGE_SIZE)
+        since = request.GET.get('since')
+        try:
+            page = paginator.page(since)
+        except InvalidCursor:
+            raise Http404('Некорректный курсор.')
+        if page.object_list:
+            since = paginator.cursor_for(page.object_list[-1])
+        return JsonResponse(
+            {
+                'results': [self.serialize(obj) for obj in page],
+                'has_more': page.has_next,
+                'since': since,
+            },
+            encoder=DjangoJSONEncoder,
+            json_dumps_params={'ensure_ascii': False},
+        )
+
+
+class ExportView(ChangesMixin, generic.View):
+    """
+    Потоковая выгрузка всех изменений после since.
+
+    Записи читаются из базы порциями и сразу уходят клиенту, поэтому
+    вся таблица в памяти не собирается. Под ASGI порции читает
+    асинхронный ORM, под WSGI — синхронный генератор: итератор
+    другого рода Django собрал бы в памяти целиком.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        paginator = self.get_paginator()
+        since = request.GET.get('since')
+        queryset = paginator.queryset.order_by(*paginator.ordering)
+        if since:
+            try:
+                queryset = queryset.filter(
+                    paginator.after(paginator.decode(since))
+                )
+            except InvalidCursor:
+                raise Http404('Некорректный курсор.')
+        stream = (
+            self.astream if isinstance(request, ASGIRequest) else self.stream
+        )
+        return StreamingHttpResponse(
+            stream(paginator, queryset, since),
+            content_type='application/json',
+        )
+
+    def encode(self, chunk, first):
+        """Порция записей как часть JSON-массива results."""
+        return ('' if first else ', ') + ', '.join(
+            dump(self.serialize(obj)) for obj in chunk
+        )
+
+    def end(self, paginator, last, since):
+        if last is not None:
+            since = paginator.cursor_for(last)
+        return f'], "since": {dump(since)}}}'
+
+    def stream(self, paginator, queryset, since):
+        chunk_size = settings.NEWS_API_EXPORT_CHUNK_SIZE
+        yield '{"results": ['
+        chunk = []
+        last = None
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield self.encode(chunk, last is None)
+                last = chunk[-1]
+                chunk = []
+        if chunk:
+            yield self.encode(chunk, last is None)
+            last = chunk[-1]
+        yield self.end(paginator, last, since)
+
+    async def astream(self, paginator, queryset, since):
+        chunk_size = settings.NEWS_API_EXPORT_CHUNK_SIZE
+        yield '{"results": ['
+        chunk = []
+        last = None
+        async for obj in queryset.aiterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield self.encode(chunk, last is None)
+                last = chunk[-1]
+                chunk = []
+        if chunk:
+            yield self.encode(chunk, last is None)
+            last = chunk[-1]
+        yield self.end(paginator, last, since)
+
+
+class NewsApiMixin:
+    model = News
+    serialize = staticmethod(news_data)
+
+
+class CommentApiMixin:
+    model = Comment
+    serialize = staticmethod(comment_data)
+
+    def get_queryset(self):
+        return self.model.objects.select_related('author')
+
+
+class NewsChangesApi(NewsApiMixin, ChangesView):
+    pass
+
+
+class CommentChangesApi(CommentApiMixin, ChangesView):
+    pass
+
+
+class NewsExportApi(NewsApiMixin, ExportView):
+    pass
+
+
+class CommentExportApi(CommentApiMixin, ExportView):
+    pass
+
+
+class NewsCommentsApi(generic.View):
+    """Комментарии одной новости по порядку создания, по курсору."""
+
+    def get(self, request, pk):
+        if not News.objects.filter(pk=pk).exists():
+            raise Http404('Новость не найдена.')
+        paginator = KeysetPaginator(
+            Comment.objects.filter(news_id=pk).select_related('author'),
+            ('created', 'id'),
+            settings.NEWS_API_PAGE_SIZE,
+        )
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Некорректный курсор.')
+        return JsonResponse(
+            {
+                'results': [comment_data(comment) for comment in page],
+                'next_cursor': page.next_cursor,
+            },
+            encoder=DjangoJSONEncoder,
+            json_dumps_params={'ensure_ascii': False},
+        )
@@ -0,0 +1,111 @@
+"""
+Версии закэшированных страниц и фрагментов шаблонов.
+
+Ключ страницы включает версию новости (или главной страницы), ключ
+фрагмента — версию своего объекта (см. fragment_name). Сигналы
+меняют версию после фиксации транзакции, и старые записи просто
+перестают читаться, поэтому ограничивать время жизни записей не нужно.
+"""
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from performance import metrics
+
+HOME = 'home'
+# Версия списка новостей без счётчиков комментариев: ленты и карта сайта.
+NEWS = 'news'
+
+
+def version_key(name):
+    return f'news:version:{name}'
+
+
+def get_version(name):
+    """Текущая версия; новая версия случайна, чтобы не совпасть со старой."""
+    return cache.get_or_set(version_key(name), lambda: uuid4().hex, None)
+
+
+async def aget_version(name):
+    return await cache.aget_or_set(
+        version_key(name), lambda: uuid4().hex, None
+    )
+
+
+def get_versions(names):
+    """Версии для нескольких имён за одно чтение и одну запись в кэш."""
+    keys = {version_key(name): name for name in names}
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+async def aget_versions(names):
+    keys = {version_key(name): name for name in names}
+    versions = await cache.aget_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def fragment_name(obj):
+    """Имя версии фрагментов объекта, например news:1 или comment:2."""
+    return f'{obj._meta.model_name}:{obj.pk}'
+
+
+def stamp_fragments(objects):
+    """Проставляет объектам fragment_version для тега {% cache %}."""
+    versions = get_versions({fragment_name(obj) for obj in objects})
+    for obj in objects:
+        obj.fragment_version = versions[fragment_name(obj)]
+    return objects
+
+
+async def astamp_fragments(objects):
+    versions = await aget_versions({fragment_name(obj) for obj in objects})
+    for obj in objects:
+        obj.fragment_version = versions[fragment_name(obj)]
+    return objects
+
+
+def bump_version(*names):
+    cache.set_many(
+        {version_key(name): uuid4().hex for name in names}, None
+    )
+
+
+def page_key(name, version, request):
+    """
+    Ключ страницы для версии объекта name и адреса запроса.
+
+    Схема и хост входят в ключ: в лентах и картах сайта ссылки абсолютные.
+    """
+    url = md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'news:page:{name}:{version}:{url}'
+
+
+def count_lookup(response):
+    metrics.inc(
+        'cache_requests_total',
+        cache='page', result='miss' if response is None else 'hit',
+    )
+    return response
+
+
+def get_page(key):
+    return count_lookup(cache.get(key))
+
+
+async def aget_page(key):
+    return count_lookup(await cache.aget(key))
+
+
+def set_page(key, response):
+    cache.set(key, response, settings.NEWS_PAGE_CACHE_TIMEOUT)
@@ -0,0 +1,37 @@
+"""Ленты RSS и Atom с последними новостями."""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import News
+
+
+def published(day):
+    """Новость датирована днём; в ленте это начало этого дня."""
+    return timezone.make_aware(datetime.combine(day, time()))
+
+
+class LatestNewsFeed(Feed):
+    title = 'Новости'
+    link = reverse_lazy('news:home')
+    description = 'Последние новости.'
+
+    def items(self):
+        return News.objects.only(
+            'id', 'title', 'date'
+        )[:settings.NEWS_FEED_SIZE]
+
+    def item_title(self, news):
+        return news.title
+
+    def item_pubdate(self, news):
+        return published(news.date)
+
+
+class LatestNewsAtomFeed(LatestNewsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestNewsFeed.description
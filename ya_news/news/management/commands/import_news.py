@@ -0,0 +1,302 @@
+import csv
+import json
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from news.cache import HOME, bump_version
+from news.forms import bad_words_filter
+from news.models import Comment, News, NewsArchiveMonth
+
+User = get_user_model()
+
+
+class RejectedRow(ValueError):
+    """Строка не прошла проверку и пропускается."""
+
+    def __init__(self, reason, detail=''):
+        super().__init__(reason, detail)
+        self.reason = reason
+        self.detail = detail
+
+
+def read_jsonl(path):
+    """Записи файла; вместо неразобранной строки — RejectedRow."""
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield RejectedRow('неверный JSON', str(error))
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as source:
+        yield from csv.DictReader(source)
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+class AuthorCache:
+    """Небольшой LRU-кэш id авторов по имени пользователя."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.ids = OrderedDict()
+
+    def resolve(self, usernames):
+        """Догружает одним запросом всех ещё неизвестных авторов."""
+        missing = set(usernames) - self.ids.keys()
+        if missing:
+            self.ids.update(
+                User.objects.filter(
+                    username__in=missing
+                ).values_list('username', 'id')
+            )
+        found = {}
+        for username in usernames:
+            if username in self.ids:
+                self.ids.move_to_end(username)
+                found[username] = self.ids[username]
+        while len(self.ids) > self.maxsize:
+            self.ids.popitem(last=False)
+        return found
+
+
+def text_field(row, name):
+    """Строковое поле записи; из JSON может прийти число или список."""
+    value = row[name]
+    if not isinstance(value, str):
+        raise TypeError(f'{name}: {type(value).__name__}')
+    return value
+
+
+def build_news(row):
+    try:
+        return News(
+            id=int(row['id']) if row.get('id') else None,
+            title=text_field(row, 'title'),
+            text=text_field(row, 'text'),
+            date=date.fromisoformat(row['date']),
+        )
+    except (KeyError, TypeError, ValueError) as error:
+        raise RejectedRow('неверная новость', repr(error))
+
+
+def build_comment(row):
+    try:
+        comment = Comment(
+            news_id=int(row['news']),
+            text=text_field(row, 'text'),
+        )
+        comment.author_name = text_field(row, 'author')
+        created = row.get('created')
+        comment.imported_created = (
+            parse_datetime(created) if created else None
+        )
+    except (KeyError, TypeError, ValueError) as error:
+        raise RejectedRow('неверный комментарий', repr(error))
+    if created and comment.imported_created is None:
+        raise RejectedRow('неверный комментарий', f'дата {created!r}')
+    if (
+        comment.imported_created
+        and timezone.is_naive(comment.imported_created)
+    ):
+        comment.imported_created = timezone.make_aware(
+            comment.imported_created
+        )
+    if not comment.text:
+        raise RejectedRow('пустой комментарий')
+    bad_words = bad_words_filter.find(comment.text)
+    if bad_words:
+        raise RejectedRow('запрещённые слова', ', '.join(sorted(bad_words)))
+    return comment
+
+
+BUILDERS = {'news': build_news, 'comment': build_comment}
+
+
+def check_row(row):
+    """Модель записи; строки, которые не разобрать, отклоняются."""
+    if isinstance(row, RejectedRow):
+        raise row
+    if not isinstance(row, dict):
+        raise RejectedRow('запись не объект', type(row).__name__)
+    model = row.get('model')
+    if model not in BUILDERS:
+        raise RejectedRow('неизвестная модель', repr(model))
+    return model
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает новости и комментарии из JSONL или CSV. '
+        'Каждая запись содержит поле model со значением news или comment.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format', dest='file_format', choices=READERS,
+            help='По умолчанию определяется по расширению файла.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--author-cache-size', type=int, default=10000,
+            help='Сколько авторов держать в памяти.',
+        )
+        parser.add_argument(
+            '--progress-every', type=float, default=5.0,
+            help='Как часто (в секундах) сообщать о скорости загрузки.',
+        )
+
+    def handle(self, *args, path, file_format=None, batch_size=1000,
+               author_cache_size=10000, progress_every=5.0, **options):
+        file_format = file_format or path.suffix.lstrip('.')
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.authors = AuthorCache(author_cache_size)
+        self.imported = Counter()
+        self.rejected = Counter()
+        self.started = self.reported = time.monotonic()
+        self.progress_every = progress_every
+
+        pending = {'news': [], 'comment': []}
+        for line, row in enumerate(READERS[file_format](path), start=1):
+            try:
+                model = check_row(row)
+                pending[model].append(BUILDERS[model](row))
+            except RejectedRow as error:
+                self.reject(error.reason, f'строка {line}: {error.detail}')
+                continue
+            if len(pending[model]) >= batch_size:
+                self.flush(pending)
+        self.flush(pending)
+        self.report(final=True)
+
+    def reject(self, reason, detail):
+        """Считает отклонённые строки; первые из них выводит подробно."""
+        self.rejected[reason] += 1
+        if self.rejected.total() <= 10:
+            self.stderr.write(f'{reason}, {detail}')
+
+    def flush(self, pending):
+        """Новости сохраняются раньше ссылающихся на них комментариев."""
+        if pending['news']:
+            self.save_news(pending['news'])
+            pending['news'] = []
+        if pending['comment']:
+            self.save_comments(pending['comment'])
+            pending['comment'] = []
+        self.report()
+
+    def save_news(self, batch):
+        """
+        Новости с уже занятым id отклоняются. Если id успели занять
+        после проверки, пачка сохраняется по одной новости.
+        """
+        batch = self.drop_taken_ids(batch)
+        try:
+            self.insert_news(batch)
+        except IntegrityError:
+            for news in batch:
+                try:
+                    self.insert_news([news])
+                except IntegrityError as error:
+                    self.reject('повторный id', f'{news.id}: {error}')
+
+    def drop_taken_ids(self, batch):
+        taken = set(News.objects.using('default').filter(
+            pk__in={news.id for news in batch if news.id is not None}
+        ).values_list('pk', flat=True))
+        fresh = []
+        for news in batch:
+            if news.id in taken:
+                self.reject('повторный id', news.id)
+                continue
+            if news.id is not None:
+                taken.add(news.id)
+            fresh.append(news)
+        return fresh
+
+    def insert_news(self, batch):
+        if not batch:
+            return
+        months = Counter((news.date.year, news.date.month) for news in batch)
+        with transaction.atomic():
+            News.objects.bulk_create(batch)
+            for (year, month), count in months.items():
+                NewsArchiveMonth.shift(date(year, month, 1), count)
+            transaction.on_commit(lambda: bump_version(HOME))
+        self.imported['news'] += len(batch)
+
+    def save_comments(self, batch):
+        authors = self.authors.resolve(
+            {comment.author_name for comment in batch}
+        )
+        existing_news = set(News.objects.using('default').filter(
+            pk__in={comment.news_id for comment in batch}
+        ).values_list('pk', flat=True))
+        comments = []
+        for comment in batch:
+            if comment.author_name not in authors:
+                self.reject('неизвестный автор', comment.author_name)
+            elif comment.news_id not in existing_news:
+                self.reject('неизвестная новость', comment.news_id)
+            else:
+                comment.author_id = authors[comment.author_name]
+                comments.append(comment)
+        if not comments:
+            return
+        per_news = Counter(comment.news_id for comment in comments)
+        by_count = {}
+        for news_id, count in per_news.items():
+            by_count.setdefault(count, []).append(news_id)
+        with transaction.atomic():
+            self.bulk_create_comments(comments)
+            for count, news_ids in by_count.items():
+                News.shift_comment_count(news_ids, count)
+            transaction.on_commit(lambda: bump_version(HOME, *per_news))
+        self.imported['comment'] += len(comments)
+
+    def bulk_create_comments(self, comments):
+        """
+        Поле created заполняется автоматически при вставке,
+        поэтому даты из архива проставляются вторым запросом.
+        """
+        created = [comment.imported_created for comment in comments]
+        Comment.objects.bulk_create(comments)
+        dated = []
+        for comment, imported_created in zip(comments, created):
+            if imported_created:
+                comment.created = imported_created
+                dated.append(comment)
+        if dated:
+            Comment.objects.bulk_update(dated, ('created',))
+
+    def report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self.reported < self.progress_every:
+            return
+        self.reported = now
+        rows = self.imported.total() + self.rejected.total()
+        elapsed = max(now - self.started, 1e-9)
+        self.stdout.write(
+            f'Обработано строк: {rows}, {rows / elapsed:.0f} строк/с; '
+            f'новостей {self.imported["news"]}, '
+            f'комментариев {self.imported["comment"]}, '
+            f'отклонено {self.rejected.total()}.'
+        )
+        if final and self.rejected:
+            for reason, count in self.rejected.most_common():
+                self.stdout.write(f'  {reason}: {count}')
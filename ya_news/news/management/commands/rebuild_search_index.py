@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from news import search
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс новостей и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--optimize-only',
+            action='store_true',
+            help='Только слить сегменты индекса, не перестраивая его.',
+        )
+
+    def handle(self, *args, optimize_only=False, **options):
+        if not search.is_available(DEFAULT_DB_ALIAS):
+            raise CommandError('Полнотекстовый поиск есть только в SQLite.')
+        if optimize_only:
+            search.optimize()
+        else:
+            search.rebuild()
+        self.stdout.write(f'В индексе записей: {search.count()}.')
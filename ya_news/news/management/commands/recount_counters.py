@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, TruncMonth
+
+from news.models import Comment, News, NewsArchiveMonth
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики новостей '
+        'и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать количество расхождений.',
+        )
+
+    def handle(self, *args, dry_run=False, **options):
+        with transaction.atomic():
+            comments = self.recount_comments(dry_run)
+            months = self.recount_archive(dry_run)
+        self.stdout.write(
+            f'Счётчики комментариев: расхождений {comments}.'
+        )
+        self.stdout.write(f'Счётчики архива: расхождений {months}.')
+
+    def recount_comments(self, dry_run):
+        actual = Coalesce(
+            models.Subquery(
+                Comment.objects.filter(
+                    news=models.OuterRef('pk')
+                ).order_by().values('news').annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ),
+            0,
+        )
+        stale = News.objects.exclude(comment_count=actual)
+        if dry_run:
+            return stale.count()
+        return stale.update(comment_count=actual)
+
+    def recount_archive(self, dry_run):
+        actual = {
+            (month.year, month.month): total
+            for month, total in News.objects.annotate(
+                month=TruncMonth('date')
+            ).order_by().values_list('month').annotate(
+                total=models.Count('pk')
+            )
+        }
+        stored = {
+            (year, month): total
+            for year, month, total in NewsArchiveMonth.objects.values_list(
+                'year', 'month', 'news_count'
+            )
+        }
+        stale = {
+            key for key in actual.keys() | stored.keys()
+            if actual.get(key, 0) != stored.get(key, 0)
+        }
+        if stale and not dry_run:
+            NewsArchiveMonth.objects.all().delete()
+            NewsArchiveMonth.objects.bulk_create(
+                NewsArchiveMonth(year=year, month=month, news_count=total)
+                for (year, month), total in actual.items()
+            )
+        return len(stale)
@@ -0,0 +1,170 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from news import search
+from news.cache import HOME, NEWS, bump_version
+from news.models import Comment, News
+
+User = get_user_model()
+
+WORDS = (
+    'город', 'новость', 'жители', 'мэрия', 'погода', 'дорога', 'школа',
+    'парк', 'выставка', 'концерт', 'футбол', 'команда', 'матч', 'цены',
+    'рынок', 'магазин', 'транспорт', 'метро', 'автобус', 'ремонт', 'мост',
+    'река', 'праздник', 'фестиваль', 'театр', 'музей', 'библиотека',
+    'больница', 'врач', 'студенты', 'экзамен', 'улица', 'площадь', 'дом',
+    'снег', 'дождь', 'лето', 'зима', 'открытие', 'решение', 'проект',
+    'новый', 'старый', 'большой', 'быстро', 'сегодня', 'вчера', 'завтра',
+)
+
+
+def skewed_index(rng, count, skew):
+    """
+    Индекс от 0 до count - 1.
+
+    При skew = 1 индексы равновероятны, чем skew больше, тем чаще
+    выпадают малые: при skew = 3 пятая часть выборки приходится
+    на первый процент индексов.
+    """
+    return int(count * rng.random() ** skew)
+
+
+def phrases(rng, count, low, high):
+    """
+    Набор из count фраз длиной от low до high слов.
+
+    Тексты выбираются из готового набора: составлять каждый заново
+    дольше, чем вставлять строку в базу.
+    """
+    return [
+        ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимыми тестовыми данными для '
+        'нагрузочных замеров: пользователями, новостями и комментариями. '
+        'При одном и том же --seed данные одинаковы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--news', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--days', type=int, default=3650,
+            help='За сколько дней до сегодняшнего распределить новости.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--hot-news', type=float, default=3.0,
+            help='Перекос комментариев в сторону свежих новостей.',
+        )
+        parser.add_argument(
+            '--prolific-authors', type=float, default=2.0,
+            help='Перекос комментариев в сторону активных авторов.',
+        )
+
+    def handle(self, *args, users, news, comments, days, seed, batch_size,
+               hot_news, prolific_authors, **options):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        with search.deferred():
+            user_ids = self.create_users(users)
+            news_ids = self.create_news(news, days)
+            self.create_comments(
+                comments, news_ids, user_ids, hot_news, prolific_authors
+            )
+        call_command('recount_counters', stdout=self.stdout)
+        bump_version(HOME, NEWS)
+
+    def create(self, model, total, build):
+        """
+        Вставляет total объектов порциями.
+
+        Возвращает диапазон (first, last) их id или None, если вставлять
+        нечего. Вставка идёт одной транзакцией, поэтому id идут подряд.
+        """
+        first = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        started = time.monotonic()
+        with transaction.atomic():
+            for start in range(0, total, self.batch_size):
+                model.objects.bulk_create(
+                    build(number) for number in range(
+                        start, min(start + self.batch_size, total)
+                    )
+                )
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f'{model._meta.label}: {total}, '
+            f'{total / elapsed:.0f} строк/с.'
+        )
+        created = model.objects.filter(pk__gt=first).aggregate(
+            first=Min('pk'), last=Max('pk'), count=Count('pk')
+        )
+        if not created['count']:
+            return None
+        if created['last'] - created['first'] + 1 != created['count']:
+            raise CommandError(
+                f'{model._meta.label}: id вставленных строк идут не подряд.'
+            )
+        return created['first'], created['last']
+
+    def create_users(self, total):
+        first = User.objects.aggregate(last=Max('pk'))['last'] or 0
+        return self.create(
+            User, total,
+            lambda number: User(
+                username=f'user{first + number + 1}', password='!'
+            ),
+        )
+
+    def create_news(self, total, days):
+        """Даты растут вместе с id, как у новостей, публикуемых по очереди."""
+        start = timezone.localdate() - timedelta(days=days)
+        titles = phrases(self.rng, 1024, 2, 6)
+        texts = phrases(self.rng, 1024, 20, 120)
+        return self.create(
+            News, total,
+            lambda number: News(
+                title=self.rng.choice(titles)[:50],
+                text=self.rng.choice(texts),
+                date=start + timedelta(days=number * days // max(total, 1)),
+            ),
+        )
+
+    def create_comments(self, total, news_ids, user_ids, hot_news,
+                        prolific_authors):
+        """
+        Чаще комментируют свежие новости и одни и те же авторы.
+
+        news_ids и user_ids — диапазоны id (first, last) из create().
+        """
+        if not news_ids or not user_ids:
+            return
+        first_news, last_news = news_ids
+        first_user, last_user = user_ids
+        texts = phrases(self.rng, 4096, 3, 30)
+        self.create(
+            Comment, total,
+            lambda number: Comment(
+                news_id=last_news - skewed_index(
+                    self.rng, last_news - first_news + 1, hot_news
+                ),
+                author_id=first_user + skewed_index(
+                    self.rng, last_user - first_user + 1, prolific_authors
+                ),
+                text=self.rng.choice(texts),
+            ),
+        )
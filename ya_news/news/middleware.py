@@ -0,0 +1,102 @@
+"""Middleware новостей: выбор реплики и профилирование запросов."""
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+
+from . import profiling, routers
+
+
+def pin_response(response, state):
+    """После записи просит браузер какое-то время читать из основной базы."""
+    if state.wrote and settings.NEWS_READ_REPLICAS:
+        response.set_cookie(
+            routers.PRIMARY_COOKIE, '1',
+            max_age=settings.NEWS_REPLICA_LAG, httponly=True,
+            samesite='Lax',
+        )
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """Состояние выбора базы для news.routers.ReplicaRouter."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state, token = routers.start_request(
+                routers.PRIMARY_COOKIE in request.COOKIES
+            )
+            try:
+                response = await get_response(request)
+            finally:
+                routers.finish_request(token)
+            return pin_response(response, state)
+    else:
+        def middleware(request):
+            state, token = routers.start_request(
+                routers.PRIMARY_COOKIE in request.COOKIES
+            )
+            try:
+                response = get_response(request)
+            finally:
+                routers.finish_request(token)
+            return pin_response(response, state)
+    return middleware
+
+
+def profile_kind(request):
+    """Вид профиля из ?profile=, если профиль запросили."""
+    kind = request.GET.get('profile')
+    if kind is None:
+        return None
+    return kind if kind in profiling.KINDS else profiling.KINDS[0]
+
+
+def has_profile_token(request):
+    token = settings.PROFILER_TOKEN
+    return bool(token) and constant_time_compare(
+        request.headers.get('X-Profile-Token', ''), token
+    )
+
+
+@sync_and_async_middleware
+def profiler_middleware(get_response):
+    """
+    Профилирует запрос с параметром ?profile=cprofile или ?profile=stacks.
+
+    Доступно сотрудникам и запросам с заголовком X-Profile-Token, равным
+    PROFILER_TOKEN. Имя сохранённого профиля приходит в заголовке
+    X-Profile. В асинхронном режиме cProfile видит только цикл событий,
+    запросы к базе там показывает лишь stacks.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            kind = profile_kind(request)
+            if kind is None or not (
+                has_profile_token(request) or (await request.auser()).is_staff
+            ):
+                return await get_response(request)
+            profiler = profiling.profiler(kind)
+            profiler.enable()
+            try:
+                response = await get_response(request)
+            finally:
+                profiler.disable()
+            response['X-Profile'] = profiling.save(profiler, kind, request)
+            return response
+    else:
+        def middleware(request):
+            kind = profile_kind(request)
+            if kind is None or not (
+                has_profile_token(request) or request.user.is_staff
+            ):
+                return get_response(request)
+            profiler = profiling.profiler(kind)
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            response['X-Profile'] = profiling.save(profiler, kind, request)
+            return response
+    return middleware
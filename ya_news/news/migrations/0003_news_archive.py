@@ -0,0 +1,52 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:42
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def backfill_archive_months(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    NewsArchiveMonth = apps.get_model('news', 'NewsArchiveMonth')
+    NewsArchiveMonth.objects.bulk_create(
+        NewsArchiveMonth(year=month.year, month=month.month, news_count=total)
+        for month, total in News.objects.annotate(
+            month=TruncMonth('date')
+        ).order_by().values_list('month').annotate(total=models.Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_news_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('news_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-year', '-month'),
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='news',
+            options={'ordering': ('-date', '-id'), 'verbose_name': 'Новость', 'verbose_name_plural': 'Новости'},
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['date', 'id'], name='news_date_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='newsarchivemonth',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='news_archive_month_unique'),
+        ),
+        migrations.RunPython(
+            backfill_archive_months, migrations.RunPython.noop
+        ),
+    ]
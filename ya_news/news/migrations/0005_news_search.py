@@ -0,0 +1,92 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:30
+
+from django.db import migrations
+
+# Новость n хранится в строке 2n, комментарий n — в строке 2n + 1.
+CREATE_SEARCH = (
+    """
+    CREATE VIRTUAL TABLE news_search USING fts5(
+        title, text, news_id UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER news_search_news_insert AFTER INSERT ON news_news BEGIN
+        INSERT INTO news_search(rowid, title, text, news_id)
+        VALUES (new.id * 2, new.title, new.text, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_news_update
+    AFTER UPDATE OF title, text ON news_news BEGIN
+        UPDATE news_search SET title = new.title, text = new.text
+        WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_news_delete AFTER DELETE ON news_news BEGIN
+        DELETE FROM news_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_comment_insert
+    AFTER INSERT ON news_comment BEGIN
+        INSERT INTO news_search(rowid, title, text, news_id)
+        VALUES (new.id * 2 + 1, '', new.text, new.news_id);
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_comment_update
+    AFTER UPDATE OF text ON news_comment BEGIN
+        UPDATE news_search SET text = new.text
+        WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER news_search_comment_delete
+    AFTER DELETE ON news_comment BEGIN
+        DELETE FROM news_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO news_search(rowid, title, text, news_id)
+    SELECT id * 2, title, text, id FROM news_news
+    """,
+    """
+    INSERT INTO news_search(rowid, title, text, news_id)
+    SELECT id * 2 + 1, '', text, news_id FROM news_comment
+    """,
+)
+
+DROP_SEARCH = (
+    'DROP TRIGGER news_search_news_insert',
+    'DROP TRIGGER news_search_news_update',
+    'DROP TRIGGER news_search_news_delete',
+    'DROP TRIGGER news_search_comment_insert',
+    'DROP TRIGGER news_search_comment_update',
+    'DROP TRIGGER news_search_comment_delete',
+    'DROP TABLE news_search',
+)
+
+
+def run_on_sqlite(statements):
+    """Полнотекстовый индекс FTS5 есть только в SQLite."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_comment_news_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_SEARCH), run_on_sqlite(DROP_SEARCH)
+        ),
+    ]
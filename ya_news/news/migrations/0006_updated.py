@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+from news.search import TRIGGERS
+
+
+def backfill_comment_updated(apps, schema_editor):
+    Comment = apps.get_model('news', 'Comment')
+    Comment.objects.update(updated=models.F('created'))
+
+
+def create_search_triggers(apps, schema_editor):
+    """Удаление полей пересоздаёт таблицы без триггеров поиска."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, create_search_triggers
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(
+            backfill_comment_updated, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['updated', 'id'], name='comment_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['updated', 'id'], name='news_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 18:40
+
+from django.db import migrations
+
+from news.search import TRIGGERS
+
+
+def create_search_triggers(apps, schema_editor):
+    """Добавление полей в 0006 пересоздало таблицы без триггеров поиска."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_search_triggers, migrations.RunPython.noop
+        ),
+    ]
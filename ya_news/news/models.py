@@ -1,27 +1,71 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ('-date',)
+        ordering = ('-date', '-id')
+        indexes = (
+            models.Index(fields=('date', 'id'), name='news_date_id_idx'),
+            models.Index(
+                fields=('updated', 'id'), name='news_updated_id_idx'
+            ),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
     def __str__(self):
         return self.title
 
+    def get_absolute_url(self):
+        return reverse('news:detail', args=(self.pk,))
+
+    def save(self, *args, **kwargs):
+        """Поддерживает помесячные счётчики архива."""
+        previous_date = None
+        with transaction.atomic():
+            if not self._state.adding:
+                previous_date = type(self).objects.filter(
+                    pk=self.pk
+                ).values_list('date', flat=True).first()
+            super().save(*args, **kwargs)
+            if previous_date is None:
+                NewsArchiveMonth.shift(self.date, 1)
+            elif (
+                (previous_date.year, previous_date.month)
+                != (self.date.year, self.date.month)
+            ):
+                NewsArchiveMonth.shift(previous_date, -1)
+                NewsArchiveMonth.shift(self.date, 1)
+
+    @classmethod
+    def shift_comment_count(cls, news_ids, delta):
+        """
+        Атомарно сдвигает счётчик комментариев у перечисленных новостей.
+
+        Новость при этом считается изменённой: счётчик входит в выгрузку.
+        """
+        return cls.objects.filter(pk__in=news_ids).update(
+            comment_count=models.F('comment_count') + delta,
+            updated=timezone.now(),
+        )
+
 
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -29,9 +73,57 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_id_idx',
+            ),
+            models.Index(
+                fields=('updated', 'id'), name='comment_updated_id_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def save(self, *args, **kwargs):
+        """Новый комментарий увеличивает счётчик у новости."""
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            News.shift_comment_count((self.news_id,), 1)
+
+
+class NewsArchiveMonth(models.Model):
+    """Предпосчитанное число новостей за месяц для навигации по архиву."""
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    news_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('-year', '-month')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('year', 'month'), name='news_archive_month_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.month:02}.{self.year}'
+
+    @property
+    def first_day(self):
+        return date(self.year, self.month, 1)
+
+    @classmethod
+    def shift(cls, day, delta):
+        """Атомарно сдвигает счётчик месяца, к которому относится day."""
+        month, _ = cls.objects.get_or_create(year=day.year, month=day.month)
+        cls.objects.filter(pk=month.pk).update(
+            news_count=models.F('news_count') + delta
+        )
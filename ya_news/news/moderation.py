@@ -0,0 +1,134 @@
+import os
+import re
+from collections import deque
+
+
+class AhoCorasickMatcher:
+    """
+    Автомат Ахо — Корасик по списку слов.
+
+    Строится один раз, после чего текст просматривается за один проход
+    независимо от размера словаря.
+    """
+
+    def __init__(self, words):
+        self.transitions = [{}]
+        self.outputs = [()]
+        for word in words:
+            state = 0
+            for char in word:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][char] = next_state
+                    self.transitions.append({})
+                    self.outputs.append(())
+                state = next_state
+            self.outputs[state] += (word,)
+        self.fail = [0] * len(self.transitions)
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.transitions[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.transitions[fallback].get(char, 0)
+                self.outputs[child] += self.outputs[self.fail[child]]
+
+    def findall(self, text):
+        """Множество слов словаря, встретившихся в тексте."""
+        transitions, fail, outputs = self.transitions, self.fail, self.outputs
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+def trie_pattern(node):
+    """Регулярное выражение для префиксного дерева слов."""
+    alternatives = [
+        re.escape(char) + trie_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1:
+        pattern = alternatives[0]
+    else:
+        pattern = f'(?:{"|".join(alternatives)})'
+    if '' in node:
+        pattern = f'(?:{pattern})?'
+    return pattern
+
+
+class RegexMatcher:
+    """
+    Одно скомпилированное регулярное выражение по префиксному дереву слов.
+
+    Вхождения, перекрывающиеся с уже найденными, не сообщаются.
+    """
+
+    def __init__(self, words):
+        trie = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        self.pattern = re.compile(trie_pattern(trie) or '(?!)')
+
+    def findall(self, text):
+        return set(self.pattern.findall(text))
+
+
+def read_lexicon(path):
+    """Слова из файла: по одному в строке, # начинает комментарий."""
+    with open(path, encoding='utf-8') as lexicon:
+        for line in lexicon:
+            word = line.split('#', 1)[0].strip().lower()
+            if word:
+                yield word
+
+
+class BadWordsFilter:
+    """
+    Фильтр запрещённых слов.
+
+    Словарь состоит из слов, переданных явно, и слов из файла path.
+    Автомат пересобирается, когда файл изменился на диске; пока файл
+    недоступен, работает последний собранный.
+    """
+
+    def __init__(self, words=(), path=None, matcher_class=AhoCorasickMatcher):
+        self.words = tuple(word.lower() for word in words if word)
+        self.path = path
+        self.matcher_class = matcher_class
+        self.mtime = None
+        self.matcher = None
+        self.reload()
+
+    def reload(self):
+        words = set(self.words)
+        mtime = None
+        if self.path:
+            mtime = os.stat(self.path).st_mtime_ns
+            words.update(read_lexicon(self.path))
+        self.matcher = self.matcher_class(words)
+        self.mtime = mtime
+
+    def find(self, text):
+        """Запрещённые слова, найденные в тексте без учёта регистра."""
+        if self.path:
+            try:
+                if os.stat(self.path).st_mtime_ns != self.mtime:
+                    self.reload()
+            except OSError:
+                pass
+        return self.matcher.findall(text.lower())
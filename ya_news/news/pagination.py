@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Целые, которые помещаются в столбец INTEGER базы.
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    """Курсор не удалось разобрать."""
+
+
+def encode_cursor(values):
+    """Упаковывает значения ключа в непрозрачную строку для URL."""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает строку, полученную из encode_cursor."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError) as error:
+        raise InvalidCursor(cursor) from error
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+class KeysetPage:
+    """Страница выборки и курсор на следующую страницу."""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по ключу сортировки без OFFSET.
+
+    Следующая страница выбирается условием «ключ больше последнего
+    показанного», поэтому глубокие страницы стоят столько же, сколько
+    первая. Последнее поле ключа должно быть уникальным.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        return self.make_page(list(self.page_queryset(cursor)))
+
+    async def apage(self, cursor=None):
+        """То же, что page(), через асинхронный ORM."""
+        return self.make_page(
+            [obj async for obj in self.page_queryset(cursor).aiterator()]
+        )
+
+    def page_queryset(self, cursor):
+        """Выборка на одну строку длиннее страницы: так виден её конец."""
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def make_page(self, objects):
+        next_cursor = None
+        if len(objects) > self.per_page:
+            objects = objects[:self.per_page]
+            next_cursor = self.cursor_for(objects[-1])
+        return KeysetPage(objects, next_cursor)
+
+    def after(self, values):
+        """Условие «строго после» для лексикографического ключа."""
+        conditions = []
+        for position, name in enumerate(self.ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            equal = {
+                field.attname: value for field, value in
+                zip(self.fields[:position], values[:position])
+            }
+            equal[f'{self.fields[position].attname}__{lookup}'] = (
+                values[position]
+            )
+            conditions.append(Q(**equal))
+        return reduce(or_, conditions)
+
+    def cursor_for(self, obj):
+        return encode_cursor(
+            [field.value_to_string(obj) for field in self.fields]
+        )
+
+    def decode(self, cursor):
+        """
+        Значения ключа из курсора.
+
+        cursor_for() пишет в курсор строки, поэтому всё остальное,
+        как и целые за пределами 64 бит, считается подделкой.
+        """
+        values = decode_cursor(cursor)
+        if len(values) != len(self.fields) or not all(
+            isinstance(value, str) for value in values
+        ):
+            raise InvalidCursor(cursor)
+        try:
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (
+            ValidationError, TypeError, ValueError, OverflowError
+        ) as error:
+            raise InvalidCursor(cursor) from error
+        if any(
+            isinstance(value, int) and not INT64_MIN <= value <= INT64_MAX
+            for value in values
+        ):
+            raise InvalidCursor(cursor)
+        return values
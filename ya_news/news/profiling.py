@@ -0,0 +1,107 @@
+"""
+Профилирование отдельных запросов по требованию.
+
+cProfile сохраняет статистику pstats (.prof), сэмплер стека — свёрнутые
+стеки (.txt) для flamegraph.pl или speedscope. В PROFILER_DIR хранится
+не больше PROFILER_KEEP последних профилей, старые удаляются.
+"""
+import cProfile
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+KINDS = ('cprofile', 'stacks')
+SUFFIXES = {'cprofile': '.prof', 'stacks': '.txt'}
+
+
+def collapse(frame):
+    """Стек кадра одной строкой: от корня к вершине через точку с запятой."""
+    names = []
+    while frame is not None:
+        names.append(
+            f'{frame.f_globals.get("__name__")}:{frame.f_code.co_qualname}'
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """
+    Раз в interval секунд снимает стеки всех потоков процесса.
+
+    В отличие от cProfile видит и цикл событий, и поток, в котором
+    асинхронные представления ходят в базу, но заодно и параллельные
+    запросы. Интерфейс повторяет cProfile.Profile.
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != self.ident:
+                    self.stacks[collapse(frame)] += 1
+
+    def enable(self):
+        self.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.join()
+
+    def dump_stats(self, path):
+        Path(path).write_text(''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        ))
+
+
+def profiler(kind):
+    if kind == 'stacks':
+        return StackSampler(settings.PROFILER_INTERVAL)
+    return cProfile.Profile()
+
+
+def recent():
+    """Сохранённые профили, новые первыми."""
+    directory = Path(settings.PROFILER_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        (
+            path for path in directory.iterdir()
+            if path.suffix in SUFFIXES.values()
+        ),
+        key=lambda path: path.name,
+        reverse=True,
+    )
+
+
+def find(name):
+    """Профиль по имени файла; только из списка, а не любой путь."""
+    for path in recent():
+        if path.name == name:
+            return path
+    return None
+
+
+def save(profiler, kind, request):
+    """Записывает профиль запроса и удаляет лишние старые."""
+    directory = Path(settings.PROFILER_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    match = request.resolver_match
+    view_name = match.view_name.replace(':', '-') if match else 'unknown'
+    path = directory / (
+        f'{datetime.now():%Y%m%d-%H%M%S-%f}-{view_name}{SUFFIXES[kind]}'
+    )
+    profiler.dump_stats(path)
+    for old in recent()[settings.PROFILER_KEEP:]:
+        old.unlink(missing_ok=True)
+    return path.name
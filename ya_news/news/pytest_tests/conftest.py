@@ -3,6 +3,7 @@ from datetime import timedelta
 import pytest
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test.client import Client
 from django.urls import reverse
 from django.utils import timezone
@@ -15,12 +16,67 @@ User = get_user_model()
 pytestmark = pytest.mark.django_db
 
 
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings():
+    """
+    Реплика в тестах — зеркало основной тестовой базы.
+
+    Чтение с неё включают только тесты, которые это проверяют.
+    """
+    settings.DATABASES['replica'] = {
+        **settings.DATABASES['default'], 'TEST': {'MIRROR': 'default'}
+    }
+    settings.NEWS_READ_REPLICAS = []
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш страниц не переживает тест."""
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def api_without_lag(settings):
+    """API сразу отдаёт только что созданные в тесте записи."""
+    settings.NEWS_API_CURSOR_LAG = 0
+
+
 @pytest.fixture
 def home_url():
     """URL главной страницы."""
     return reverse('news:home')
 
 
+@pytest.fixture
+def archive_url():
+    """URL архива новостей."""
+    return reverse('news:archive')
+
+
+@pytest.fixture
+def search_url():
+    """URL поиска по новостям."""
+    return reverse('news:search')
+
+
+@pytest.fixture
+def search_api_url():
+    """URL поиска в JSON."""
+    return reverse('news:search_api')
+
+
+@pytest.fixture
+def rss_url():
+    """URL ленты RSS."""
+    return reverse('news:rss')
+
+
+@pytest.fixture
+def sitemap_url():
+    """URL индекса карты сайта."""
+    return reverse('news:sitemap_index')
+
+
 @pytest.fixture
 def login_url():
     """URL входа автора."""
@@ -45,6 +101,12 @@ def detail_url(news):
     return reverse('news:detail', args=(news.id,))
 
 
+@pytest.fixture
+def comments_url(news):
+    """URL порции комментариев к новости."""
+    return reverse('news:comments', args=(news.id,))
+
+
 @pytest.fixture
 def detail_url_with_comments(detail_url):
     """URL страницы новости с якорем на комментарии."""
@@ -142,11 +204,12 @@ def comments_for_news(author, news):
     возвращает queryset всех комментариев этой новости.
     """
     now = timezone.now()
-    for idx in range(10):
-        c = Comment.objects.create(
-            news=news,
-            author=author,
-            text=f'Текст {idx}'
-        )
-        c.created = now + timedelta(days=idx)
-        c.save()
+    comments = Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {idx}')
+        for idx in range(10)
+    )
+    # created при вставке всегда текущее, даты проставляются отдельно.
+    for idx, comment in enumerate(comments):
+        comment.created = now + timedelta(days=idx)
+    Comment.objects.bulk_update(comments, ('created',))
+    News.shift_comment_count((news.pk,), len(comments))
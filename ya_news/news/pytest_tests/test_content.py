@@ -1,8 +1,29 @@
+import gc
+import json
+import pstats
+import threading
+import warnings
+from datetime import date, timedelta
+from http import HTTPStatus
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from pytest_lazyfixture import lazy_fixture
+
+from performance import metrics
 
+from news.admin import LatestCommentsFormSet
 from news.forms import CommentForm
+from news.models import Comment, News
+from news.pagination import encode_cursor
+from news.views import NewsDetailView, NewsList
 
 
 User = get_user_model()
@@ -25,6 +46,73 @@ def test_news_order(client, news_items, home_url):
     assert dates == sorted(dates, reverse=True)
 
 
+def test_same_date_news_order(client, home_url):
+    """Новости за одну дату упорядочены по убыванию id."""
+    News.objects.bulk_create(
+        News(title=f'Новость {i}', text='Текст') for i in range(3)
+    )
+    ids = [news.id for news in client.get(home_url).context['object_list']]
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_archive_keyset_pagination(
+    client, settings, news_items, archive_url
+):
+    """Архив по курсору отдаёт все новости в порядке главной."""
+    settings.NEWS_COUNT_ON_ARCHIVE_PAGE = 4
+    seen = []
+    cursor = None
+    while True:
+        context = client.get(
+            archive_url, {'cursor': cursor} if cursor else {}
+        ).context
+        seen.extend(news.id for news in context['object_list'])
+        if not context['page'].has_next:
+            break
+        cursor = context['page'].next_cursor
+    assert seen == list(News.objects.values_list('id', flat=True))
+
+
+def test_archive_month(client):
+    """Архив за месяц содержит только новости этого месяца."""
+    may = News.objects.create(
+        title='Май', text='Текст', date=date(2024, 5, 31)
+    )
+    News.objects.create(title='Июнь', text='Текст', date=date(2024, 6, 1))
+    response = client.get(reverse('news:archive_month', args=(2024, 5)))
+    assert list(response.context['object_list']) == [may]
+    assert [
+        (month.first_day, month.news_count)
+        for month in response.context['archive_months']
+    ] == [(date(2024, 6, 1), 1), (date(2024, 5, 1), 1)]
+
+
+@pytest.mark.parametrize('name, args', (
+    ('news:archive_year', (9999,)),
+    ('news:archive_month', (9999, 12)),
+    ('news:archive_month', (2024, 0)),
+    ('news:archive_month', (2024, 13)),
+    ('news:archive_year', (10 ** 20,)),
+    ('news:archive_month', (2024, 10 ** 20)),
+))
+def test_archive_out_of_range(client, name, args):
+    response = client.get(reverse(name, args=args))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_home_page_comment_count(
+    client, news, comments_for_news, home_url, django_assert_num_queries
+):
+    """
+    Число комментариев на главной берётся из счётчика
+    одним запросом, без загрузки самих комментариев.
+    """
+    with django_assert_num_queries(1):
+        response = client.get(home_url)
+    assert response.context['object_list'][0].comment_count == 10
+    assert 'Комментариев: 10' in response.content.decode()
+
+
 def test_comments_order(client, comments_for_news, detail_url):
     """
     На странице детали комментарии должны идти
@@ -36,6 +124,193 @@ def test_comments_order(client, comments_for_news, detail_url):
     assert timestamps == sorted(timestamps)
 
 
+def test_comments_keyset_pagination(
+    client, settings, news, comments_for_news, detail_url
+):
+    """
+    Комментарии выводятся порциями по курсору:
+    без пропусков, повторов и без OFFSET в запросах.
+    """
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 4
+    page = client.get(detail_url).context['comments']
+    seen = list(page)
+    with CaptureQueriesContext(connection) as queries:
+        while page.has_next:
+            page = client.get(
+                reverse('news:comments', args=(news.id,)),
+                {'cursor': page.next_cursor}
+            ).context['comments']
+            seen.extend(page)
+    assert [comment.id for comment in seen] == list(
+        news.comment_set.order_by('created', 'id').values_list(
+            'id', flat=True
+        )
+    )
+    assert not any('OFFSET' in query['sql'] for query in queries)
+
+
+def test_invalid_comments_cursor(client, detail_url):
+    """Испорченный курсор приводит к 404, а не к ошибке сервера."""
+    response = client.get(detail_url, {'cursor': 'не-курсор'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_comments_of_missing_news(client):
+    response = client.get(reverse('news:comments', args=(404,)))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_anonymous_pages_are_cached(
+    client, news, home_url, detail_url, django_assert_num_queries
+):
+    """Повторный запрос анонима не обращается к базе."""
+    for url in (home_url, detail_url):
+        first = client.get(url)
+        with django_assert_num_queries(0):
+            second = client.get(url)
+        assert second.content == first.content
+
+
+def test_read_views_are_async():
+    """Главная и страница новости читаются асинхронно."""
+    assert NewsList.view_is_async
+    assert NewsDetailView.view_is_async
+
+
+@pytest.mark.parametrize(
+    'url', (lazy_fixture('home_url'), lazy_fixture('detail_url'))
+)
+def test_async_client_gets_same_pages(
+    client, async_client, comments_for_news, url
+):
+    """Через ASGI страницы совпадают с полученными через WSGI."""
+    response = async_to_sync(async_client.get)(url)
+    assert response.status_code == HTTPStatus.OK
+    assert response.content == client.get(url).content
+
+
+def test_page_cache_invalidated_by_comment(
+    client, author, news, home_url, detail_url,
+    django_capture_on_commit_callbacks
+):
+    """Новый комментарий сразу виден на закэшированных страницах."""
+    client.get(home_url)
+    client.get(detail_url)
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(news=news, author=author, text='Свежий')
+    assert 'Комментариев: 1' in client.get(home_url).content.decode()
+    assert 'Свежий' in client.get(detail_url).content.decode()
+
+
+def test_page_cache_invalidation_is_per_news(
+    client, news, detail_url, django_capture_on_commit_callbacks,
+    django_assert_num_queries
+):
+    """Изменение другой новости не сбрасывает кэш этой."""
+    client.get(detail_url)
+    with django_capture_on_commit_callbacks(execute=True):
+        News.objects.create(title='Другая', text='Текст')
+    with django_assert_num_queries(0):
+        client.get(detail_url)
+
+
+def test_authenticated_pages_are_not_cached(author_client, detail_url):
+    """Авторизованный пользователь получает страницу с формой."""
+    author_client.get(detail_url)
+    assert author_client.get(detail_url).context['form'] is not None
+
+
+@pytest.mark.parametrize('user_client, expected_queries', [
+    # Аноним получает 304 прямо из кэша страниц.
+    (lazy_fixture('client'), 0),
+    # Сессия, пользователь и один запрос валидаторов.
+    (lazy_fixture('author_client'), 3),
+])
+def test_detail_conditional_get(
+    user_client, expected_queries, comment, detail_url,
+    django_assert_num_queries
+):
+    """
+    Неизменившаяся страница новости отдаётся ответом 304
+    без загрузки комментариев.
+    """
+    response = user_client.get(detail_url)
+    for headers in (
+        {'HTTP_IF_NONE_MATCH': response['ETag']},
+        {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+    ):
+        with django_assert_num_queries(expected_queries):
+            assert user_client.get(
+                detail_url, **headers
+            ).status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_detail_etag_changes_with_comments(
+    author_client, author, news, comment, detail_url
+):
+    """Новый комментарий меняет ETag страницы новости."""
+    etag = author_client.get(detail_url)['ETag']
+    Comment.objects.create(news=news, author=author, text='Ещё один')
+    response = author_client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert response['ETag'] != etag
+
+
+def test_detail_validators_follow_comment_changes(
+    author_client, comment, detail_url
+):
+    """
+    Правка и удаление комментария меняют ETag,
+    а Last-Modified при этом не уходит назад.
+    """
+    response = author_client.get(detail_url)
+    for change in (comment.save, comment.delete):
+        change()
+        new_response = author_client.get(
+            detail_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        assert new_response.status_code == HTTPStatus.OK
+        assert parse_http_date(new_response['Last-Modified']) >= (
+            parse_http_date(response['Last-Modified'])
+        )
+        response = new_response
+
+
+def test_comment_fragment_follows_edit(
+    author_client, comment, detail_url, edit_url,
+    django_capture_on_commit_callbacks
+):
+    """Закэшированный блок комментария обновляется после правки."""
+    assert comment.text in author_client.get(detail_url).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(edit_url, {'text': 'Исправленный текст'})
+    content = author_client.get(detail_url).content.decode()
+    assert 'Исправленный текст' in content
+    assert comment.text not in content
+
+
+def test_news_card_fragment_follows_changes(
+    author_client, author, news, home_url,
+    django_capture_on_commit_callbacks
+):
+    """Карточка новости обновляется при правке и новом комментарии."""
+    author_client.get(home_url)
+    with django_capture_on_commit_callbacks(execute=True):
+        news.title = 'Новый заголовок'
+        news.save()
+    assert 'Новый заголовок' in author_client.get(home_url).content.decode()
+    Comment.objects.create(news=news, author=author, text='Текст')
+    assert 'Комментариев: 1' in author_client.get(home_url).content.decode()
+
+
+def test_comment_links_are_not_cached(
+    author_client, reader_client, comment, detail_url, edit_url
+):
+    """Ссылки правки видит только автор, хотя блок комментария общий."""
+    assert edit_url in author_client.get(detail_url).content.decode()
+    assert edit_url not in reader_client.get(detail_url).content.decode()
+
+
 def test_comment_form_for_anonymous(client, detail_url):
     """Анонимный пользователь не видит форму комментария."""
     assert client.get(detail_url).context.get('form') is None
@@ -47,3 +322,530 @@ def test_comment_form_for_author_user(author_client, detail_url):
         author_client.get(detail_url).context.get('form'),
         CommentForm
     )
+
+
+def test_search_ranks_titles_and_highlights(client, author, search_url):
+    """Совпадение в заголовке выше совпадения в тексте, HTML экранирован."""
+    in_text = News.objects.create(
+        title='Прогноз', text='Ожидается <b>метель</b> и снег'
+    )
+    in_title = News.objects.create(title='Метель в городе', text='Текст')
+    Comment.objects.create(news=in_text, author=author, text='Опять метель')
+    hits = list(client.get(search_url, {'q': 'метел'}).context['page'])
+    assert [hit.news_id for hit in hits[:1]] == [in_title.pk]
+    assert {hit.is_comment for hit in hits} == {False, True}
+    snippet = next(
+        hit for hit in hits if hit.rowid == in_text.pk * 2
+    ).snippet
+    assert '&lt;b&gt;<mark>метель</mark>&lt;/b&gt;' in snippet
+
+
+def test_search_keyset_pagination(client, settings, search_url, news_items):
+    """Страницы поиска не пересекаются и вместе дают все совпадения."""
+    settings.NEWS_SEARCH_RESULTS_PER_PAGE = 3
+    found = []
+    cursor = ''
+    while True:
+        page = client.get(
+            search_url, {'q': 'текст', 'cursor': cursor}
+        ).context['page']
+        found += [hit.rowid for hit in page]
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+    assert sorted(found) == sorted(
+        news.pk * 2 for news in News.objects.all()
+    )
+
+
+def test_search_api(client, news, search_api_url):
+    data = client.get(search_api_url, {'q': news.title}).json()
+    assert [hit['news'] for hit in data['results']] == [news.pk]
+    assert data['next_cursor'] is None
+
+
+@pytest.mark.parametrize('params', (
+    {'q': '"'}, {'q': 'AND OR NOT'}, {'q': ''},
+))
+def test_search_ignores_query_syntax(client, news, search_api_url, params):
+    """Служебные слова и кавычки FTS5 во вводе не вызывают ошибок."""
+    assert client.get(search_api_url, params).json()['results'] == []
+
+
+@pytest.mark.parametrize('cursor', (
+    'плохой',
+    encode_cursor([1.0, 10 ** 30]),
+    encode_cursor([1.0, -10 ** 30]),
+    encode_cursor([1e400, 1]),
+    encode_cursor([{}, 1]),
+))
+def test_search_invalid_cursor(client, news, search_url, cursor):
+    response = client.get(search_url, {'q': 'текст', 'cursor': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_admin_news_inline_shows_latest_comments(
+    admin_client, monkeypatch, news, comments_for_news
+):
+    """В форме новости только последние комментарии, остальные — по ссылке."""
+    monkeypatch.setattr(LatestCommentsFormSet, 'limit', 3)
+    response = admin_client.get(
+        reverse('admin:news_news_change', args=(news.pk,))
+    )
+    formset = response.context['inline_admin_formsets'][0].formset
+    assert [form.instance for form in formset.initial_forms] == list(
+        Comment.objects.order_by('-created', '-id')[:3]
+    )
+    assert f'news__id__exact={news.pk}' in response.content.decode()
+
+
+@pytest.mark.parametrize('name', (
+    'admin:news_news_changelist', 'admin:news_comment_changelist',
+))
+def test_admin_changelists(
+    admin_client, comments_for_news, name, django_assert_max_num_queries
+):
+    """Списки в админке не делают запросов на каждую строку."""
+    with django_assert_max_num_queries(6):
+        assert admin_client.get(reverse(name)).status_code == HTTPStatus.OK
+
+
+def test_admin_news_delete_shows_counts(
+    admin_client, news, comments_for_news, django_assert_max_num_queries
+):
+    """Подтверждение удаления новости — число комментариев, а не их список."""
+    url = reverse('admin:news_news_delete', args=(news.pk,))
+    with django_assert_max_num_queries(6):
+        response = admin_client.get(url)
+    content = response.content.decode()
+    assert 'Комментарии: 10' in content
+    assert 'Текст 1' not in content
+    assert dict(response.context['model_count']) == {
+        'Новости': 1, 'comments': 10
+    }
+    admin_client.post(url, {'post': 'yes'})
+    assert not News.objects.exists() and not Comment.objects.exists()
+
+
+async def read_stream(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+def export(client, name, **params):
+    """
+    Разобранный JSON потоковой выгрузки под WSGI: синхронный поток,
+    который Django не собирает в памяти с предупреждением.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        response = client.get(reverse(name), params)
+        assert response.streaming and not response.is_async
+        return json.loads(b''.join(response.streaming_content))
+
+
+def test_api_news_changes_since(client, settings, news_items):
+    """Курсор since отдаёт только то, что изменилось после него."""
+    settings.NEWS_API_PAGE_SIZE = 4
+    url = reverse('news:api_news')
+    seen = []
+    data = {'has_more': True, 'since': ''}
+    while data['has_more']:
+        data = client.get(url, {'since': data['since']}).json()
+        seen += [news['id'] for news in data['results']]
+    assert sorted(seen) == sorted(News.objects.values_list('pk', flat=True))
+    assert client.get(url, {'since': data['since']}).json()['results'] == []
+    changed = News.objects.last()
+    changed.title = 'Исправленный заголовок'
+    changed.save()
+    assert [
+        news['title']
+        for news in client.get(url, {'since': data['since']}).json()['results']
+    ] == [changed.title]
+
+
+def test_api_news_changes_on_new_comment(client, author, news):
+    """Новый комментарий меняет счётчик, и новость снова в выдаче."""
+    url = reverse('news:api_news')
+    since = client.get(url).json()['since']
+    Comment.objects.create(news=news, author=author, text='Текст')
+    results = client.get(url, {'since': since}).json()['results']
+    assert [(item['id'], item['comment_count']) for item in results] == [
+        (news.pk, 1)
+    ]
+
+
+@pytest.mark.parametrize('name, model', (
+    ('news:api_export_news', News),
+    ('news:api_export_comments', Comment),
+))
+def test_api_export_streams_everything(
+    client, settings, news_items, comments_for_news, name, model
+):
+    """Выгрузка по частям собирается в корректный JSON со всеми записями."""
+    settings.NEWS_API_EXPORT_CHUNK_SIZE = 3
+    data = export(client, name)
+    assert [item['id'] for item in data['results']] == list(
+        model.objects.order_by('updated', 'id').values_list('pk', flat=True)
+    )
+    assert export(client, name, since=data['since'])['results'] == []
+
+
+def test_api_export_streams_async_under_asgi(
+    async_client, settings, news_items
+):
+    """Под ASGI выгрузка идёт асинхронным потоком."""
+    settings.NEWS_API_EXPORT_CHUNK_SIZE = 3
+    response = async_to_sync(async_client.get)(
+        reverse('news:api_export_news')
+    )
+    assert response.is_async
+    data = json.loads(async_to_sync(read_stream)(response))
+    assert [item['id'] for item in data['results']] == list(
+        News.objects.order_by('updated', 'id').values_list('pk', flat=True)
+    )
+
+
+def test_api_holds_back_recent_changes(client, settings, news):
+    """Изменения моложе NEWS_API_CURSOR_LAG в выдачу ещё не попадают."""
+    settings.NEWS_API_CURSOR_LAG = 60
+    url = reverse('news:api_news')
+    assert client.get(url).json()['results'] == []
+    assert export(client, 'news:api_export_news')['results'] == []
+    News.objects.filter(pk=news.pk).update(
+        updated=timezone.now() - timedelta(minutes=2)
+    )
+    assert [item['id'] for item in client.get(url).json()['results']] == [
+        news.pk
+    ]
+
+
+def test_api_news_comments(client, settings, news, comments_for_news):
+    settings.NEWS_API_PAGE_SIZE = 4
+    url = reverse('news:api_news_comments', args=(news.pk,))
+    texts = []
+    data = {'next_cursor': ''}
+    while data['next_cursor'] is not None:
+        data = client.get(url, {'cursor': data['next_cursor']}).json()
+        texts += [comment['text'] for comment in data['results']]
+    assert texts == list(
+        news.comment_set.order_by('created').values_list('text', flat=True)
+    )
+
+
+@pytest.mark.parametrize('name', (
+    'news:api_news', 'news:api_comments', 'news:api_export_news',
+))
+def test_api_invalid_since(client, name):
+    response = client.get(reverse(name), {'since': 'плохой'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+FORGED_CURSORS = (
+    encode_cursor([{}, 1]),
+    encode_cursor([None, None]),
+    encode_cursor(['2024-01-01', str(10 ** 30)]),
+    encode_cursor(['2024-01-01T00:00:00+00:00', str(10 ** 30)]),
+    encode_cursor(['не дата', '1']),
+)
+
+
+@pytest.mark.parametrize('cursor', FORGED_CURSORS)
+@pytest.mark.parametrize('url, param', (
+    (lazy_fixture('detail_url'), 'cursor'),
+    (lazy_fixture('archive_url'), 'cursor'),
+    (reverse_lazy('news:api_news'), 'since'),
+    (reverse_lazy('news:api_export_comments'), 'since'),
+))
+def test_forged_cursor(client, news, url, param, cursor):
+    """Разобранный, но поддельный курсор — это 404, а не ошибка сервера."""
+    response = client.get(url, {param: cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize('name, item_tag', (
+    ('news:rss', '<item>'),
+    ('news:atom', '<entry>'),
+))
+def test_feed_lists_latest_news(
+    client, settings, news_items, name, item_tag,
+    django_assert_num_queries
+):
+    """Лента строится одним запросом и до изменения новостей в кэше."""
+    settings.NEWS_FEED_SIZE = 5
+    with django_assert_num_queries(1):
+        content = client.get(reverse(name)).content.decode()
+    assert content.count(item_tag) == settings.NEWS_FEED_SIZE
+    assert News.objects.first().title in content
+    with django_assert_num_queries(0):
+        client.get(reverse(name))
+
+
+def test_feed_follows_news_changes(
+    client, news, django_capture_on_commit_callbacks
+):
+    url = reverse('news:rss')
+    etag = client.get(url)['ETag']
+    assert client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == HTTPStatus.NOT_MODIFIED
+    with django_capture_on_commit_callbacks(execute=True):
+        news.title = 'Новый заголовок'
+        news.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert 'Новый заголовок' in response.content.decode()
+
+
+def test_feed_cached_per_host_and_scheme(client, news):
+    """Ссылки в ленте абсолютные, поэтому кэш и ETag у каждого адреса свои."""
+    url = reverse('news:rss')
+    responses = [
+        client.get(url, HTTP_HOST='localhost'),
+        client.get(url, HTTP_HOST='127.0.0.1'),
+        client.get(url, HTTP_HOST='localhost', secure=True),
+    ]
+    for response, link in zip(responses, (
+        'http://localhost/', 'http://127.0.0.1/', 'https://localhost/'
+    )):
+        assert link in response.content.decode()
+    assert len({response['ETag'] for response in responses}) == 3
+
+
+def test_sitemap_is_split_into_pages(client, settings, news_items):
+    """Индекс ссылается на страницы карты по NEWS_SITEMAP_LIMIT новостей."""
+    settings.NEWS_SITEMAP_LIMIT = 4
+    index = client.get(reverse('news:sitemap_index')).content.decode()
+    section = reverse('news:sitemap', kwargs={'section': 'news'})
+    assert index.count(section) == 3
+    assert f'{section}?p=3' in index
+    last = client.get(section, {'p': 3}).content.decode()
+    assert last.count('<url>') == News.objects.count() - 8
+    assert News.objects.order_by('id').last().get_absolute_url() in last
+    assert client.get(
+        section, {'p': 4}
+    ).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_sitemap_pages_by_id_range(
+    client, settings, django_capture_on_commit_callbacks
+):
+    """Страница карты — диапазон id: без COUNT(*) и OFFSET, без сдвигов."""
+    settings.NEWS_SITEMAP_LIMIT = 4
+    for i in range(11):
+        News.objects.create(title=f'Новость {i}', text='Просто текст')
+    section = reverse('news:sitemap', kwargs={'section': 'news'})
+    with CaptureQueriesContext(connection) as queries:
+        last = client.get(section, {'p': 3}).content.decode()
+    sql = ' '.join(query['sql'] for query in queries).upper()
+    assert 'COUNT(' not in sql and 'OFFSET' not in sql
+    with django_capture_on_commit_callbacks(execute=True):
+        News.objects.order_by('id').first().delete()
+    assert client.get(section, {'p': 3}).content.decode() == last
+
+
+def test_sitemap_conditional_get(client, news, django_assert_num_queries):
+    url = reverse('news:sitemap_index')
+    response = client.get(url)
+    for headers in (
+        {'HTTP_IF_NONE_MATCH': response['ETag']},
+        {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+    ):
+        with django_assert_num_queries(0):
+            assert client.get(
+                url, **headers
+            ).status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.parametrize('url, url_name', (
+    (lazy_fixture('detail_url'), 'news:detail'),
+    (lazy_fixture('archive_url'), 'news:archive'),
+))
+def test_timing_middleware(
+    client, settings, caplog, comment, url, url_name
+):
+    """Замеры запроса попадают в Server-Timing и в лог."""
+    settings.PERFORMANCE_SAMPLE_RATE = 1
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    names = [
+        metric.split(';')[0]
+        for metric in response['Server-Timing'].split(', ')
+    ]
+    assert names == ['total', 'view', 'render', 'db', 'mem']
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['url_name'] == url_name
+    assert record['sql_count'] == len(queries)
+    assert record['render_ms'] > 0
+
+
+def test_timing_middleware_async(async_client, settings, caplog, news):
+    settings.PERFORMANCE_SAMPLE_RATE = 1
+    response = async_to_sync(async_client.get)(
+        reverse('news:detail', args=(news.pk,))
+    )
+    assert 'Server-Timing' in response
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['url_name'] == 'news:detail'
+    assert record['sql_count'] > 0
+
+
+def test_timing_middleware_is_off_by_default(client, home_url):
+    assert 'Server-Timing' not in client.get(home_url)
+
+
+@pytest.fixture
+def profiles_dir(settings, tmp_path):
+    settings.PROFILER_DIR = tmp_path
+    return tmp_path
+
+
+def test_profile_for_staff(admin_client, profiles_dir, detail_url):
+    """Профиль cProfile сохраняется и читается pstats."""
+    response = admin_client.get(detail_url, {'profile': 'cprofile'})
+    assert response['X-Profile'].endswith('-news-detail.prof')
+    stats = pstats.Stats(str(profiles_dir / response['X-Profile']))
+    assert stats.total_calls > 0
+
+
+def test_profile_stacks_by_token(client, settings, profiles_dir, detail_url):
+    settings.PROFILER_TOKEN = 'secret'
+    settings.PROFILER_INTERVAL = 0.0001
+    response = client.get(
+        detail_url, {'profile': 'stacks'}, HTTP_X_PROFILE_TOKEN='secret'
+    )
+    lines = (profiles_dir / response['X-Profile']).read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+
+
+@pytest.mark.parametrize('headers', (
+    {}, {'HTTP_X_PROFILE_TOKEN': 'secret'}, {'HTTP_X_PROFILE_TOKEN': ''},
+))
+def test_profile_denied(
+    author_client, settings, profiles_dir, detail_url, headers
+):
+    settings.PROFILER_TOKEN = ''
+    response = author_client.get(
+        detail_url, {'profile': 'cprofile'}, **headers
+    )
+    assert 'X-Profile' not in response
+    assert not list(profiles_dir.iterdir())
+
+
+def test_profile_async(async_client, admin_user, profiles_dir, news):
+    async_client.force_login(admin_user)
+    response = async_to_sync(async_client.get)(
+        reverse('news:detail', args=(news.pk,)), {'profile': 'stacks'}
+    )
+    assert (profiles_dir / response['X-Profile']).exists()
+
+
+def test_profiles_retention(admin_client, settings, profiles_dir, detail_url):
+    settings.PROFILER_KEEP = 2
+    names = [
+        admin_client.get(detail_url, {'profile': ''})['X-Profile']
+        for _ in range(3)
+    ]
+    assert sorted(path.name for path in profiles_dir.iterdir()) == names[1:]
+
+
+def test_profiles_admin(admin_client, client, profiles_dir, detail_url):
+    name = admin_client.get(detail_url, {'profile': ''})['X-Profile']
+    response = admin_client.get(reverse('admin_profiles'))
+    assert [row['name'] for row in response.context['profiles']] == [name]
+    url = reverse('admin_profile', args=(name,))
+    assert b''.join(admin_client.get(url).streaming_content) == (
+        profiles_dir / name
+    ).read_bytes()
+    assert admin_client.get(
+        reverse('admin_profile', args=('missing.prof',))
+    ).status_code == HTTPStatus.NOT_FOUND
+    assert client.get(url).status_code == HTTPStatus.FOUND
+
+
+def metric(client, line):
+    """Значение строки метрики со страницы /metrics, 0 если её нет."""
+    for text in client.get(reverse('metrics')).content.decode().splitlines():
+        name, _, value = text.rpartition(' ')
+        if name == line:
+            return float(value)
+    return 0
+
+
+def test_metrics(client, news, home_url):
+    """Гистограмма ответов, запросы к базе и попадания в кэш страниц."""
+    count = (
+        'http_request_duration_seconds_count'
+        '{status="200",view="news:home"}'
+    )
+    hits = 'cache_requests_total{cache="page",result="hit"}'
+    before = {line: metric(client, line) for line in (count, hits)}
+    queries = metric(client, 'db_queries_total')
+    for _ in range(3):
+        client.get(home_url)
+    assert metric(client, count) == before[count] + 3
+    assert metric(client, hits) == before[hits] + 2
+    assert metric(client, 'db_queries_total') > queries
+    response = client.get(reverse('metrics'))
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    buckets = [
+        float(line.rpartition(' ')[2])
+        for line in response.content.decode().splitlines()
+        if line.startswith('http_request_duration_seconds_bucket{')
+        and 'view="news:home"' in line
+    ]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == metric(client, count)
+
+
+def test_metrics_writes(
+    author_client, news, detail_url, django_capture_on_commit_callbacks
+):
+    line = 'writes_total{action="create",model="comment"}'
+    before = metric(author_client, line)
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(detail_url, data={'text': 'Комментарий'})
+    assert metric(author_client, line) == before + 1
+
+
+def test_metrics_multiprocess(client, settings, tmp_path):
+    settings.METRICS_DIR = tmp_path
+    line = 'writes_total{action="delete",model="news"}'
+    before = metric(client, line)
+    (tmp_path / '1.json').write_text(json.dumps([
+        ['writes_total', [['action', 'delete'], ['model', 'news']], 5],
+    ]))
+    assert metric(client, line) == before + 5
+    assert len(list(tmp_path.glob('*.json'))) == 2
+
+
+def test_metrics_token(client, settings):
+    settings.METRICS_TOKEN = 'secret'
+    url = reverse('metrics')
+    assert client.get(url).status_code == HTTPStatus.FORBIDDEN
+    assert client.get(
+        url, HTTP_AUTHORIZATION='Bearer secret'
+    ).status_code == HTTPStatus.OK
+
+
+def test_metrics_are_per_thread():
+    """
+    Потоки пишут каждый в свой словарь, итог складывается,
+    а словари завершённых потоков сливаются в общий.
+    """
+    def work():
+        for _ in range(1000):
+            metrics.inc('test_total')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    before = metrics.totals()['test_total', ()]
+    threads_before = len(metrics.registry)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+    assert len(metrics.registry) <= threads_before
+    assert metrics.totals()['test_total', ()] == before + 4000
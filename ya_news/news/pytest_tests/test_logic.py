@@ -1,13 +1,41 @@
+import csv
+import io
+import json
+import os
+import runpy
+import time
+from datetime import timedelta
 from http import HTTPStatus
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from pytest_lazyfixture import lazy_fixture
+
+from performance import querystats
 
 from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.management.commands import import_news
+from news.models import Comment, News, NewsArchiveMonth
+from news import search
+from news.moderation import AhoCorasickMatcher, BadWordsFilter, RegexMatcher
+from yanews import settings as project_settings
 
 pytestmark = pytest.mark.django_db
 
 FORM_DATA = {'text': 'Новый текст'}
+# Каждый запрос авторизованного клиента читает сессию и пользователя.
+AUTH_QUERIES = 2
+# Изменение счётчика идёт в одной транзакции с комментарием,
+# внутри теста это точка сохранения и её освобождение.
+SAVEPOINT_QUERIES = 2
 BAD_WORD_FORM_DATAS = [
     ({"text": f"Какой-то текст, {bw}, еще текст"})
     for bw in BAD_WORDS
@@ -37,6 +65,8 @@ def test_user_can_create_comment(
     assert new_comment.text == FORM_DATA['text']
     assert new_comment.news == news
     assert new_comment.author == author
+    news.refresh_from_db()
+    assert news.comment_count == 1
 
 
 @pytest.mark.parametrize('data', BAD_WORD_FORM_DATAS)
@@ -48,6 +78,41 @@ def test_user_cant_use_bad_words(author_client, detail_url, data):
     assert Comment.objects.count() == 0
 
 
+def test_bad_words_are_reported(author_client, detail_url):
+    """Форма сообщает, какие именно слова запрещены."""
+    response = author_client.post(
+        detail_url, data={'text': 'Ты РЕДИСКА и негодяй'}
+    )
+    assert response.context['form'].bad_words == {'редиска', 'негодяй'}
+
+
+@pytest.mark.parametrize('matcher_class', [AhoCorasickMatcher, RegexMatcher])
+def test_bad_words_filter_reloads_lexicon(tmp_path, matcher_class):
+    """Словарь читается из файла и пересобирается после его изменения."""
+    lexicon = tmp_path / 'lexicon.txt'
+    lexicon.write_text('# словарь\nБука\n\n', encoding='utf-8')
+    bad_words = BadWordsFilter(
+        ('бяка',), path=lexicon, matcher_class=matcher_class
+    )
+    assert bad_words.find('Бяка и бука') == {'бяка', 'бука'}
+    assert bad_words.find('злюка') == set()
+    lexicon.write_text('злюка\n', encoding='utf-8')
+    os.utime(lexicon, ns=(0, 0))
+    assert bad_words.find('злюка и бука') == {'злюка'}
+
+
+def test_bad_words_filter_survives_missing_lexicon(tmp_path):
+    """Пока файла словаря нет, работает последний прочитанный словарь."""
+    lexicon = tmp_path / 'lexicon.txt'
+    lexicon.write_text('бука\n', encoding='utf-8')
+    bad_words = BadWordsFilter(path=lexicon)
+    lexicon.unlink()
+    assert bad_words.find('бука') == {'бука'}
+    lexicon.write_text('злюка\n', encoding='utf-8')
+    os.utime(lexicon, ns=(0, 0))
+    assert bad_words.find('злюка и бука') == {'злюка'}
+
+
 def test_author_can_delete_comment(
     author_client, delete_url, detail_url_with_comments, comment
 ):
@@ -60,6 +125,7 @@ def test_author_can_delete_comment(
 
     assert Comment.objects.count() == before_ids - 1
     assert not Comment.objects.filter(id=comment.id).exists()
+    assert News.objects.get(id=comment.news_id).comment_count == 0
 
 
 def test_reader_cant_delete_comment(reader_client, delete_url, comment):
@@ -100,3 +166,363 @@ def test_reader_cant_edit_comment(reader_client, edit_url, comment):
     assert unchanged_comment.text == comment.text
     assert unchanged_comment.author == comment.author
     assert unchanged_comment.news == comment.news
+
+
+def test_recount_counters_fixes_drift(news, comments_for_news):
+    """Команда recount_counters восстанавливает счётчик комментариев."""
+    News.objects.filter(id=news.id).update(comment_count=42)
+    call_command('recount_counters')
+    news.refresh_from_db()
+    assert news.comment_count == 10
+
+
+def test_archive_month_counters(news):
+    """Счётчики архива следуют за созданием, переносом и удалением."""
+    def counters():
+        return dict(
+            NewsArchiveMonth.objects.filter(news_count__gt=0).values_list(
+                'year', 'news_count'
+            )
+        )
+
+    assert counters() == {news.date.year: 1}
+    news.date = news.date.replace(year=2000)
+    news.save()
+    assert counters() == {2000: 1}
+    news.delete()
+    assert counters() == {}
+
+
+def test_cascade_delete_shifts_counters(author, reader, news):
+    """Счётчики сдвигаются и при каскадном или массовом удалении."""
+    for user in (author, author, reader):
+        Comment.objects.create(news=news, author=user, text='Текст')
+    author.delete()
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    Comment.objects.all().delete()
+    news.refresh_from_db()
+    assert news.comment_count == 0
+    News.objects.all().delete()
+    assert not NewsArchiveMonth.objects.filter(news_count__gt=0).exists()
+
+
+def test_recount_counters_rebuilds_archive(news_items):
+    """recount_counters заполняет архив после bulk_create."""
+    call_command('recount_counters')
+    assert sum(
+        NewsArchiveMonth.objects.values_list('news_count', flat=True)
+    ) == News.objects.count()
+
+
+@pytest.mark.parametrize('url, data, queries', [
+    # Новость, INSERT комментария и UPDATE счётчика.
+    (lazy_fixture('detail_url'), FORM_DATA, 3 + SAVEPOINT_QUERIES),
+    # Комментарий вместе с новостью и UPDATE.
+    (lazy_fixture('edit_url'), FORM_DATA, 2),
+    # Комментарий, DELETE и UPDATE счётчика в транзакции удаления.
+    (lazy_fixture('delete_url'), None, 3),
+])
+def test_post_query_counts(
+    author_client, comment, url, data, queries, detail_url_with_comments,
+    django_assert_num_queries
+):
+    """Объекты ищутся один раз за запрос, без повторных выборок."""
+    with django_assert_num_queries(AUTH_QUERIES + queries):
+        response = author_client.post(url, data)
+    assert response.url == detail_url_with_comments
+
+
+IMPORT_ROWS = [
+    {'model': 'news', 'id': '100', 'title': 'Архив', 'text': 'Текст',
+     'date': '2020-01-05'},
+    {'model': 'comment', 'news': '100', 'author': 'Лев Толстой',
+     'text': 'Первый', 'created': '2020-01-06T10:00:00'},
+    {'model': 'comment', 'news': '100', 'author': 'Лев Толстой',
+     'text': 'Ах ты редиска'},
+    {'model': 'comment', 'news': '100', 'author': 'Незнакомец',
+     'text': 'Второй'},
+]
+
+
+@pytest.mark.parametrize('suffix', ['jsonl', 'csv'])
+def test_import_news(tmp_path, author, suffix):
+    """
+    Импорт загружает новости и комментарии пачками,
+    пропуская запрещённые слова и неизвестных авторов.
+    """
+    path = tmp_path / f'archive.{suffix}'
+    with open(path, 'w', encoding='utf-8', newline='') as archive:
+        if suffix == 'jsonl':
+            archive.writelines(
+                json.dumps(row, ensure_ascii=False) + '\n'
+                for row in IMPORT_ROWS
+            )
+        else:
+            writer = csv.DictWriter(archive, fieldnames=[
+                'model', 'id', 'title', 'text', 'date', 'news', 'author',
+                'created',
+            ])
+            writer.writeheader()
+            writer.writerows(IMPORT_ROWS)
+    call_command('import_news', path, batch_size=2)
+    news = News.objects.get(id=100)
+    assert news.comment_count == 1
+    comment = Comment.objects.get()
+    assert (comment.news, comment.author, comment.text) == (
+        news, author, 'Первый'
+    )
+    assert comment.created.year == 2020
+    assert NewsArchiveMonth.objects.get(year=2020, month=1).news_count == 1
+
+
+@pytest.mark.parametrize('check_ids', [True, False])
+def test_import_news_rejects_bad_rows(tmp_path, monkeypatch, news, check_ids):
+    """
+    Битый JSON, не объекты и занятые id отклоняются, а не роняют импорт,
+    даже если id заняли уже после проверки.
+    """
+    if not check_ids:
+        monkeypatch.setattr(
+            import_news.Command, 'drop_taken_ids', lambda self, batch: batch
+        )
+    row = {'model': 'news', 'id': '100', 'title': 'Архив', 'text': 'Текст',
+           'date': '2020-01-05'}
+    path = tmp_path / 'archive.jsonl'
+    path.write_text('\n'.join((
+        '{"model": "news"',
+        '["news"]',
+        json.dumps(row),
+        json.dumps(row),
+        json.dumps({**row, 'id': str(news.pk)}),
+    )) + '\n', encoding='utf-8')
+    stdout = io.StringIO()
+    call_command('import_news', path, stdout=stdout, stderr=io.StringIO())
+    assert News.objects.filter(id=100).count() == 1
+    assert News.objects.count() == 2
+    assert 'отклонено 4.' in stdout.getvalue()
+
+
+@pytest.mark.parametrize('row', (
+    {'model': 'comment', 'news': '100', 'author': 'Лев Толстой', 'text': 123},
+    {'model': 'comment', 'news': '100', 'author': ['a'], 'text': 'Текст'},
+    {'model': 'news', 'title': {}, 'text': 'Текст', 'date': '2020-01-05'},
+    {'model': 'news', 'title': 'Архив', 'text': 1, 'date': '2020-01-05'},
+))
+def test_import_news_rejects_wrong_types(tmp_path, author, row):
+    """Нестроковые текстовые поля отклоняются, а не роняют импорт."""
+    path = tmp_path / 'archive.jsonl'
+    path.write_text(
+        '\n'.join(map(json.dumps, (IMPORT_ROWS[0], row))) + '\n',
+        encoding='utf-8',
+    )
+    stdout = io.StringIO()
+    call_command('import_news', path, stdout=stdout, stderr=io.StringIO())
+    assert 'отклонено 1.' in stdout.getvalue()
+    assert not Comment.objects.exists()
+
+
+def test_search_index_follows_changes(author, news, comment):
+    """Триггеры обновляют индекс при изменении и удалении."""
+    comment.text = 'Уникальное слово'
+    comment.save()
+    assert [hit.comment_id for hit in search.search('уникальное')] == [
+        comment.pk
+    ]
+    news.title = 'Переименованная'
+    news.save()
+    assert [hit.news_id for hit in search.search('переименованная')] == [
+        news.pk
+    ]
+    news.delete()
+    assert search.count() == 0
+
+
+def test_search_skips_rows_deleted_between_queries(news, comment):
+    """Удалённая между двумя запросами поиска строка пропускается."""
+    comment.text = 'Заголовок'
+    comment.save()
+
+    def delete_comment(execute, sql, params, many, context):
+        if 'snippet(' in sql:
+            Comment.objects.filter(pk=comment.pk).delete()
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(delete_comment):
+        hits = search.search('заголовок')
+    assert [(hit.news_id, hit.comment_id) for hit in hits] == [
+        (news.pk, None)
+    ]
+
+
+def test_rebuild_search_index(news, comments_for_news):
+    """Команда восстанавливает индекс после его очистки."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {search.TABLE}')
+    call_command('rebuild_search_index')
+    assert search.count() == 1 + Comment.objects.count()
+
+
+def test_seed_is_consistent_and_repeatable():
+    """Сгенерированные данные согласованы и зависят только от seed."""
+    options = {'users': 5, 'news': 30, 'comments': 300, 'days': 90}
+    call_command('seed', seed=1, **options)
+    counts = dict(News.objects.values_list('pk', 'comment_count'))
+    assert sum(counts.values()) == Comment.objects.count() == 300
+    assert sum(
+        NewsArchiveMonth.objects.values_list('news_count', flat=True)
+    ) == 30
+    assert search.count() == 30 + 300
+    # Свежие новости комментируют чаще.
+    assert counts[max(counts)] > counts[min(counts)]
+    generated = News.objects.order_by('pk').values_list('title', 'text')
+    first = list(generated)
+    call_command('seed', seed=1, **options)
+    assert list(generated.all()[30:]) == first
+
+
+def test_clear_expired_sessions_in_batches():
+    """Истёкшие сессии удаляются порциями, живые остаются."""
+    for _ in range(5):
+        SessionStore().create()
+    alive = Session.objects.first()
+    Session.objects.exclude(pk=alive.pk).update(
+        expire_date=timezone.now() - timedelta(days=1)
+    )
+    call_command('clear_expired_sessions', batch_size=3)
+    assert list(Session.objects.values_list('pk', flat=True)) == [alive.pk]
+
+
+@pytest.mark.parametrize('engine, expected_queries', (
+    ('django.contrib.sessions.backends.db', AUTH_QUERIES),
+    # Сессия читается из кэша, из базы — только пользователь.
+    ('django.contrib.sessions.backends.cached_db', 1),
+    ('django.contrib.sessions.backends.signed_cookies', 1),
+))
+def test_session_engines(
+    settings, author, archive_url, engine, expected_queries,
+    django_assert_num_queries
+):
+    settings.SESSION_ENGINE = engine
+    client = Client()
+    client.force_login(author)
+    client.get(archive_url)
+    # И ещё два запроса самой страницы архива.
+    with django_assert_num_queries(expected_queries + 2):
+        response = client.get(archive_url)
+    assert response.context['user'] == author
+
+
+@pytest.mark.parametrize('profile, message', (
+    ('redis', 'допустимы: db, cached_db, signed_cookies'),
+    ('cached_db', 'SESSION_CACHE_DIR'),
+))
+def test_misconfigured_session_profile(monkeypatch, profile, message):
+    """Неизвестный профиль и cached_db без общего кэша не загружаются."""
+    monkeypatch.setenv('SESSION_PROFILE', profile)
+    monkeypatch.delenv('SESSION_CACHE_DIR', raising=False)
+    with pytest.raises(ImproperlyConfigured, match=message):
+        runpy.run_path(project_settings.__file__)
+
+
+@pytest.mark.parametrize('sql, expected', (
+    (
+        'SELECT "a" FROM "t" WHERE "id" = %s LIMIT 21',
+        'SELECT "a" FROM "t" WHERE "id" = ? LIMIT ?',
+    ),
+    (
+        'SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)',
+        'SELECT * FROM "t" WHERE "id" IN (...)',
+    ),
+    (
+        "INSERT INTO t (a, b) VALUES ('it''s', 1), (%s, %s),\n (2, 3)",
+        'INSERT INTO t (a, b) VALUES (...)',
+    ),
+))
+def test_query_fingerprint(sql, expected):
+    assert querystats.fingerprint(sql) == expected
+
+
+@pytest.fixture
+def query_stats(settings, monkeypatch, tmp_path):
+    settings.QUERY_STATS = True
+    settings.QUERY_STATS_DIR = tmp_path
+    settings.QUERY_STATS_INTERVAL = 0
+    settings.SLOW_QUERY_MS = 0
+    monkeypatch.setattr(querystats, 'stats', None)
+
+
+def test_slow_queries(
+    query_stats, client, comments_for_news, home_url, caplog
+):
+    """Запросы представлений сводятся по отпечаткам и видны в команде."""
+    for _ in range(3):
+        client.get(home_url)
+    entries = querystats.load()
+    assert entries
+    for entry in entries.values():
+        assert entry['views'] == {'news:home': entry['count']}
+        assert entry['p50_ms'] <= entry['p99_ms'] <= entry['max_ms']
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['view'] == 'news:home'
+    out = io.StringIO()
+    call_command('slow_queries', order='count', reset=True, stdout=out)
+    assert 'news:home' in out.getvalue()
+    assert querystats.load() == {}
+
+
+def test_slow_queries_reset_reaches_running_process(
+    query_stats, client, news, home_url, detail_url
+):
+    """После --reset процесс не сохраняет запросы, сделанные до сброса."""
+    client.get(home_url)
+    call_command('slow_queries', reset=True, stdout=io.StringIO())
+    client.get(detail_url)
+    views = set()
+    for entry in querystats.load().values():
+        views.update(entry['views'])
+    assert views == {'news:detail'}
+
+
+def test_slow_queries_async(query_stats, async_client, news):
+    async_to_sync(async_client.get)(reverse('news:detail', args=(news.pk,)))
+    views = set()
+    for entry in querystats.load().values():
+        views.update(entry['views'])
+    assert views == {'news:detail'}
+
+
+def test_stale_query_stats_are_dropped(
+    query_stats, settings, client, tmp_path, home_url
+):
+    """Снимки завершённых процессов не учитываются и удаляются."""
+    settings.QUERY_STATS_MAX_AGE = 60
+    stale = tmp_path / '1-dead.json'
+    stale.write_text(json.dumps({
+        'saved': time.time() - 120,
+        'entries': {'SELECT ?': {
+            'count': 1, 'total_ms': 1.0, 'max_ms': 1.0,
+            'samples_ms': [1.0], 'views': {'news:dead': 1},
+        }},
+    }))
+    client.get(home_url)
+    entries = querystats.load()
+    assert entries
+    assert 'SELECT ?' not in entries
+    assert not stale.exists()
+
+
+def test_query_stats_are_bounded():
+    stats = querystats.QueryStats(size=2, samples=3)
+    for number in range(5):
+        stats.add('first', number, 'view')
+        stats.add(f'other {number}', number, 'view')
+    snapshot = stats.snapshot()
+    assert list(snapshot) == ['first', 'other 4']
+    assert snapshot['first']['count'] == 5
+    assert snapshot['first']['samples_ms'] == [2000, 3000, 4000]
+
+
+def test_query_stats_off_by_default(client, home_url):
+    client.get(home_url)
+    assert querystats.current_view.get() is None
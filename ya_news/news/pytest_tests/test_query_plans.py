@@ -0,0 +1,125 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from pytest_lazyfixture import lazy_fixture
+
+from performance import query_plans
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != 'sqlite', reason='EXPLAIN QUERY PLAN из SQLite'
+    ),
+]
+
+# Таблицы, которые страница выводит целиком: в архиве строка на месяц.
+WHOLE_TABLES = {'news_newsarchivemonth'}
+
+HOME_URL = lazy_fixture('home_url')
+ARCHIVE_URL = lazy_fixture('archive_url')
+DETAIL_URL = lazy_fixture('detail_url')
+COMMENTS_URL = lazy_fixture('comments_url')
+EDIT_URL = lazy_fixture('edit_url')
+DELETE_URL = lazy_fixture('delete_url')
+SEARCH_URL = lazy_fixture('search_url')
+SEARCH_API_URL = lazy_fixture('search_api_url')
+RSS_URL = lazy_fixture('rss_url')
+ATOM_URL = reverse_lazy('news:atom')
+SITEMAP_URL = lazy_fixture('sitemap_url')
+SITEMAP_SECTION_URL = reverse_lazy('news:sitemap', kwargs={'section': 'news'})
+
+AUTHOR_CLIENT = lazy_fixture('author_client')
+ANON_CLIENT = lazy_fixture('client')
+
+
+def bad_plans(queries):
+    """Запросы с полным просмотром таблицы или временной сортировкой."""
+    return query_plans.bad_plans(queries, WHOLE_TABLES)
+
+
+@pytest.fixture
+def archive_month_url(news):
+    """URL архива за месяц тестовой новости."""
+    return reverse(
+        'news:archive_month', args=(news.date.year, news.date.month)
+    )
+
+
+@pytest.fixture
+def news_comments_api_url(news):
+    """URL комментариев в API для тестовой новости."""
+    return reverse('news:api_news_comments', args=(news.pk,))
+
+
+@pytest.mark.parametrize('user_client, url, method, data', [
+    (ANON_CLIENT, HOME_URL, 'get', None),
+    (ANON_CLIENT, ARCHIVE_URL, 'get', None),
+    (ANON_CLIENT, lazy_fixture('archive_month_url'), 'get', None),
+    (ANON_CLIENT, DETAIL_URL, 'get', None),
+    (ANON_CLIENT, COMMENTS_URL, 'get', None),
+    (AUTHOR_CLIENT, DETAIL_URL, 'get', None),
+    (AUTHOR_CLIENT, DETAIL_URL, 'post', {'text': 'Новый текст'}),
+    (AUTHOR_CLIENT, EDIT_URL, 'get', None),
+    (AUTHOR_CLIENT, EDIT_URL, 'post', {'text': 'Новый текст'}),
+    (AUTHOR_CLIENT, DELETE_URL, 'get', None),
+    (AUTHOR_CLIENT, DELETE_URL, 'post', None),
+    (ANON_CLIENT, lazy_fixture('news_comments_api_url'), 'get', None),
+    (ANON_CLIENT, SEARCH_URL, 'get', {'q': 'текст'}),
+    (ANON_CLIENT, SEARCH_API_URL, 'get', {'q': 'текст'}),
+    (ANON_CLIENT, RSS_URL, 'get', None),
+    (ANON_CLIENT, ATOM_URL, 'get', None),
+    (ANON_CLIENT, SITEMAP_URL, 'get', None),
+    (ANON_CLIENT, SITEMAP_SECTION_URL, 'get', None),
+])
+def test_views_use_indexes(
+    user_client, url, method, data, comments_for_news, comment
+):
+    """Запросы страниц не просматривают таблицы целиком и не сортируют."""
+    with CaptureQueriesContext(connection) as queries:
+        getattr(user_client, method)(url, data)
+    assert bad_plans(queries) == {}
+
+
+def read(response):
+    """Тело ответа API, в том числе потокового."""
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+@pytest.mark.parametrize('url', (
+    reverse_lazy('news:api_news'),
+    reverse_lazy('news:api_comments'),
+    reverse_lazy('news:api_export_news'),
+    reverse_lazy('news:api_export_comments'),
+))
+def test_api_uses_indexes(client, url, news_items, comments_for_news):
+    """
+    Выдача изменений читается по индексу (updated, id)
+    и без курсора, и с курсором since.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        since = read(client.get(url))['since']
+    assert bad_plans(queries) == {}
+    with CaptureQueriesContext(connection) as queries:
+        read(client.get(url, {'since': since}))
+    assert bad_plans(queries) == {}
+
+
+@pytest.mark.parametrize('url, page_name', [
+    (COMMENTS_URL, 'comments'),
+    (ARCHIVE_URL, 'page'),
+])
+def test_next_pages_use_indexes(
+    client, settings, url, page_name, news_items, comments_for_news
+):
+    """Следующие страницы по курсору тоже читаются по индексу."""
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 4
+    settings.NEWS_COUNT_ON_ARCHIVE_PAGE = 4
+    cursor = client.get(url).context[page_name].next_cursor
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url, {'cursor': cursor})
+    assert bad_plans(queries) == {}
@@ -0,0 +1,99 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from news.models import Comment, News
+from news.routers import PRIMARY_COOKIE, ReplicaRouter
+
+pytestmark = pytest.mark.django_db(
+    transaction=True, databases=('default', 'replica')
+)
+
+
+@pytest.fixture(autouse=True)
+def replicas(settings):
+    """Чтение новостей идёт на реплику-зеркало из conftest."""
+    settings.NEWS_READ_REPLICAS = ['replica']
+
+
+def news_queries(queries):
+    return [query['sql'] for query in queries if 'news_' in query['sql']]
+
+
+def captured_get(client, url):
+    """Запросы к основной базе и к реплике во время GET-запроса."""
+    with CaptureQueriesContext(connections['default']) as primary:
+        with CaptureQueriesContext(connections['replica']) as replica:
+            client.get(url)
+    return news_queries(primary), news_queries(replica)
+
+
+def test_router_reads_from_replica_and_writes_to_primary():
+    router = ReplicaRouter()
+    assert router.db_for_read(News) == 'replica'
+    assert router.db_for_write(Comment) == 'default'
+    assert router.allow_migrate('replica', 'news') is False
+
+
+def test_router_ignores_other_apps(author):
+    assert ReplicaRouter().db_for_read(type(author)) is None
+
+
+def test_reads_go_to_replica(author_client, detail_url):
+    primary, replica = captured_get(author_client, detail_url)
+    assert primary == []
+    assert replica != []
+
+
+def test_author_reads_primary_after_comment(
+    author_client, reader_client, detail_url
+):
+    """Комментарий виден автору сразу, остальные читают с реплики."""
+    response = author_client.post(detail_url, {'text': 'Текст комментария'})
+    assert response.cookies[PRIMARY_COOKIE]['max-age'] > 0
+    primary, replica = captured_get(author_client, detail_url)
+    assert primary != []
+    assert replica == []
+    primary, replica = captured_get(reader_client, detail_url)
+    assert primary == []
+    assert replica != []
+
+
+@pytest.fixture
+def lagging_replica():
+    """
+    Реплика, отставшая от основной базы: её запросы читают копии
+    таблиц новостей и комментариев, снятые вызовом fixture.
+    """
+    tables = ('news_news', 'news_comment')
+
+    def freeze():
+        with connections['default'].cursor() as cursor:
+            for table in tables:
+                cursor.execute(
+                    f'CREATE TABLE "stale_{table}" AS SELECT * FROM "{table}"'
+                )
+
+    def lagging(execute, sql, params, many, context):
+        for table in tables:
+            sql = sql.replace(f'"{table}"', f'"stale_{table}"')
+        return execute(sql, params, many, context)
+
+    with connections['replica'].execute_wrapper(lagging):
+        yield freeze
+    with connections['default'].cursor() as cursor:
+        for table in tables:
+            cursor.execute(f'DROP TABLE IF EXISTS "stale_{table}"')
+
+
+def test_page_cache_is_filled_from_primary(
+    client, author, news, detail_url, lagging_replica
+):
+    """Страница для общего кэша не строится по отставшей реплике."""
+    assert client.get(detail_url).status_code == HTTPStatus.OK
+    lagging_replica()
+    Comment.objects.create(news=news, author=author, text='Свежий ответ')
+    for _ in range(2):
+        assert 'Свежий ответ' in client.get(detail_url).content.decode()
@@ -7,10 +7,16 @@ from pytest_lazyfixture import lazy_fixture
 pytestmark = pytest.mark.django_db
 
 HOME_URL = lazy_fixture('home_url')
+ARCHIVE_URL = lazy_fixture('archive_url')
 LOGIN_URL = lazy_fixture('login_url')
 LOGOUT_URL = lazy_fixture('logout_url')
 SIGNUP_URL = lazy_fixture('signup_url')
 DETAIL_URL = lazy_fixture('detail_url')
+COMMENTS_URL = lazy_fixture('comments_url')
+SEARCH_URL = lazy_fixture('search_url')
+SEARCH_API_URL = lazy_fixture('search_api_url')
+RSS_URL = lazy_fixture('rss_url')
+SITEMAP_URL = lazy_fixture('sitemap_url')
 EDIT_URL = lazy_fixture('edit_url')
 DELETE_URL = lazy_fixture('delete_url')
 EDIT_LOGIN_REDIRECT = lazy_fixture('edit_login_redirect')
@@ -24,10 +30,16 @@ ANON_CLIENT = lazy_fixture('client')
 @pytest.mark.parametrize('user_client, url, method, expected_status', [
     # Основные страницы
     (ANON_CLIENT, HOME_URL, 'GET', HTTPStatus.OK),
+    (ANON_CLIENT, ARCHIVE_URL, 'GET', HTTPStatus.OK),
     (ANON_CLIENT, LOGIN_URL, 'GET', HTTPStatus.OK),
     (ANON_CLIENT, LOGOUT_URL, 'POST', HTTPStatus.OK),
     (ANON_CLIENT, SIGNUP_URL, 'GET', HTTPStatus.OK),
     (ANON_CLIENT, DETAIL_URL, 'GET', HTTPStatus.OK),
+    (ANON_CLIENT, COMMENTS_URL, 'GET', HTTPStatus.OK),
+    (ANON_CLIENT, SEARCH_URL, 'GET', HTTPStatus.OK),
+    (ANON_CLIENT, SEARCH_API_URL, 'GET', HTTPStatus.OK),
+    (ANON_CLIENT, RSS_URL, 'GET', HTTPStatus.OK),
+    (ANON_CLIENT, SITEMAP_URL, 'GET', HTTPStatus.OK),
     # Редактирование и удаление комментариев для разных ролей
     (READER_CLIENT, EDIT_URL, 'GET', HTTPStatus.NOT_FOUND),
     (READER_CLIENT, DELETE_URL, 'GET', HTTPStatus.NOT_FOUND),
@@ -0,0 +1,85 @@
+"""
+Чтение новостей и комментариев с реплик.
+
+Псевдонимы реплик перечислены в settings.NEWS_READ_REPLICAS, запись
+всегда идёт в основную базу. Запрос, который что-то записал, и запросы
+того же пользователя в течение settings.NEWS_REPLICA_LAG секунд после
+него читают из основной базы, чтобы автор сразу увидел свой комментарий.
+Страницы, которые попадут в общий кэш, тоже строятся по основной базе:
+иначе отставшая реплика оставила бы в кэше устаревшую страницу до
+следующей записи. Состояние запроса устанавливает
+news.middleware.replica_middleware.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_COOKIE = 'news_primary'
+
+_state = ContextVar('news_replica_state', default=None)
+
+
+class ReplicaState:
+    """Читать ли из основной базы в текущем запросе."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+    @property
+    def use_primary(self):
+        return self.pinned or self.wrote
+
+
+def start_request(pinned):
+    """Заводит состояние запроса; возвращает токен для finish_request()."""
+    state = ReplicaState(pinned)
+    return state, _state.set(state)
+
+
+def finish_request(token):
+    _state.reset(token)
+
+
+def read_primary():
+    """Остаток текущего запроса читает из основной базы."""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+class ReplicaRouter:
+    """Направляет чтение моделей приложения news на случайную реплику."""
+
+    app_label = 'news'
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.NEWS_READ_REPLICAS
+        if model._meta.app_label != self.app_label or not replicas:
+            return None
+        state = _state.get()
+        if state is not None and state.use_primary:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.NEWS_READ_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        """Схема реплик приходит вместе с данными из основной базы."""
+        if db in settings.NEWS_READ_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,255 @@
+"""
+Полнотекстовый поиск по новостям и комментариям.
+
+Индекс news_search — таблица FTS5, которую создаёт миграция 0005
+и поддерживают триггеры TRIGGERS на news_news и news_comment. Новость n лежит
+в строке индекса 2n, комментарий n — в строке 2n + 1. Найденное
+упорядочено по bm25 (заголовок весит больше текста) и разбито
+на страницы по курсору на ключе (ранг, строка).
+"""
+import math
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import News
+from .pagination import (
+    INT64_MAX,
+    INT64_MIN,
+    InvalidCursor,
+    KeysetPage,
+    decode_cursor,
+    encode_cursor,
+)
+
+TABLE = 'news_search'
+RANK = f'bm25({TABLE}, 10.0, 1.0)'
+# Границы найденных слов, которых не бывает в тексте: их заменяют
+# на <mark> уже после экранирования.
+MARK_START, MARK_END = '\x02', '\x03'
+TERM = re.compile(r'\w+')
+# Триггеры пропадают, когда SQLite пересоздаёт таблицу при изменении
+# схемы, поэтому такие миграции создают их заново.
+TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_news_insert
+    AFTER INSERT ON news_news BEGIN
+        INSERT INTO {TABLE}(rowid, title, text, news_id)
+        VALUES (new.id * 2, new.title, new.text, new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_news_update
+    AFTER UPDATE OF title, text ON news_news BEGIN
+        UPDATE {TABLE} SET title = new.title, text = new.text
+        WHERE rowid = new.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_news_delete
+    AFTER DELETE ON news_news BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_comment_insert
+    AFTER INSERT ON news_comment BEGIN
+        INSERT INTO {TABLE}(rowid, title, text, news_id)
+        VALUES (new.id * 2 + 1, '', new.text, new.news_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_comment_update
+    AFTER UPDATE OF text ON news_comment BEGIN
+        UPDATE {TABLE} SET text = new.text
+        WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_comment_delete
+    AFTER DELETE ON news_comment BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+)
+DROP_TRIGGERS = tuple(
+    f'DROP TRIGGER IF EXISTS {TABLE}_{model}_{event}'
+    for model in ('news', 'comment')
+    for event in ('insert', 'update', 'delete')
+)
+
+RANKED = f"""
+    SELECT rowid, rank FROM (
+        SELECT rowid, {RANK} AS rank FROM {TABLE} WHERE {TABLE} MATCH %s
+    )
+    {{after}}
+    ORDER BY rank, rowid
+    LIMIT %s
+"""
+FRAGMENTS = f"""
+    SELECT {TABLE}.rowid, {TABLE}.news_id, news_news.title,
+        highlight({TABLE}, 0, char(2), char(3)),
+        snippet({TABLE}, 1, char(2), char(3), '…', 16)
+    FROM {TABLE} JOIN news_news ON news_news.id = {TABLE}.news_id
+    WHERE {TABLE} MATCH %s AND {TABLE}.rowid IN ({{rowids}})
+"""
+
+
+def is_available(using=None):
+    using = using or router.db_for_read(News) or DEFAULT_DB_ALIAS
+    return connections[using].vendor == 'sqlite'
+
+
+def match_query(text):
+    """
+    Запрос FTS5 из пользовательского ввода.
+
+    Каждое слово ищется как префикс, синтаксис FTS5 во вводе
+    не действует. Пустая строка означает, что искать нечего.
+    """
+    return ' '.join(
+        f'"{term}"*' for term in TERM.findall(text.lower())
+    )
+
+
+def highlight(fragment):
+    return mark_safe(
+        escape(fragment)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchHit:
+    """Найденная новость или комментарий к ней."""
+
+    def __init__(self, rowid, rank, news_id, title, snippet):
+        self.rowid = rowid
+        self.rank = rank
+        self.news_id = news_id
+        self.comment_id = rowid // 2 if rowid % 2 else None
+        self.title = title
+        self.snippet = snippet
+
+    @property
+    def is_comment(self):
+        return self.comment_id is not None
+
+    def get_absolute_url(self):
+        url = reverse('news:detail', args=(self.news_id,))
+        return f'{url}#comments' if self.is_comment else url
+
+
+def cursor_params(cursor):
+    """Ранг и rowid последней строки предыдущей страницы."""
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise InvalidCursor(cursor)
+    try:
+        rank, rowid = float(values[0]), int(values[1])
+    except (TypeError, ValueError, OverflowError) as error:
+        raise InvalidCursor(cursor) from error
+    if not INT64_MIN <= rowid <= INT64_MAX or not math.isfinite(rank):
+        raise InvalidCursor(cursor)
+    return [rank, rowid]
+
+
+def search(text, cursor=None, per_page=20):
+    """
+    Страница результатов поиска: два запроса к индексу.
+
+    Первый ранжирует совпадения и выбирает строки страницы, второй
+    строит для них фрагменты с подсветкой и заголовки новостей.
+    """
+    query = match_query(text)
+    if not query:
+        return KeysetPage([], None)
+    params = [query]
+    after = ''
+    if cursor:
+        params += cursor_params(cursor)
+        after = 'WHERE (rank, rowid) > (%s, %s)'
+    connection = connections[router.db_for_read(News) or DEFAULT_DB_ALIAS]
+    with connection.cursor() as db:
+        db.execute(RANKED.format(after=after), [*params, per_page + 1])
+        ranked = db.fetchall()
+        has_next = len(ranked) > per_page
+        ranked = ranked[:per_page]
+        fragments = {}
+        if ranked:
+            db.execute(
+                FRAGMENTS.format(rowids=', '.join(['%s'] * len(ranked))),
+                [query, *(rowid for rowid, rank in ranked)],
+            )
+            fragments = {row[0]: row[1:] for row in db.fetchall()}
+    hits = []
+    for rowid, rank in ranked:
+        if rowid not in fragments:
+            # Строку удалили между запросами.
+            continue
+        news_id, title, title_marked, snippet = fragments[rowid]
+        if rowid % 2 == 0:
+            title = title_marked
+        hits.append(SearchHit(
+            rowid, rank, news_id, highlight(title), highlight(snippet)
+        ))
+    next_cursor = None
+    if has_next:
+        rowid, rank = ranked[-1]
+        next_cursor = encode_cursor([rank, rowid])
+    return KeysetPage(hits, next_cursor)
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Заново заполняет индекс из таблиц новостей и комментариев."""
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as db:
+            db.execute(f'DELETE FROM {TABLE}')
+            db.execute(
+                f'INSERT INTO {TABLE}(rowid, title, text, news_id) '
+                'SELECT id * 2, title, text, id FROM news_news'
+            )
+            db.execute(
+                f'INSERT INTO {TABLE}(rowid, title, text, news_id) '
+                "SELECT id * 2 + 1, '', text, news_id FROM news_comment"
+            )
+    optimize(using)
+
+
+@contextmanager
+def deferred(using=DEFAULT_DB_ALIAS):
+    """
+    Массовая вставка без построчного обновления индекса.
+
+    Триггеры на время вставки удаляются, затем индекс строится заново
+    одним проходом по таблицам.
+    """
+    if not is_available(using):
+        yield
+        return
+    with connections[using].cursor() as db:
+        for statement in DROP_TRIGGERS:
+            db.execute(statement)
+    try:
+        yield
+    finally:
+        with connections[using].cursor() as db:
+            for statement in TRIGGERS:
+                db.execute(statement)
+        rebuild(using)
+
+
+def optimize(using=DEFAULT_DB_ALIAS):
+    """Сливает сегменты индекса в один."""
+    with connections[using].cursor() as db:
+        db.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+
+def count(using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as db:
+        db.execute(f'SELECT count(*) FROM {TABLE}')
+        return db.fetchone()[0]
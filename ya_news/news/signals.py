@@ -0,0 +1,76 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from performance import metrics
+
+from .cache import HOME, NEWS, bump_version, fragment_name
+from .models import Comment, News, NewsArchiveMonth
+
+
+@receiver(post_delete, sender=News)
+def shift_archive_counter(sender, instance, **kwargs):
+    """
+    Удалённая новость уменьшает счётчик своего месяца в архиве.
+
+    Сигнал приходит и при каскадном удалении, и при QuerySet.delete().
+    """
+    NewsArchiveMonth.shift(instance.date, -1)
+
+
+@receiver(post_delete, sender=Comment)
+def shift_comment_counter(sender, instance, origin=None, **kwargs):
+    """
+    Удалённый комментарий уменьшает счётчик у новости.
+
+    Комментарии, удаляемые вместе со своей новостью, пропускаются:
+    счётчик уходит вместе с ней.
+    """
+    if isinstance(origin, News) or getattr(origin, 'model', None) is News:
+        return
+    News.shift_comment_count((instance.news_id,), -1)
+
+
+def invalidate_after_commit(*names):
+    transaction.on_commit(partial(bump_version, *names))
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def invalidate_news_pages(sender, instance, **kwargs):
+    """Новость видна на своей странице, на главной, в карточке и лентах."""
+    invalidate_after_commit(
+        instance.pk, HOME, NEWS, fragment_name(instance)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def invalidate_comment_pages(sender, instance, created, **kwargs):
+    """
+    На главной виден только счётчик комментариев.
+
+    Он входит в ключ карточки новости, поэтому её версию менять не нужно.
+    """
+    if created:
+        invalidate_after_commit(instance.news_id, HOME)
+    else:
+        invalidate_after_commit(instance.news_id, fragment_name(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def invalidate_deleted_comment_pages(sender, instance, **kwargs):
+    invalidate_after_commit(instance.news_id, HOME)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_save, sender=Comment)
+def count_saved(sender, instance, created, **kwargs):
+    metrics.count_write(sender, 'create' if created else 'update')
+
+
+@receiver(post_delete, sender=News)
+@receiver(post_delete, sender=Comment)
+def count_deleted(sender, instance, **kwargs):
+    metrics.count_write(sender, 'delete')
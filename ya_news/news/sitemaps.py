@@ -0,0 +1,78 @@
+from math import ceil
+
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .feeds import published
+from .models import News
+
+
+class IdRangePaginator:
+    """
+    Страница n — записи с id в ((n - 1) * per_page, n * per_page].
+
+    Число страниц берётся из Max('id'), а страница — диапазоном
+    по первичному ключу: ни COUNT(*), ни OFFSET по всей таблице.
+    После удалений страницы бывают неполными, но не сдвигаются.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    @cached_property
+    def num_pages(self):
+        last = self.object_list.aggregate(last=Max('id'))['last'] or 0
+        return max(1, ceil(last / self.per_page))
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не число.')
+        if not 1 <= number <= self.num_pages:
+            raise EmptyPage('Такой страницы нет.')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        end = number * self.per_page
+        return Page(
+            self.object_list.filter(id__gt=end - self.per_page, id__lte=end),
+            number,
+            self,
+        )
+
+
+class NewsSitemap(Sitemap):
+    """
+    Все новости, по NEWS_SITEMAP_LIMIT id на страницу карты.
+
+    Страницы идут по диапазонам id: новые новости попадают в конец,
+    и уже выданные страницы не сдвигаются.
+    """
+
+    @property
+    def limit(self):
+        return settings.NEWS_SITEMAP_LIMIT
+
+    @property
+    def paginator(self):
+        return IdRangePaginator(self.items(), self.limit)
+
+    def items(self):
+        return News.objects.only('id', 'title', 'date').order_by('id')
+
+    def lastmod(self, news):
+        return published(news.date)
+
+    def get_latest_lastmod(self):
+        """Одним запросом, а не перебором всех новостей."""
+        latest = News.objects.aggregate(latest=Max('date'))['latest']
+        return None if latest is None else published(latest)
+
+
+SITEMAPS = {'news': NewsSitemap}
@@ -1,12 +1,66 @@
 from django.urls import path
 
-from news import views
+from news import api, views
+from news.sitemaps import SITEMAPS
 
 app_name = 'news'
 
 urlpatterns = [
     path('', views.NewsList.as_view(), name='home'),
+    path('archive/', views.NewsArchive.as_view(), name='archive'),
+    path(
+        'archive/<int:year>/',
+        views.NewsArchive.as_view(),
+        name='archive_year'
+    ),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.NewsArchive.as_view(),
+        name='archive_month'
+    ),
+    path('search/', views.NewsSearch.as_view(), name='search'),
+    path('api/search/', views.NewsSearchApi.as_view(), name='search_api'),
+    path('api/news/', api.NewsChangesApi.as_view(), name='api_news'),
+    path(
+        'api/news/<int:pk>/comments/',
+        api.NewsCommentsApi.as_view(),
+        name='api_news_comments'
+    ),
+    path(
+        'api/comments/',
+        api.CommentChangesApi.as_view(),
+        name='api_comments'
+    ),
+    path(
+        'api/export/news/',
+        api.NewsExportApi.as_view(),
+        name='api_export_news'
+    ),
+    path(
+        'api/export/comments/',
+        api.CommentExportApi.as_view(),
+        name='api_export_comments'
+    ),
+    path('feed/rss/', views.news_rss, name='rss'),
+    path('feed/atom/', views.news_atom, name='atom'),
+    path(
+        'sitemap.xml',
+        views.sitemap_index,
+        {'sitemaps': SITEMAPS, 'sitemap_url_name': 'news:sitemap'},
+        name='sitemap_index'
+    ),
+    path(
+        'sitemap-<section>.xml',
+        views.sitemap,
+        {'sitemaps': SITEMAPS},
+        name='sitemap'
+    ),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path(
+        'news/<int:pk>/comments/',
+        views.NewsComments.as_view(),
+        name='comments'
+    ),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
@@ -1,49 +1,402 @@
+from datetime import date
+from functools import wraps
+from hashlib import md5
+from http import HTTPStatus
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import get_object_or_404
+from django.contrib.sitemaps import views as sitemap_views
+from django.db.models import Max, OuterRef, Subquery
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from django.views import generic
 
+from . import cache, routers, search
+from .feeds import LatestNewsAtomFeed, LatestNewsFeed
 from .forms import CommentForm
-from .models import Comment, News
+from .models import Comment, News, NewsArchiveMonth
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+class CachedObjectMixin:
+    """
+    Находит объект один раз за запрос.
+
+    Повторные вызовы get_object() без queryset, например из
+    get_success_url(), возвращают уже найденный объект.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+
+class CommentPageMixin:
+    """Порция комментариев к новости по курсору из GET-параметра."""
+    comment_ordering = ('created', 'id')
+
+    def get_comment_paginator(self, news_id):
+        return KeysetPaginator(
+            Comment.objects.filter(
+                news_id=news_id
+            ).select_related('author'),
+            self.comment_ordering,
+            settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+        )
+
+    def get_comment_page(self, news_id):
+        try:
+            page = self.get_comment_paginator(news_id).page(
+                self.request.GET.get('cursor')
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор.')
+        cache.stamp_fragments(page.object_list)
+        return page
+
+    async def aget_comment_page(self, news_id):
+        try:
+            page = await self.get_comment_paginator(news_id).apage(
+                self.request.GET.get('cursor')
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор.')
+        await cache.astamp_fragments(page.object_list)
+        return page
+
+
+class AnonymousPageCacheMixin:
+    """
+    Отдаёт анонимным пользователям страницу из кэша.
+
+    Версия в ключе меняется сигналами при изменении новостей
+    и комментариев, см. news.signals. Условные запросы к закэшированной
+    странице проверяются по её заголовкам ETag и Last-Modified.
+    """
+    page_cache_name = None
+
+    def get_page_cache_name(self):
+        return self.page_cache_name
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if user.is_authenticated:
+            return await super().get(request, *args, **kwargs)
+        name = self.get_page_cache_name()
+        key = cache.page_key(name, await cache.aget_version(name), request)
+        response = await cache.aget_page(key)
+        if response is None:
+            # Страница попадёт в кэш: реплика могла ещё не догнать запись,
+            # из-за которой сменилась версия.
+            routers.read_primary()
+            response = await super().get(request, *args, **kwargs)
+            if response.status_code == HTTPStatus.OK:
+                response.add_post_render_callback(
+                    lambda rendered: cache.set_page(key, rendered)
+                )
+            return response
+        return get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified')),
+            response=response,
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Отвечает 304 на If-None-Match и If-Modified-Since.
+
+    Валидаторы вычисляет aget_validators() до построения контекста;
+    None означает, что объекта нет и решать должен сам обработчик.
+    """
+
+    async def aget_validators(self):
+        raise NotImplementedError
 
+    async def get(self, request, *args, **kwargs):
+        validators = await self.aget_validators()
+        if validators is None:
+            return await super().get(request, *args, **kwargs)
+        etag, last_modified = validators
+        user = await request.auser()
+        etag = quote_etag(md5(
+            f'{etag}:{user.pk}:{request.get_full_path()}'.encode()
+        ).hexdigest())
+        last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = await super().get(request, *args, **kwargs)
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+class AsyncListView(generic.ListView):
+    """ListView, читающий выборку через асинхронный ORM."""
+
+    async def aget_context_data(self, **kwargs):
+        return self.get_context_data(**kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = [
+            obj async for obj in self.get_queryset().aiterator()
+        ]
+        return self.render_to_response(await self.aget_context_data())
+
+
+class AsyncDetailView(generic.DetailView):
+    """
+    DetailView, читающий данные через асинхронный ORM.
+
+    Запросы к базе для контекста делаются в aget_context_data(),
+    get_context_data() остаётся синхронной и запросов не делает.
+    """
+
+    async def aget_object(self):
+        return await aget_object_or_404(
+            self.get_queryset(), pk=self.kwargs[self.pk_url_kwarg]
+        )
+
+    async def aget_context_data(self, **kwargs):
+        return self.get_context_data(**kwargs)
 
-class NewsList(generic.ListView):
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(
+            await self.aget_context_data(object=self.object)
+        )
+
+
+class NewsList(AnonymousPageCacheMixin, AsyncListView):
     """Список новостей."""
     model = News
     template_name = 'news/home.html'
+    page_cache_name = cache.HOME
 
     def get_queryset(self):
         """
         Выводим только несколько последних новостей.
 
-        Их количество определяется в настройках проекта.
+        Их количество определяется в настройках проекта,
+        число комментариев берётся из счётчика News.comment_count.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
 
+    async def aget_context_data(self, **kwargs):
+        await cache.astamp_fragments(self.object_list)
+        return await super().aget_context_data(**kwargs)
 
-class NewsDetail(generic.DetailView):
+
+class NewsArchive(generic.ListView):
+    """
+    Архив новостей: все новости, за год или за месяц.
+
+    Страницы выбираются по курсору на ключе (date, id).
+    """
+    model = News
+    template_name = 'news/archive.html'
+    ordering = ('-date', '-id')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        year = self.kwargs.get('year')
+        if year is None:
+            return queryset
+        month = self.kwargs.get('month')
+        try:
+            if month is None:
+                start, end = date(year, 1, 1), date(year + 1, 1, 1)
+            else:
+                start = date(year, month, 1)
+                end = date(year + month // 12, month % 12 + 1, 1)
+        except (ValueError, OverflowError):
+            raise Http404('Такого месяца нет.')
+        return queryset.filter(date__gte=start, date__lt=end)
+
+    def get_context_data(self, **kwargs):
+        paginator = KeysetPaginator(
+            self.object_list,
+            self.ordering,
+            settings.NEWS_COUNT_ON_ARCHIVE_PAGE,
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Некорректный курсор.')
+        context = super().get_context_data(
+            object_list=cache.stamp_fragments(page.object_list), **kwargs
+        )
+        context['page'] = page
+        context['archive_months'] = NewsArchiveMonth.objects.filter(
+            news_count__gt=0
+        )
+        return context
+
+
+class NewsDetail(
+        AnonymousPageCacheMixin,
+        ConditionalGetMixin,
+        CommentPageMixin,
+        AsyncDetailView
+):
     model = News
     template_name = 'news/detail.html'
 
-    def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
+    async def aget_validators(self):
+        """
+        Время изменения новости и её последнего изменённого комментария.
+
+        Удаление комментария сдвигает время новости, поэтому
+        Last-Modified не уходит назад.
+        """
+        news = await self.model.objects.filter(pk=self.kwargs['pk']).annotate(
+            last_comment=Subquery(
+                Comment.objects.filter(news=OuterRef('pk')).order_by()
+                .values('news').values(last=Max('updated'))
+            )
+        ).values('updated', 'last_comment').afirst()
+        if news is None:
+            return None
+        last_modified = max(filter(None, news.values()))
+        return f'{news["updated"]}:{news["last_comment"]}', last_modified
+
+    def get_page_cache_name(self):
+        return self.kwargs['pk']
+
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(
+            comments=await self.aget_comment_page(self.object.pk), **kwargs
         )
-        return obj
+        user = await self.request.auser()
+        if user.is_authenticated:
+            context['form'] = CommentForm()
+        return context
+
+
+class NewsComments(CommentPageMixin, generic.TemplateView):
+    """Следующая порция комментариев без остальной страницы."""
+    template_name = 'news/comments.html'
 
     def get_context_data(self, **kwargs):
+        if not News.objects.filter(pk=self.kwargs['pk']).exists():
+            raise Http404('Новость не найдена.')
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            context['form'] = CommentForm()
+        context['comments'] = self.get_comment_page(self.kwargs['pk'])
         return context
 
 
+class SearchMixin:
+    """Страница результатов поиска по параметрам q и cursor."""
+
+    def get_search_page(self):
+        if not search.is_available():
+            raise Http404('Поиск недоступен.')
+        try:
+            return search.search(
+                self.request.GET.get('q', ''),
+                self.request.GET.get('cursor'),
+                settings.NEWS_SEARCH_RESULTS_PER_PAGE,
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор.')
+
+
+class NewsSearch(SearchMixin, generic.TemplateView):
+    """Поиск по новостям и комментариям."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            query=self.request.GET.get('q', ''),
+            page=self.get_search_page(),
+            **kwargs
+        )
+
+
+class NewsSearchApi(SearchMixin, generic.View):
+    """Те же результаты поиска в JSON."""
+
+    def get(self, request, *args, **kwargs):
+        page = self.get_search_page()
+        return JsonResponse({
+            'results': [
+                {
+                    'news': hit.news_id,
+                    'comment': hit.comment_id,
+                    'title': hit.title,
+                    'snippet': hit.snippet,
+                    'url': hit.get_absolute_url(),
+                }
+                for hit in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
+
+
+def cached_by_version(name):
+    """
+    Кэширует ответ представления до смены версии name.
+
+    ETag зависит от версии и полного адреса запроса со схемой и хостом,
+    поэтому клиент с актуальной копией получает 304, даже если ответа
+    уже нет в кэше.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            version = cache.get_version(name)
+            etag = quote_etag(md5(
+                f'{version}:{request.build_absolute_uri()}'.encode()
+            ).hexdigest())
+            key = cache.page_key(name, version, request)
+            response = cache.get_page(key)
+            conditional = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=response and parse_http_date_safe(
+                    response.get('Last-Modified')
+                ),
+                response=response,
+            )
+            if conditional is not None:
+                return conditional
+            routers.read_primary()
+            response = view(request, *args, **kwargs)
+            if response.status_code != HTTPStatus.OK:
+                return response
+            response.headers['ETag'] = etag
+            if callable(getattr(response, 'render', None)):
+                response.add_post_render_callback(
+                    lambda rendered: cache.set_page(key, rendered)
+                )
+            else:
+                cache.set_page(key, response)
+            return response
+        return wrapper
+    return decorator
+
+
+news_rss = cached_by_version(cache.NEWS)(LatestNewsFeed())
+news_atom = cached_by_version(cache.NEWS)(LatestNewsAtomFeed())
+sitemap_index = cached_by_version(cache.NEWS)(sitemap_views.index)
+sitemap = cached_by_version(cache.NEWS)(sitemap_views.sitemap)
+
+
 class NewsComment(
         LoginRequiredMixin,
+        CachedObjectMixin,
+        CommentPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -51,6 +404,11 @@ class NewsComment(
     form_class = CommentForm
     template_name = 'news/detail.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'] = self.get_comment_page(self.object.pk)
+        return context
+
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
         return super().post(request, *args, **kwargs)
@@ -68,29 +426,36 @@ class NewsComment(
 
 
 class NewsDetailView(generic.View):
+    """Чтение новости асинхронное, отправка комментария синхронная."""
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         view = NewsDetail.as_view()
-        return view(request, *args, **kwargs)
+        return await view(request, *args, **kwargs)
 
-    def post(self, request, *args, **kwargs):
-        view = NewsComment.as_view()
-        return view(request, *args, **kwargs)
+    async def post(self, request, *args, **kwargs):
+        view = sync_to_async(NewsComment.as_view())
+        return await view(request, *args, **kwargs)
 
 
-class CommentBase(LoginRequiredMixin):
+class CommentBase(LoginRequiredMixin, CachedObjectMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
 
     def get_success_url(self):
         comment = self.get_object()
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': comment.news_id}
         ) + '#comments'
 
     def get_queryset(self):
-        """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        """
+        Пользователь может работать только со своими комментариями.
+
+        Новость нужна шаблонам, поэтому загружается тем же запросом.
+        """
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -1,12 +1,17 @@
+import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+# Общий для проектов пакет performance лежит в корне репозитория.
+sys.path.append(str(BASE_DIR.parent))
 
 SECRET_KEY = 'django-insecure-7)dgs++2!#==aye4rd=5)c)bw0eokiyqx0hts6#t80!$c&$s+('
 
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 
@@ -17,27 +22,45 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.sitemaps',
     'news.apps.NewsConfig',
+    'performance.apps.PerformanceConfig',
 ]
 
 MIDDLEWARE = [
+    'performance.middleware.metrics_middleware',
+    'performance.middleware.TimingMiddleware',
+    'performance.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'news.middleware.profiler_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'news.middleware.replica_middleware',
 ]
 
 ROOT_URLCONF = 'yanews.urls'
 
+# В отладке шаблоны перечитываются с диска при каждом рендеринге,
+# без неё разобранные шаблоны хранятся в памяти процесса.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -58,6 +81,89 @@ DATABASES = {
     }
 }
 
+# Профиль для боевой нагрузки включается переменной DB_PROFILE=production.
+# WAL позволяет читать во время записи, IMMEDIATE сразу берёт блокировку
+# на запись и не получает «database is locked» при её повышении посреди
+# транзакции, timeout — сколько секунд ждать занятую базу (busy_timeout).
+if os.environ.get('DB_PROFILE') == 'production':
+    DATABASES['default'].update(
+        CONN_MAX_AGE=600,
+        CONN_HEALTH_CHECKS=True,
+        OPTIONS={
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+            ),
+        },
+    )
+
+# Реплика только для чтения, например копия базы, которую обновляет
+# репликация: DB_REPLICA=/путь/к/replica.sqlite3. Новости и комментарии
+# читаются с реплик, кроме запросов автора сразу после записи.
+DATABASE_ROUTERS = ['news.routers.ReplicaRouter']
+NEWS_READ_REPLICAS = []
+NEWS_REPLICA_LAG = 5
+if os.environ.get('DB_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DB_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    NEWS_READ_REPLICAS.append('replica')
+
+# Локальная память годится для одного процесса. Если процессов несколько,
+# сбрасывать кэш страниц в каждом из них сможет только общий бэкенд,
+# например django.core.cache.backends.filebased.FileBasedCache.
+# Фрагментов по одному на новость и комментарий, отсюда MAX_ENTRIES.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Сессии отдельно: вытеснение страниц не должно выкидывать их.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+
+# Кэш сессий, общий для процессов одного сервера: SESSION_CACHE_DIR.
+if os.environ.get('SESSION_CACHE_DIR'):
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['SESSION_CACHE_DIR'],
+    }
+
+# Хранилище сессий выбирается переменной SESSION_PROFILE:
+# db — таблица django_session, запрос к ней на каждый запрос с сессией;
+# cached_db — чтение из кэша сессий, запись и в кэш, и в базу; кэш
+# должен быть общим (SESSION_CACHE_DIR), иначе другой процесс продолжит
+# отдавать из своей памяти изменённую или удалённую при выходе сессию;
+# signed_cookies — сессия целиком в подписанной cookie, база не нужна,
+# но выход не отзывает ранее выданные cookie.
+SESSION_PROFILES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_PROFILE = os.environ.get('SESSION_PROFILE', 'db')
+if SESSION_PROFILE not in SESSION_PROFILES:
+    raise ImproperlyConfigured(
+        f'Неизвестный SESSION_PROFILE={SESSION_PROFILE!r}, допустимы: '
+        f'{", ".join(SESSION_PROFILES)}.'
+    )
+if SESSION_PROFILE == 'cached_db' and not os.environ.get('SESSION_CACHE_DIR'):
+    raise ImproperlyConfigured(
+        'SESSION_PROFILE=cached_db требует общий кэш сессий: '
+        'задайте SESSION_CACHE_DIR.'
+    )
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]
+SESSION_CACHE_ALIAS = 'sessions'
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +186,76 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+NEWS_COUNT_ON_ARCHIVE_PAGE = 20
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+NEWS_SEARCH_RESULTS_PER_PAGE = 20
+NEWS_API_PAGE_SIZE = 100
+NEWS_API_EXPORT_CHUNK_SIZE = 2000
+# На сколько секунд выдача изменений отстаёт от текущего времени:
+# дольше этого не должна идти ни одна пишущая транзакция.
+NEWS_API_CURSOR_LAG = 5
+NEWS_FEED_SIZE = 20
+NEWS_SITEMAP_LIMIT = 5000
+
+# Страницы сбрасываются сигналами, поэтому срок хранения не ограничен.
+NEWS_PAGE_CACHE_TIMEOUT = None
+
+# Файл со словарём модераторов: по одному запрещённому слову в строке.
+BAD_WORDS_FILE = None
+BAD_WORDS_MATCHER = 'news.moderation.AhoCorasickMatcher'
+
+# Доля запросов, которые замеряет performance.middleware.TimingMiddleware.
+PERFORMANCE_SAMPLE_RATE = float(os.environ.get('PERFORMANCE_SAMPLE_RATE', 0))
+
+# Профили запросов news.profiling: каталог, сколько их хранить, период
+# сэмплера стека в секундах и токен для заголовка X-Profile-Token.
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_KEEP = 50
+PROFILER_INTERVAL = 0.005
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+
+# Сводка запросов performance.querystats: включена ли, порог медленного
+# запроса в миллисекундах, сколько хранить отпечатков и длительностей
+# на отпечаток, куда и как часто в секундах сохранять снимки.
+QUERY_STATS = os.environ.get('QUERY_STATS') == '1'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+QUERY_STATS_SIZE = 500
+QUERY_STATS_SAMPLES = 200
+QUERY_STATS_DIR = BASE_DIR / 'query_stats'
+QUERY_STATS_INTERVAL = 10
+# Снимок процесса, который не сохранялся сутки, считается оставшимся
+# от завершённого процесса.
+QUERY_STATS_MAX_AGE = 24 * 60 * 60
+
+# Метрики performance.metrics для /metrics. METRICS_DIR включает
+# многопроцессный режим: каталог общий для всех воркеров, его очищают
+# при их перезапуске. С METRICS_TOKEN страница требует заголовок
+# Authorization: Bearer.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+# Метрики проекта в дополнение к общим: имя -> (тип, описание).
+METRICS_EXTRA = {
+    'cache_requests_total': (
+        'counter', 'Чтения кэша страниц: hit или miss.'
+    ),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'performance.middleware': {
+            'handlers': ['console'], 'level': 'INFO'
+        },
+        'performance.slow_queries': {
+            'handlers': ['console'], 'level': 'WARNING'
+        },
+    },
+}
@@ -4,9 +4,23 @@ from django.contrib.auth.forms import UserCreationForm
 from django.urls import include, path
 from django.views.generic import CreateView
 
+from news import admin as news_admin
+from performance import metrics
+
 urlpatterns = [
     path('', include('news.urls')),
+    path(
+        'admin/profiles/',
+        admin.site.admin_view(news_admin.profiles),
+        name='admin_profiles',
+    ),
+    path(
+        'admin/profiles/<str:name>/',
+        admin.site.admin_view(news_admin.profile_download),
+        name='admin_profile',
+    ),
     path('admin/', admin.site.urls),
+    path('metrics', metrics.export, name='metrics'),
 ]
 
 auth_urls = ([
@@ -1,5 +1,3 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
@@ -16,14 +14,32 @@ class NoteForm(forms.ModelForm):
         fields = ('title', 'text', 'slug')
 
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
+        """
+        Заданный пользователем slug должен быть свободен.
+
+        Пустой slug подберёт Note.save(): из заголовка, а при совпадении
+        с чужим — со свободным суффиксом, так что форма из-за него
+        не отклоняется.
+        """
+        slug = self.cleaned_data.get('slug')
+        if slug and Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def validate_unique(self):
+        """
+        Уникальность slug уже проверена в clean_slug.
+
+        Остальные поля проверяются, как в ModelForm: только те,
+        что есть в форме и прошли проверку.
+        """
+        exclude = {
+            field.name for field in Note._meta.fields
+            if field.name not in self.cleaned_data
+        }
+        try:
+            self.instance.validate_unique(exclude=exclude | {'slug'})
+        except ValidationError as error:
+            self.add_error(None, error)
@@ -0,0 +1,123 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from notes.models import Note
+
+User = get_user_model()
+
+WORDS = (
+    'купить', 'молоко', 'хлеб', 'позвонить', 'маме', 'врачу', 'встреча',
+    'проект', 'отчёт', 'письмо', 'задача', 'идея', 'книга', 'фильм',
+    'список', 'дела', 'отпуск', 'билеты', 'поезд', 'гостиница', 'подарок',
+    'день', 'рождения', 'оплатить', 'счёт', 'квартира', 'ремонт', 'план',
+    'неделя', 'понедельник', 'пятница', 'утром', 'вечером', 'срочно',
+    'не', 'забыть', 'важно', 'потом', 'завтра', 'сегодня', 'рецепт',
+)
+
+
+def skewed_index(rng, count, skew):
+    """
+    Индекс от 0 до count - 1.
+
+    При skew = 1 индексы равновероятны, чем skew больше, тем чаще
+    выпадают малые.
+    """
+    return int(count * rng.random() ** skew)
+
+
+def phrases(rng, count, low, high):
+    """Набор из count фраз длиной от low до high слов."""
+    return [
+        ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+        for _ in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимыми тестовыми данными для '
+        'нагрузочных замеров: пользователями и заметками. '
+        'При одном и том же --seed данные одинаковы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--notes', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prolific-authors', type=float, default=2.0,
+            help='Перекос заметок в сторону активных авторов.',
+        )
+
+    def handle(self, *args, users, notes, seed, batch_size,
+               prolific_authors, **options):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        user_ids = self.create_users(users)
+        if user_ids:
+            self.create_notes(notes, user_ids, prolific_authors)
+
+    def create(self, model, total, build):
+        """
+        Вставляет total объектов порциями.
+
+        Возвращает диапазон (first, last) их id или None, если вставлять
+        нечего. Вставка идёт одной транзакцией, поэтому id идут подряд.
+        """
+        first = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        started = time.monotonic()
+        with transaction.atomic():
+            for start in range(0, total, self.batch_size):
+                model.objects.bulk_create(
+                    build(first + number + 1) for number in range(
+                        start, min(start + self.batch_size, total)
+                    )
+                )
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f'{model._meta.label}: {total}, '
+            f'{total / elapsed:.0f} строк/с.'
+        )
+        created = model.objects.filter(pk__gt=first).aggregate(
+            first=Min('pk'), last=Max('pk'), count=Count('pk')
+        )
+        if not created['count']:
+            return None
+        if created['last'] - created['first'] + 1 != created['count']:
+            raise CommandError(
+                f'{model._meta.label}: id вставленных строк идут не подряд.'
+            )
+        return created['first'], created['last']
+
+    def create_users(self, total):
+        return self.create(
+            User, total,
+            lambda number: User(username=f'user{number}', password='!'),
+        )
+
+    def create_notes(self, total, user_ids, prolific_authors):
+        """
+        У немногих активных авторов заметок больше всего.
+
+        user_ids — диапазон id (first, last) из create().
+        """
+        first_user, last_user = user_ids
+        titles = phrases(self.rng, 1024, 1, 6)
+        texts = phrases(self.rng, 4096, 3, 60)
+        self.create(
+            Note, total,
+            lambda number: Note(
+                title=self.rng.choice(titles),
+                text=self.rng.choice(texts),
+                slug=f'seed-{number}',
+                author_id=first_user + skewed_index(
+                    self.rng, last_user - first_user + 1, prolific_authors
+                ),
+            ),
+        )
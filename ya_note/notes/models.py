@@ -1,8 +1,49 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 
 from pytils.translit import slugify
 
+SLUG_MAX_LENGTH = 100
+# Место под суффикс: дефис и до девяти цифр.
+SLUG_SUFFIX_LENGTH = 10
+# Сколько раз подбирать slug заново, если его заняли параллельно.
+SLUG_ATTEMPTS = 5
+
+
+def free_slug(queryset, title):
+    """
+    Slug из заголовка, а если он занят — с суффиксом -N.
+
+    N на единицу больше наибольшего занятого. Учитываются суффиксы
+    не длиннее восьми цифр: тогда и N + 1 помещается в SLUG_SUFFIX_LENGTH,
+    и slug не выходит за SLUG_MAX_LENGTH. Если и этот slug занят
+    (суффиксом, заданным вручную), основа укорачивается ещё на
+    SLUG_SUFFIX_LENGTH символов. Занятые slug читаются одним запросом
+    на основу по диапазону уникального индекса: всё, что начинается
+    с «base-», лежит между «base-» и «base.», потому что точка
+    следует за дефисом.
+    """
+    slug = slugify(title)[:SLUG_MAX_LENGTH]
+    base = slug[:SLUG_MAX_LENGTH - SLUG_SUFFIX_LENGTH]
+    while base:
+        taken = set(queryset.filter(
+            Q(slug=slug) | Q(slug__gte=f'{base}-', slug__lt=f'{base}.')
+        ).values_list('slug', flat=True))
+        if slug not in taken:
+            return slug
+        numbers = [
+            int(suffix) for suffix in (
+                other[len(base) + 1:] for other in taken
+            )
+            if suffix.isdigit() and len(suffix) <= SLUG_SUFFIX_LENGTH - 2
+        ]
+        numbered = f'{base}-{max(numbers, default=1) + 1}'
+        if numbered not in taken:
+            return numbered
+        slug = base = base[:-SLUG_SUFFIX_LENGTH].rstrip('-')
+    raise ValueError(f'Нет свободного slug для заголовка {title!r}.')
+
 
 class Note(models.Model):
     title = models.CharField(
@@ -17,7 +58,7 @@ class Note(models.Model):
     )
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
-        max_length=100,
+        max_length=SLUG_MAX_LENGTH,
         unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
@@ -26,13 +67,36 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Пустой slug подбирается через free_slug().
+
+        Если тот же slug параллельно занял другой запрос, уникальный
+        индекс не даст сохранить дубль, и slug подбирается заново.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        others = Note.objects.all()
+        if self.pk is not None:
+            others = others.exclude(pk=self.pk)
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = free_slug(others, self.title)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                self.slug = ''
+                if attempt == SLUG_ATTEMPTS - 1:
+                    raise
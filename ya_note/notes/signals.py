@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from performance import metrics
+
+from .models import Note
+
+
+@receiver(post_save, sender=Note)
+def count_saved(sender, instance, created, **kwargs):
+    metrics.count_write(sender, 'create' if created else 'update')
+
+
+@receiver(post_delete, sender=Note)
+def count_deleted(sender, instance, **kwargs):
+    metrics.count_write(sender, 'delete')
@@ -1,6 +1,15 @@
+import json
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
 from .base import (
     BaseTestCase,
     NOTES_ADD_URL,
+    NOTES_DETAIL_URL,
     NOTES_EDIT_URL,
     NOTES_LIST_URL,
 )
@@ -47,3 +56,74 @@ class TestContent(BaseTestCase):
                     self.author_client.get(url).context.get('form'),
                     NoteForm
                 )
+
+    def test_detail_conditional_get(self):
+        """
+        Неизменившаяся заметка отдаётся ответом 304,
+        а после редактирования — заново.
+        """
+        response = self.author_client.get(NOTES_DETAIL_URL)
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                self.assertEqual(
+                    self.author_client.get(
+                        NOTES_DETAIL_URL, **headers
+                    ).status_code,
+                    HTTPStatus.NOT_MODIFIED
+                )
+        self.note.text = 'Новый текст'
+        self.note.save()
+        self.assertEqual(
+            self.author_client.get(
+                NOTES_DETAIL_URL, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            HTTPStatus.OK
+        )
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1)
+    def test_timing_middleware(self):
+        """Замеры запроса попадают в Server-Timing и в лог."""
+        with (
+            self.assertLogs('performance.middleware') as logs,
+            CaptureQueriesContext(connection) as queries,
+        ):
+            response = self.author_client.get(NOTES_LIST_URL)
+        names = [
+            metric.split(';')[0]
+            for metric in response['Server-Timing'].split(', ')
+        ]
+        self.assertEqual(names, ['total', 'view', 'render', 'db', 'mem'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['url_name'], 'notes:list')
+        self.assertEqual(record['sql_count'], len(queries))
+
+    def test_timing_middleware_is_off_by_default(self):
+        response = self.author_client.get(NOTES_LIST_URL)
+        self.assertNotIn('Server-Timing', response)
+
+    def metric(self, line):
+        """Значение строки метрики со страницы /metrics, 0 если её нет."""
+        content = self.client.get(reverse('metrics')).content.decode()
+        for text in content.splitlines():
+            name, _, value = text.rpartition(' ')
+            if name == line:
+                return float(value)
+        return 0
+
+    def test_metrics(self):
+        count = (
+            'http_request_duration_seconds_count'
+            '{status="200",view="notes:list"}'
+        )
+        created = 'writes_total{action="create",model="note"}'
+        before = {line: self.metric(line) for line in (count, created)}
+        queries = self.metric('db_queries_total')
+        self.author_client.get(NOTES_LIST_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author_client.post(NOTES_ADD_URL, data=self.form_data)
+        self.assertEqual(self.metric(count), before[count] + 1)
+        self.assertEqual(self.metric(created), before[created] + 1)
+        self.assertGreater(self.metric('db_queries_total'), queries)
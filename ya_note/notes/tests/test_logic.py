@@ -1,17 +1,42 @@
+import io
+import os
+import runpy
+import tempfile
+from datetime import timedelta
 from http import HTTPStatus
+from unittest import mock
 
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from pytils.translit import slugify
 
+from performance import querystats
+
 from notes.forms import WARNING
-from notes.models import Note
+from notes.models import (
+    Note,
+    SLUG_MAX_LENGTH,
+    SLUG_SUFFIX_LENGTH,
+    free_slug,
+)
+from yanote import settings as project_settings
 from .base import (
     BaseTestCase,
     NOTES_ADD_URL,
     NOTES_DELETE_URL,
+    NOTES_DETAIL_URL,
     NOTES_EDIT_URL,
+    NOTES_LIST_URL,
     NOTES_SUCCESS_URL
 )
 
+# Каждый запрос авторизованного клиента читает сессию и пользователя.
+AUTH_QUERIES = 2
+
 
 class TestNoteCreation(BaseTestCase):
     """Тесты на логику создания, редактирования и удаления заметок."""
@@ -88,6 +113,85 @@ class TestNoteCreation(BaseTestCase):
             set(Note.objects.all())
         )
 
+    def test_same_titles_get_numbered_slugs(self):
+        """Одинаковые заголовки без slug не отклоняются, а нумеруются."""
+        data = {**self.form_data, 'title': 'Встреча', 'slug': ''}
+        for client in (self.author_client, self.author_client,
+                       self.reader_client):
+            self.assertRedirects(
+                client.post(NOTES_ADD_URL, data=data), NOTES_SUCCESS_URL
+            )
+        base = slugify('Встреча')
+        self.assertEqual(
+            sorted(Note.objects.filter(
+                title='Встреча'
+            ).values_list('slug', flat=True)),
+            [base, f'{base}-2', f'{base}-3'],
+        )
+
+    def test_free_slug_takes_one_query(self):
+        """Суффикс следует за наибольшим, похожие slug не мешают."""
+        base = slugify('Встреча')
+        for slug in (base, f'{base}-7', f'{base}-s-klientom', f'{base}2'):
+            Note.objects.create(title='Встреча', slug=slug, author=self.author)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                free_slug(Note.objects.all(), 'Встреча'), f'{base}-8'
+            )
+        self.assertEqual(
+            free_slug(Note.objects.all(), 'Встреча с клиентом'),
+            f'{base}-s-klientom-2',
+        )
+
+    def test_free_slug_ignores_oversized_suffix(self):
+        """Заданный вручную длинный числовой суффикс не раздувает slug."""
+        base = slugify('Встреча')
+        for slug in (base, f'{base}-99999999999999'):
+            Note.objects.create(title='Встреча', slug=slug, author=self.author)
+        self.assertEqual(
+            free_slug(Note.objects.all(), 'Встреча'), f'{base}-2'
+        )
+
+    def test_free_slug_suffix_fits_after_nine_digits(self):
+        """Девятизначный суффикс не даёт десятизначного следующего."""
+        base = 'a' * (SLUG_MAX_LENGTH - SLUG_SUFFIX_LENGTH)
+        for slug in ('a' * SLUG_MAX_LENGTH, f'{base}-999999999'):
+            Note.objects.create(title='a', slug=slug, author=self.author)
+        self.assertEqual(
+            free_slug(Note.objects.all(), 'a' * SLUG_MAX_LENGTH), f'{base}-2'
+        )
+
+    def test_free_slug_shortens_base_when_suffixes_run_out(self):
+        """Если занят и следующий суффикс, основа укорачивается."""
+        base = 'a' * (SLUG_MAX_LENGTH - SLUG_SUFFIX_LENGTH)
+        for slug in (
+            'a' * SLUG_MAX_LENGTH, f'{base}-99999999', f'{base}-100000000'
+        ):
+            Note.objects.create(title='a', slug=slug, author=self.author)
+        self.assertEqual(
+            free_slug(Note.objects.all(), 'a' * SLUG_MAX_LENGTH),
+            'a' * (SLUG_MAX_LENGTH - 2 * SLUG_SUFFIX_LENGTH),
+        )
+
+    def test_long_title_slug_fits(self):
+        title = 'щ' * 100
+        first, second = (
+            Note.objects.create(title=title, author=self.author)
+            for _ in range(2)
+        )
+        self.assertEqual(len(first.slug), SLUG_MAX_LENGTH)
+        self.assertLessEqual(len(second.slug), SLUG_MAX_LENGTH)
+        self.assertTrue(second.slug.endswith('-2'))
+
+    def test_slug_taken_concurrently_is_reallocated(self):
+        """Slug, занятый между подбором и INSERT, подбирается заново."""
+        with mock.patch(
+            'notes.models.free_slug', side_effect=[self.note.slug, 'fresh']
+        ):
+            note = Note.objects.create(title='Заметка', author=self.author)
+        self.assertEqual(note.slug, 'fresh')
+        self.assertEqual(Note.objects.get(pk=note.pk).slug, 'fresh')
+
     def test_author_can_edit_note(self):
         """
         Автор заметки может ее редактировать -
@@ -154,3 +258,115 @@ class TestNoteCreation(BaseTestCase):
         self.assertEqual(note.text, self.note.text)
         self.assertEqual(note.slug, self.note.slug)
         self.assertEqual(note.author, self.note.author)
+
+    def test_post_query_counts(self):
+        """
+        Сохранение, редактирование и удаление обходятся
+        без повторных поисков заметки и лишних сохранений.
+        """
+        cases = (
+            # Проверка slug и INSERT.
+            (NOTES_ADD_URL, self.form_data, 2),
+            # Заметка, проверка slug и UPDATE.
+            (NOTES_EDIT_URL, {**self.form_data, 'slug': self.note.slug}, 3),
+            # Заметка и DELETE.
+            (NOTES_DELETE_URL, None, 2),
+        )
+        for url, data, queries in cases:
+            with self.subTest(url=url):
+                with self.assertNumQueries(AUTH_QUERIES + queries):
+                    self.assertRedirects(
+                        self.author_client.post(url, data),
+                        NOTES_SUCCESS_URL,
+                        fetch_redirect_response=False,
+                    )
+
+
+class TestClearExpiredSessions(TestCase):
+
+    def test_only_expired_sessions_are_deleted(self):
+        for _ in range(5):
+            SessionStore().create()
+        alive = Session.objects.first()
+        Session.objects.exclude(pk=alive.pk).update(
+            expire_date=timezone.now() - timedelta(days=1)
+        )
+        call_command('clear_expired_sessions', batch_size=3)
+        self.assertEqual(
+            list(Session.objects.values_list('pk', flat=True)), [alive.pk]
+        )
+
+
+class TestSessionProfile(TestCase):
+
+    def test_misconfigured_profile_is_rejected(self):
+        """Неизвестный профиль и cached_db без общего кэша не загружаются."""
+        for profile, message in (
+            ('redis', 'допустимы: db, cached_db, signed_cookies'),
+            ('cached_db', 'SESSION_CACHE_DIR'),
+        ):
+            with self.subTest(profile=profile), mock.patch.dict(
+                os.environ, {'SESSION_PROFILE': profile}
+            ):
+                os.environ.pop('SESSION_CACHE_DIR', None)
+                with self.assertRaisesMessage(ImproperlyConfigured, message):
+                    runpy.run_path(project_settings.__file__)
+
+
+class TestSeed(TestCase):
+
+    def test_seed_creates_notes_with_unique_slugs(self):
+        call_command('seed', users=3, notes=50, seed=1)
+        call_command('seed', users=3, notes=50, seed=1)
+        self.assertEqual(Note.objects.count(), 100)
+        self.assertEqual(
+            Note.objects.values('slug').distinct().count(), 100
+        )
+        first, second = (
+            list(Note.objects.order_by('pk').values_list(
+                'title', 'text'
+            )[start:start + 50])
+            for start in (0, 50)
+        )
+        self.assertEqual(first, second)
+
+
+class TestSlowQueries(BaseTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            QUERY_STATS=True,
+            QUERY_STATS_DIR=directory.name,
+            QUERY_STATS_INTERVAL=0,
+            SLOW_QUERY_MS=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(setattr, querystats, 'stats', None)
+
+    def test_view_queries_are_aggregated(self):
+        """Запросы представлений сводятся по отпечаткам и видны в команде."""
+        with self.assertLogs('performance.slow_queries'):
+            for _ in range(3):
+                self.author_client.get(NOTES_LIST_URL)
+        entries = querystats.load()
+        self.assertTrue(entries)
+        for entry in entries.values():
+            self.assertEqual(entry['views'], {'notes:list': entry['count']})
+        out = io.StringIO()
+        call_command('slow_queries', order='count', reset=True, stdout=out)
+        self.assertIn('notes:list', out.getvalue())
+        self.assertEqual(querystats.load(), {})
+
+    def test_reset_reaches_running_process(self):
+        """После --reset процесс не сохраняет запросы, сделанные до сброса."""
+        with self.assertLogs('performance.slow_queries'):
+            self.author_client.get(NOTES_LIST_URL)
+            call_command('slow_queries', reset=True, stdout=io.StringIO())
+            self.author_client.get(NOTES_DETAIL_URL)
+        views = set()
+        for entry in querystats.load().values():
+            views.update(entry['views'])
+        self.assertEqual(views, {'notes:detail'})
@@ -0,0 +1,41 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from performance import query_plans
+
+from .base import (
+    BaseTestCase,
+    NOTES_ADD_URL,
+    NOTES_DELETE_URL,
+    NOTES_DETAIL_URL,
+    NOTES_EDIT_URL,
+    NOTES_LIST_URL,
+)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class TestQueryPlans(BaseTestCase):
+    """Запросы страниц заметок обслуживаются индексами."""
+
+    def assert_uses_indexes(self, queries):
+        self.assertEqual(query_plans.bad_plans(queries), {})
+
+    def test_views_use_indexes(self):
+        """Ни одна страница не просматривает таблицу целиком."""
+        cases = [
+            (NOTES_LIST_URL, 'get', None),
+            (NOTES_DETAIL_URL, 'get', None),
+            (NOTES_ADD_URL, 'get', None),
+            (NOTES_ADD_URL, 'post', self.form_data),
+            (NOTES_ADD_URL, 'post', {**self.form_data, 'slug': ''}),
+            (NOTES_EDIT_URL, 'get', None),
+            (NOTES_DELETE_URL, 'get', None),
+            (NOTES_EDIT_URL, 'post', {**self.form_data, 'slug': 'edited'}),
+        ]
+        for url, method, data in cases:
+            with self.subTest(url=url, method=method):
+                with CaptureQueriesContext(connection) as queries:
+                    getattr(self.author_client, method)(url, data)
+                self.assert_uses_indexes(queries)
@@ -1,5 +1,9 @@
+from hashlib import md5
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.views import generic
 
 from .forms import NoteForm
@@ -16,7 +20,23 @@ class NoteSuccess(LoginRequiredMixin, generic.TemplateView):
     template_name = 'notes/success.html'
 
 
-class NoteBase(LoginRequiredMixin):
+class CachedObjectMixin:
+    """
+    Находит объект один раз за запрос.
+
+    Повторные вызовы get_object() без queryset, например из
+    get_success_url(), возвращают уже найденный объект.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_cached_object'):
+            self._cached_object = super().get_object()
+        return self._cached_object
+
+
+class NoteBase(LoginRequiredMixin, CachedObjectMixin):
     """Базовый класс для остальных CBV."""
     model = Note
     success_url = reverse_lazy('notes:success')
@@ -32,9 +52,8 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """Заметка сохраняется один раз, уже с автором."""
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -55,5 +74,30 @@ class NotesList(NoteBase, generic.ListView):
 
 
 class NoteDetail(NoteBase, generic.DetailView):
-    """Заметка подробно."""
+    """
+    Заметка подробно.
+
+    На If-None-Match и If-Modified-Since отвечает 304 по времени
+    изменения заметки, не загружая её целиком.
+    """
     template_name = 'notes/detail.html'
+
+    def get(self, request, *args, **kwargs):
+        updated_at = self.get_queryset().filter(
+            slug=self.kwargs['slug']
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return super().get(request, *args, **kwargs)
+        etag = quote_etag(md5(
+            f'{self.kwargs["slug"]}:{updated_at}:{request.user.pk}'.encode()
+        ).hexdigest())
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Cookie',))
+        return response
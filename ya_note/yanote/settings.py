@@ -1,8 +1,13 @@
+import os
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+# Общий для проектов пакет performance лежит в корне репозитория.
+sys.path.append(str(BASE_DIR.parent))
 
 SECRET_KEY = 'django-insecure-yipnj$#j!ajarq%k55z4kuf3x79)91h0h42o9!1ho(z=!%mt=#'
 
@@ -18,10 +23,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'notes.apps.NotesConfig'
+    'notes.apps.NotesConfig',
+    'performance.apps.PerformanceConfig',
 ]
 
 MIDDLEWARE = [
+    'performance.middleware.metrics_middleware',
+    'performance.middleware.TimingMiddleware',
+    'performance.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +68,68 @@ DATABASES = {
     }
 }
 
+# Профиль для боевой нагрузки включается переменной DB_PROFILE=production.
+# WAL позволяет читать во время записи, IMMEDIATE сразу берёт блокировку
+# на запись и не получает «database is locked» при её повышении посреди
+# транзакции, timeout — сколько секунд ждать занятую базу (busy_timeout).
+if os.environ.get('DB_PROFILE') == 'production':
+    DATABASES['default'].update(
+        CONN_MAX_AGE=600,
+        CONN_HEALTH_CHECKS=True,
+        OPTIONS={
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+            ),
+        },
+    )
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+    },
+}
+
+# Кэш сессий, общий для процессов одного сервера: SESSION_CACHE_DIR.
+if os.environ.get('SESSION_CACHE_DIR'):
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['SESSION_CACHE_DIR'],
+    }
+
+# Хранилище сессий выбирается переменной SESSION_PROFILE:
+# db — таблица django_session, запрос к ней на каждый запрос с сессией;
+# cached_db — чтение из кэша сессий, запись и в кэш, и в базу; кэш
+# должен быть общим (SESSION_CACHE_DIR), иначе другой процесс продолжит
+# отдавать из своей памяти изменённую или удалённую при выходе сессию;
+# signed_cookies — сессия целиком в подписанной cookie, база не нужна,
+# но выход не отзывает ранее выданные cookie.
+SESSION_PROFILES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_PROFILE = os.environ.get('SESSION_PROFILE', 'db')
+if SESSION_PROFILE not in SESSION_PROFILES:
+    raise ImproperlyConfigured(
+        f'Неизвестный SESSION_PROFILE={SESSION_PROFILE!r}, допустимы: '
+        f'{", ".join(SESSION_PROFILES)}.'
+    )
+if SESSION_PROFILE == 'cached_db' and not os.environ.get('SESSION_CACHE_DIR'):
+    raise ImproperlyConfigured(
+        'SESSION_PROFILE=cached_db требует общий кэш сессий: '
+        'задайте SESSION_CACHE_DIR.'
+    )
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]
+SESSION_CACHE_ALIAS = 'sessions'
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -88,3 +159,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGOUT_REDIRECT_URL = reverse_lazy('notes:home')
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+# Доля запросов, которые замеряет performance.middleware.TimingMiddleware.
+PERFORMANCE_SAMPLE_RATE = float(os.environ.get('PERFORMANCE_SAMPLE_RATE', 0))
+
+# Сводка запросов performance.querystats: включена ли, порог медленного
+# запроса в миллисекундах, сколько хранить отпечатков и длительностей
+# на отпечаток, куда и как часто в секундах сохранять снимки.
+QUERY_STATS = os.environ.get('QUERY_STATS') == '1'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+QUERY_STATS_SIZE = 500
+QUERY_STATS_SAMPLES = 200
+QUERY_STATS_DIR = BASE_DIR / 'query_stats'
+QUERY_STATS_INTERVAL = 10
+# Снимок процесса, который не сохранялся сутки, считается оставшимся
+# от завершённого процесса.
+QUERY_STATS_MAX_AGE = 24 * 60 * 60
+
+# Метрики performance.metrics для /metrics. METRICS_DIR включает
+# многопроцессный режим: каталог общий для всех воркеров, его очищают
+# при их перезапуске. С METRICS_TOKEN страница требует заголовок
+# Authorization: Bearer.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+# Метрики проекта в дополнение к общим: имя -> (тип, описание).
+METRICS_EXTRA = {}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'performance.middleware': {
+            'handlers': ['console'], 'level': 'INFO'
+        },
+        'performance.slow_queries': {
+            'handlers': ['console'], 'level': 'WARNING'
+        },
+    },
+}
@@ -6,9 +6,12 @@ from django.urls import include, path
 from django.views.decorators.http import require_POST
 from django.views.generic import CreateView
 
+from performance import metrics
+
 urlpatterns = [
     path('', include('notes.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics.export, name='metrics'),
 ]
 
 auth_urls = ([